@@ -40,7 +40,12 @@ def make_default_config():
         "hidden_collision_type_groups": "",
         "filter_view": "",
         "addi_file_on_load": "Choose",
-        "topdown_cull_height": 80000
+        "topdown_cull_height": 80000,
+        "projected_marquee_selection": "True",
+        "max_fps": 60,
+        "frustum_culling": "True",
+        "lod_min_pixels": 3,
+        "undo_history_memory_budget": 256
     }
 
     with open(get_config_filepath(), "w", encoding='utf-8') as f:
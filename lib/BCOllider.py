@@ -1,8 +1,29 @@
 # Python 3 necessary
 
+import math
 import subprocess
 from struct import unpack_from, pack
 
+import numpy
+
+# Layout of the triangle entries, as far as the vertex indices and the collision type go.
+TRIANGLE_DTYPE = numpy.dtype({
+    'names': ['indices', 'collision_type'],
+    'formats': [('>i4', (3, )), '>u2'],
+    'offsets': [0x00, 0x16],
+    'itemsize': 0x24,
+})
+
+# Layout of the entries of the grid table: the number of triangles of the cell, the index of the
+# first of the four entries that subdivide the cell (0 if not subdivided), and the index of the
+# first triangle index of the cell in the triangle index table.
+GRID_ENTRY_DTYPE = numpy.dtype({
+    'names': ['triangle_count', 'child_index', 'first_triangle'],
+    'formats': ['u1', '>u2', '>i4'],
+    'offsets': [0x00, 0x02, 0x04],
+    'itemsize': 0x08,
+})
+
 
 def read_array(buffer, offset, length):
     return buffer[offset:offset+length]
@@ -48,9 +69,16 @@ class RacetrackCollision(object):
         self.unknownoffset = 0
 
         self.grids = []
+        self.grid = None
         self.triangles = []
         self.vertices = []
 
+        # The triangles and vertices as arrays: the vertex indices of each triangle (N x 3), the
+        # collision type of each triangle (N), and the vertex positions (M x 3).
+        self.triangle_indices = numpy.zeros((0, 3), dtype=numpy.int32)
+        self.collision_types = numpy.zeros(0, dtype=numpy.uint16)
+        self.vertex_positions = numpy.zeros((0, 3), dtype=numpy.float32)
+
     def load_file(self, f):
         data = f.read()
         self._data = data
@@ -78,38 +106,28 @@ class RacetrackCollision(object):
         self.verticesoffset = read_uint32(data, 0x24)
         self.unknownoffset = read_uint32(data, 0x28)
 
+        self.grid = CollisionGrid.from_bco_data(self, data)
+
         # Parse triangles
         trianglescount = (self.verticesoffset-self.trianglesoffset) // 0x24
 
-        for i in range(trianglescount):
-            v1 = read_int32(data, self.trianglesoffset+i*0x24 + 0x00)
-            v2 = read_int32(data, self.trianglesoffset+i*0x24 + 0x04)
-            v3 = read_int32(data, self.trianglesoffset+i*0x24 + 0x08)
-            collision_type = read_uint16(data, self.trianglesoffset+i*0x24 + 0x16)
+        triangles = numpy.frombuffer(data, dtype=TRIANGLE_DTYPE, count=trianglescount,
+                                     offset=self.trianglesoffset)
+        self.triangle_indices = triangles['indices'].astype(numpy.int32)
+        self.collision_types = triangles['collision_type'].astype(numpy.uint16)
+
+        for i, ((v1, v2, v3), collision_type) in enumerate(zip(self.triangle_indices.tolist(),
+                                                                 self.collision_types.tolist())):
             rest = read_array(data, self.trianglesoffset+i*0x24 + 0x0C, length=0x24-0xC)
             self.triangles.append((v1,v2,v3, collision_type, rest))
 
         # Parse vertices
         vertcount = (self.unknownoffset-self.verticesoffset) // 0xC
 
-        biggestx = biggestz = -99999999
-        smallestx = smallestz = 99999999
-
-        for i in range(vertcount):
-            x = read_float(data, self.verticesoffset + i*0xC + 0x00)
-            y = read_float(data, self.verticesoffset + i*0xC + 0x04)
-            z = read_float(data, self.verticesoffset + i*0xC + 0x08)
-            self.vertices.append((x,y,z))
-
-            if x > biggestx:
-                biggestx = x
-            if x < smallestx:
-                smallestx = x
-
-            if z > biggestz:
-                biggestz = z
-            if z < smallestz:
-                smallestz = z
+        vertices = numpy.frombuffer(data, dtype='>f4', count=vertcount * 3,
+                                    offset=self.verticesoffset)
+        self.vertex_positions = vertices.astype(numpy.float32).reshape(-1, 3)
+        self.vertices = list(map(tuple, self.vertex_positions.tolist()))
 
         f.seek(self.unknownoffset)
         self.matentries = []
@@ -119,6 +137,184 @@ class RacetrackCollision(object):
             self.matentries.append((val1, val2, unk, int1, int2))
 
 
+class CollisionGrid(object):
+    """
+    Uniform grid over the XZ plane that lists the triangles that overlap each cell.
+
+    Cells can be subdivided in four smaller cells (in order: -X-Z, +X-Z, -X+Z, +X+Z), recursively.
+    The cells of the uniform grid are the first entries, ordered by row; `entry_children` holds the
+    index of the first subdivision of each entry (0 if the entry is not subdivided). The triangles
+    of each entry are stored as ranges (`entry_offsets`) of a single array of triangle indices
+    (`entry_triangles`).
+    """
+
+    def __init__(self, origin_x, origin_z, cell_xsize, cell_zsize, xsize, zsize, entry_children,
+                 entry_offsets, entry_triangles):
+        self.origin_x = origin_x
+        self.origin_z = origin_z
+        self.cell_xsize = cell_xsize
+        self.cell_zsize = cell_zsize
+        self.xsize = xsize
+        self.zsize = zsize
+        self.entry_children = numpy.asarray(entry_children, dtype=numpy.int32)
+        self.entry_offsets = numpy.asarray(entry_offsets, dtype=numpy.int64)
+        self.entry_triangles = numpy.asarray(entry_triangles, dtype=numpy.int32)
+
+    @classmethod
+    def from_bco_data(cls, collision, data):
+        """
+        Parses the grid table and the triangle index table of a BCO file. Returns `None` if the
+        file has no grid.
+        """
+        xsize, zsize = collision.grid_xsize, collision.grid_zsize
+        entry_count = (collision.triangles_indices_offset - collision.gridtable_offset) // 0x8
+        if (xsize * zsize == 0 or entry_count < xsize * zsize or collision.gridcell_xsize <= 0
+                or collision.gridcell_zsize <= 0):
+            return None
+
+        entries = numpy.frombuffer(data, dtype=GRID_ENTRY_DTYPE, count=entry_count,
+                                   offset=collision.gridtable_offset)
+        index_count = (collision.trianglesoffset - collision.triangles_indices_offset) // 0x2
+        triangle_indices = numpy.frombuffer(data, dtype='>u2', count=index_count,
+                                            offset=collision.triangles_indices_offset)
+
+        # Subdivisions are stored after the entries they subdivide; anything else is ignored.
+        entry_children = entries['child_index'].astype(numpy.int32)
+        valid_children = ((entry_children > numpy.arange(entry_count))
+                          & (entry_children <= entry_count - 4))
+        entry_children[~valid_children] = 0
+
+        firsts = numpy.clip(entries['first_triangle'].astype(numpy.int64), 0, index_count)
+        counts = numpy.minimum(entries['triangle_count'].astype(numpy.int64), index_count - firsts)
+        entry_offsets = numpy.zeros(entry_count + 1, dtype=numpy.int64)
+        numpy.cumsum(counts, out=entry_offsets[1:])
+        positions = (numpy.repeat(firsts - entry_offsets[:-1], counts)
+                     + numpy.arange(entry_offsets[-1]))
+        entry_triangles = triangle_indices[positions].astype(numpy.int32)
+
+        return cls(collision.coordinate1_x, collision.coordinate1_z, collision.gridcell_xsize,
+                   collision.gridcell_zsize, xsize, zsize, entry_children, entry_offsets,
+                   entry_triangles)
+
+    def get_cell(self, x, z):
+        """
+        Returns the index of the cell of the uniform grid that contains the given position, or
+        `None` if the position is outside of the grid.
+        """
+        ix = math.floor((x - self.origin_x) / self.cell_xsize)
+        iz = math.floor((z - self.origin_z) / self.cell_zsize)
+        if not (0 <= ix < self.xsize and 0 <= iz < self.zsize):
+            return None
+        return iz * self.xsize + ix
+
+    def get_entry(self, x, z):
+        """
+        Returns the index of the smallest subdivision that contains the given position, or `None`
+        if the position is outside of the grid.
+        """
+        entry = self.get_cell(x, z)
+        if entry is None:
+            return None
+        cell_x = self.origin_x + entry % self.xsize * self.cell_xsize
+        cell_z = self.origin_z + entry // self.xsize * self.cell_zsize
+        cell_xsize, cell_zsize = self.cell_xsize, self.cell_zsize
+        while self.entry_children[entry]:
+            cell_xsize /= 2.0
+            cell_zsize /= 2.0
+            quadrant_x = x >= cell_x + cell_xsize
+            quadrant_z = z >= cell_z + cell_zsize
+            cell_x += quadrant_x * cell_xsize
+            cell_z += quadrant_z * cell_zsize
+            entry = self.entry_children[entry] + quadrant_x + 2 * quadrant_z
+        return entry
+
+    def get_cell_triangles(self, x, z):
+        """
+        Returns the indices of the triangles in the (smallest) cell that contains the given
+        position, or `None` if the position is outside of the grid.
+        """
+        entry = self.get_entry(x, z)
+        if entry is None:
+            return None
+        return self.entry_triangles[self.entry_offsets[entry]:self.entry_offsets[entry + 1]]
+
+    def march_ray(self, x, z, dx, dz):
+        """
+        Returns the indices of the cells of the uniform grid that a ray in the XZ plane crosses, in
+        order, starting from the cell that contains its origin. Rays that start outside of the
+        grid are advanced to the point where they enter it.
+        """
+        if dx == 0.0 and dz == 0.0:
+            cell = self.get_cell(x, z)
+            return [] if cell is None else [cell]
+
+        # Clip the ray to the bounds of the grid.
+        near, far = 0.0, math.inf
+        for origin, direction, size in ((x - self.origin_x, dx, self.xsize * self.cell_xsize),
+                                        (z - self.origin_z, dz, self.zsize * self.cell_zsize)):
+            if direction == 0.0:
+                if not 0.0 <= origin < size:
+                    return []
+                continue
+            t0, t1 = -origin / direction, (size - origin) / direction
+            near, far = max(near, min(t0, t1)), min(far, max(t0, t1))
+        if near > far:
+            return []
+
+        fx = (x - self.origin_x + dx * near) / self.cell_xsize
+        fz = (z - self.origin_z + dz * near) / self.cell_zsize
+        ix = min(max(math.floor(fx), 0), self.xsize - 1)
+        iz = min(max(math.floor(fz), 0), self.zsize - 1)
+
+        # Distances (in units of the direction) between cell boundaries, and to the next ones.
+        steps = []
+        for cell_position, index, direction, cell_size in ((fx, ix, dx, self.cell_xsize),
+                                                           (fz, iz, dz, self.cell_zsize)):
+            if direction == 0.0:
+                steps.append((0, math.inf, math.inf))
+                continue
+            step = 1 if direction > 0.0 else -1
+            boundary = index + 1 if step > 0 else index
+            delta = cell_size / abs(direction)
+            steps.append((step, near + (boundary - cell_position) * cell_size / direction, delta))
+        (step_x, next_x, delta_x), (step_z, next_z, delta_z) = steps
+
+        cells = []
+        while 0 <= ix < self.xsize and 0 <= iz < self.zsize:
+            cells.append(iz * self.xsize + ix)
+            if next_x < next_z:
+                if next_x > far:
+                    break
+                ix += step_x
+                next_x += delta_x
+            else:
+                if next_z > far:
+                    break
+                iz += step_z
+                next_z += delta_z
+        return cells
+
+    def remap(self, triangle_map):
+        """
+        Returns a copy of the grid, with each triangle index `i` replaced by `triangle_map[i]`.
+        Triangles mapped to a negative index are left out.
+        """
+        triangle_map = numpy.asarray(triangle_map)
+        entry_count = len(self.entry_children)
+        entry_ids = numpy.repeat(numpy.arange(entry_count), numpy.diff(self.entry_offsets))
+        in_range = self.entry_triangles < len(triangle_map)
+        mapped = numpy.full(len(self.entry_triangles), -1, dtype=numpy.int32)
+        mapped[in_range] = triangle_map[self.entry_triangles[in_range]]
+        kept = mapped >= 0
+
+        entry_offsets = numpy.zeros(entry_count + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(entry_ids[kept], minlength=entry_count),
+                     out=entry_offsets[1:])
+        return CollisionGrid(self.origin_x, self.origin_z, self.cell_xsize, self.cell_zsize,
+                             self.xsize, self.zsize, self.entry_children, entry_offsets,
+                             mapped[kept])
+
+
 def read_gridtable_entry(data, offset):
     unk1 = read_uint8(data, offset+0)
     unk2 = read_uint8(data, offset+1)
@@ -0,0 +1,84 @@
+"""
+Unit tests for the `BCOllider` module.
+"""
+import io
+import struct
+
+import numpy
+
+from .BCOllider import RacetrackCollision
+
+
+def _make_bco() -> bytes:
+    # Two cells of 100 x 100 units, side by side. The first cell lists its triangles directly; the
+    # second one is subdivided in four, and two of its subdivisions list one triangle each.
+    vertices = []
+    triangles = []
+    for x, y in ((10.0, 0.0), (110.0, 0.0), (10.0, 50.0), (160.0, 0.0)):
+        triangles.append((len(vertices), len(vertices) + 1, len(vertices) + 2))
+        vertices.extend(((x, y, 10.0), (x + 30.0, y, 10.0), (x, y, 40.0)))
+
+    grid_entries = (
+        (2, 0, 0),
+        (0, 2, 0),
+        (1, 0, 2),
+        (1, 0, 3),
+        (0, 0, 0),
+        (0, 0, 0),
+    )
+    triangle_indices = (0, 2, 1, 3)
+
+    triangles_indices_offset = 0x2C + len(grid_entries) * 0x8
+    trianglesoffset = triangles_indices_offset + len(triangle_indices) * 0x2
+    verticesoffset = trianglesoffset + len(triangles) * 0x24
+    unknownoffset = verticesoffset + len(vertices) * 0xC
+
+    data = bytearray(b"0003")
+    data += struct.pack(">HHiiiiHHIIII", 2, 1, 0, 0, 100, 100, 0, 0, triangles_indices_offset,
+                        trianglesoffset, verticesoffset, unknownoffset)
+    for count, child, first in grid_entries:
+        data += struct.pack(">BBHi", count, 0, child, first)
+    data += struct.pack(f">{len(triangle_indices)}H", *triangle_indices)
+    for v1, v2, v3 in triangles:
+        entry = bytearray(0x24)
+        struct.pack_into(">iii", entry, 0x00, v1, v2, v3)
+        struct.pack_into(">H", entry, 0x16, 0x0100)
+        data += entry
+    for vertex in vertices:
+        data += struct.pack(">fff", *vertex)
+    return bytes(data)
+
+
+def test_grid():
+    collision = RacetrackCollision()
+    collision.load_file(io.BytesIO(_make_bco()))
+    grid = collision.grid
+
+    assert grid.entry_children.tolist() == [0, 2, 0, 0, 0, 0]
+    assert grid.entry_offsets.tolist() == [0, 2, 2, 3, 4, 4, 4]
+    assert grid.get_cell_triangles(20.0, 20.0).tolist() == [0, 2]
+    assert grid.get_entry(120.0, 20.0) == 2
+    assert grid.get_cell_triangles(120.0, 20.0).tolist() == [1]
+    assert grid.get_cell_triangles(160.0, 20.0).tolist() == [3]
+    assert grid.get_entry(199.0, 99.0) == 5
+    assert grid.get_cell_triangles(199.0, 99.0).tolist() == []
+    assert grid.get_cell_triangles(200.0, 20.0) is None
+    assert grid.get_cell_triangles(20.0, -1.0) is None
+
+    assert grid.march_ray(20.0, 20.0, 1.0, 0.1) == [0, 1]
+    assert grid.march_ray(-50.0, 50.0, 1.0, 0.0) == [0, 1]
+    assert grid.march_ray(150.0, 50.0, -1.0, 1.0) == [1]
+    assert grid.march_ray(20.0, 150.0, 1.0, 0.0) == []
+
+    remapped = grid.remap(numpy.array((-1, 0, 1, 2)))
+    assert remapped.get_cell_triangles(20.0, 20.0).tolist() == [1]
+    assert remapped.get_cell_triangles(120.0, 20.0).tolist() == [0]
+    assert remapped.get_cell_triangles(160.0, 20.0).tolist() == [2]
+
+
+def test_no_grid():
+    data = bytearray(_make_bco())
+    struct.pack_into(">HH", data, 0x4, 0, 0)
+    collision = RacetrackCollision()
+    collision.load_file(io.BytesIO(bytes(data)))
+    assert collision.grid is None
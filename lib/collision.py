@@ -1,3 +1,4 @@
+import functools
 import math
 
 import numba
@@ -5,59 +6,167 @@ import numpy
 
 from .vectors import Vector3, Triangle, Line
 
+# Maximum number of triangles in a leaf node of the bounding volume hierarchy.
+BVH_LEAF_SIZE = 4
+
+# Maximum number of points in a leaf node of the hierarchy of snapping points.
+SNAPPING_LEAF_SIZE = 8
+
+# Margin by which the bounding boxes of the hierarchy are grown, so that rays that graze a box are
+# never rejected because of rounding errors.
+BVH_MARGIN = 1e-3
+
+
+class SnappingPoints:
+    """
+    Positions that the cursor can snap to (N x 3), indexed by a bounding volume hierarchy so that
+    the point closest to a ray is found without testing every point.
+
+    Positions, rays and the returned points are in collision coordinates (BOL (x, y, z) as
+    (x, -z, y), with the Z axis up), not in BOL coordinates.
+    """
+
+    def __init__(self, positions: numpy.ndarray):
+        self.positions = numpy.ascontiguousarray(positions, dtype=numpy.float64).reshape(-1, 3)
+        # Points are indexed as triangles whose three vertices are the same.
+        self.nodes, self.bounds, self.order = _build_bvh(numpy.tile(self.positions, 3),
+                                                         SNAPPING_LEAF_SIZE)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def get_closest_point(self, ray: Line, clip_y: float = None, radius: float = 0) -> Vector3:
+        """
+        Returns the point closest to the line of the ray, ignoring points whose height (Z
+        coordinate) is above `clip_y`. Among the points that are at most `radius` (squared) farther
+        from the line than the closest one, the point closest to the origin of the ray is picked.
+        """
+        index = _get_closest_point_in_bvh(
+            ray.origin.x,
+            ray.origin.y,
+            ray.origin.z,
+            ray.direction.x,
+            ray.direction.y,
+            ray.direction.z,
+            math.inf if clip_y is None else clip_y,
+            radius * radius,
+            self.positions,
+            self.nodes,
+            self.bounds,
+            self.order,
+        )
+        if index < 0:
+            return None
+        return Vector3(*self.positions[index].tolist())
+
 
 class Collision:
 
-    def __init__(self, triangles: tuple[tuple[Vector3, Vector3, Vector3]]):
-        self.hash = hash(tuple(triangles))
-
-        self.vertices = []
-        self.face_centers = []
-        self.edge_centers = []
-        self.triangles = []
-
-        for v1, v2, v3 in triangles:
-            v1 = Vector3(v1.x, -v1.z, v1.y)
-            v2 = Vector3(v2.x, -v2.z, v2.y)
-            v3 = Vector3(v3.x, -v3.z, v3.y)
-
-            self.vertices.extend((v1, v2, v3))
-
-            face_center = (v1 + v2 + v3) / 3.0
-            self.face_centers.append(face_center)
-
-            for edge_center in ((v1 + v2) / 2.0, (v1 + v3) / 2.0, (v2 + v3) / 2.0):
-                self.edge_centers.append(edge_center)
-
-            triangle = Triangle(v1, v2, v3)
-            if not triangle.normal.is_zero():
-                self.triangles.append(triangle)
-
-        self.flat_triangles = []
-        for t in self.triangles:
-            self.flat_triangles.extend((t.origin.x, t.origin.y, t.origin.z, t.p2.x, t.p2.y, t.p2.z,
-                                        t.p3.x, t.p3.y, t.p3.z))
-        self.flat_triangles = numpy.array(self.flat_triangles)
-
-        if self.triangles:
-            self.extent = (
-                numpy.min(self.flat_triangles[0::3]),
-                numpy.min(self.flat_triangles[1::3]),
-                numpy.min(self.flat_triangles[2::3]),
-                numpy.max(self.flat_triangles[0::3]),
-                numpy.max(self.flat_triangles[1::3]),
-                numpy.max(self.flat_triangles[2::3]),
-            )
+    def __init__(self, triangles: 'numpy.ndarray | tuple[tuple[Vector3, Vector3, Vector3]]',
+                 grid=None):
+        """
+        `triangles` holds the vertices of each triangle (in BOL coordinates), either as an
+        `(N, 3, 3)` array, or as a sequence of `Vector3` triples.
+
+        The optional grid (a `BCOllider.CollisionGrid`, with indices into `triangles`) is used to
+        narrow down the triangles that vertical rays are tested against.
+        """
+        if not isinstance(triangles, numpy.ndarray):
+            triangles = [[(v.x, v.y, v.z) for v in triangle] for triangle in triangles]
+        triangles = numpy.asarray(triangles, dtype=numpy.float64).reshape(-1, 3, 3)
+        self.hash = hash(triangles.tobytes())
+
+        # Vertices of each triangle, in collision coordinates (BOL (x, y, z) as (x, -z, y), with
+        # the Z axis up).
+        triangles = triangles[:, :, (0, 2, 1)] * (1.0, -1.0, 1.0)
+        v1, v2, v3 = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+
+        # Candidate positions for snapping (N x 3).
+        self.vertex_positions = triangles.reshape(-1, 3)
+        self.face_center_positions = (v1 + v2 + v3) / 3.0
+        self.edge_center_positions = numpy.stack(
+            ((v1 + v2) / 2.0, (v1 + v3) / 2.0, (v2 + v3) / 2.0), axis=1).reshape(-1, 3)
+
+        # Degenerate triangles (with no normal) are left out of the ray casts.
+        normals = numpy.cross(v2 - v1, v3 - v1)
+        valid = numpy.any(normals != 0.0, axis=1)
+        self.flat_triangles = triangles[valid].reshape(-1)
+
+        # Bounding volume hierarchy over the triangles, so that rays are only tested against the
+        # triangles in the boxes that they cross.
+        self.bvh_nodes, self.bvh_bounds, self.bvh_triangles = _build_bvh(
+            self.flat_triangles.reshape(-1, 9), BVH_LEAF_SIZE)
+
+        # Leaving out degenerate triangles shifts the indices of the triangles that follow.
+        if grid is not None:
+            triangle_map = numpy.full(len(triangles), -1, dtype=numpy.int32)
+            triangle_map[valid] = numpy.arange(numpy.count_nonzero(valid))
+            grid = grid.remap(triangle_map)
+        self.grid = grid
+
+        if len(self.flat_triangles):
+            positions = self.flat_triangles.reshape(-1, 3)
+            self.extent = (*positions.min(axis=0).tolist(), *positions.max(axis=0).tolist())
         else:
             self.extent = None
 
+    @classmethod
+    def from_arrays(cls, vertices: numpy.ndarray, faces: numpy.ndarray, grid=None) -> 'Collision':
+        """
+        Creates the collision of a mesh, from its vertices (`M x 3`, in BOL coordinates) and the
+        vertex indices of its faces (`N x 3`).
+        """
+        vertices = numpy.asarray(vertices, dtype=numpy.float64).reshape(-1, 3)
+        faces = numpy.asarray(faces, dtype=numpy.int64).reshape(-1, 3)
+        return cls(vertices[faces], grid)
+
+    @property
+    def triangle_count(self) -> int:
+        return len(self.flat_triangles) // 9
+
+    # The positions as `Vector3` lists, and the triangles as `Triangle` objects, are only built
+    # for the callers that need them.
+
+    @functools.cached_property
+    def vertices(self) -> 'list[Vector3]':
+        return [Vector3(*position) for position in self.vertex_positions.tolist()]
+
+    @functools.cached_property
+    def face_centers(self) -> 'list[Vector3]':
+        return [Vector3(*position) for position in self.face_center_positions.tolist()]
+
+    @functools.cached_property
+    def edge_centers(self) -> 'list[Vector3]':
+        return [Vector3(*position) for position in self.edge_center_positions.tolist()]
+
+    # Snapping points are indexed the first time that each snapping mode is used.
+
+    @functools.cached_property
+    def vertex_snapping_points(self) -> SnappingPoints:
+        return SnappingPoints(self.vertex_positions)
+
+    @functools.cached_property
+    def face_center_snapping_points(self) -> SnappingPoints:
+        return SnappingPoints(self.face_center_positions)
+
+    @functools.cached_property
+    def edge_center_snapping_points(self) -> SnappingPoints:
+        return SnappingPoints(self.edge_center_positions)
+
+    @functools.cached_property
+    def triangles(self) -> 'list[Triangle]':
+        return [
+            Triangle(Vector3(x0, y0, z0), Vector3(x1, y1, z1), Vector3(x2, y2, z2))
+            for x0, y0, z0, x1, y1, z1, x2, y2, z2 in self.flat_triangles.reshape(-1, 9).tolist()
+        ]
+
     def collide_ray_downwards(self, x, z, y=99999999):
-        result = self.collide_ray(Line(Vector3(x, -z, y), Vector3(0.0, 0.0, -1.0)))
+        result = self.collide_vertical_ray(x, z, y, -1.0)
         return result.z if result is not None else None
 
     def collide_ray_closest(self, x, z, y):
-        result1 = self.collide_ray(Line(Vector3(x, -z, y), Vector3(0.0, 0.0, -1.0)))
-        result2 = self.collide_ray(Line(Vector3(x, -z, y), Vector3(0.0, 0.0, 1.0)))
+        result1 = self.collide_vertical_ray(x, z, y, -1.0)
+        result2 = self.collide_vertical_ray(x, z, y, 1.0)
 
         if result1 is None and result2 is None:
             return None
@@ -71,6 +180,62 @@ class Collision:
         dist2 = abs(y - result2.z)
         return result2.z if dist1 > dist2 else result1.z
 
+    def collide_vertical_ray(self, x, z, y, direction):
+        """
+        Collides a ray that starts at the given position (in BOL coordinates), and goes up or down
+        (depending on the sign of `direction`). If there is a grid, only the triangles in the
+        cell that the position falls in are tested.
+        """
+        if self.grid is not None:
+            place_at = _collide_vertical_ray_and_grid(x, -z, y, direction, self.flat_triangles,
+                                                      *_get_grid_arrays(self.grid))
+            # A miss is confirmed against all the triangles, so that an incomplete grid cannot
+            # hide the ground.
+            if not math.isnan(place_at[0]):
+                return Vector3(*place_at)
+
+        return self.collide_ray(Line(Vector3(x, -z, y), Vector3(0.0, 0.0, direction)))
+
+    def collide_rays_downwards(self, positions, y=99999999):
+        """
+        Batch version of `collide_ray_downwards()`. `positions` is an `(N, 2)` array of X and Z
+        coordinates (in BOL coordinates). Returns an array of `N` heights, with NaN where no ground
+        was found.
+        """
+        positions = numpy.asarray(positions, dtype=numpy.float64).reshape(-1, 2)
+        origins = numpy.empty((len(positions), 3))
+        origins[:, 0] = positions[:, 0]
+        origins[:, 1] = -positions[:, 1]
+        origins[:, 2] = y
+        return self._collide_vertical_rays(origins, -1.0)
+
+    def collide_rays_closest(self, positions):
+        """
+        Batch version of `collide_ray_closest()`. `positions` is an `(N, 3)` array of positions (in
+        BOL coordinates). Returns an array of `N` heights, with NaN where no ground was found.
+        """
+        positions = numpy.asarray(positions, dtype=numpy.float64).reshape(-1, 3)
+        origins = positions[:, (0, 2, 1)] * (1.0, -1.0, 1.0)
+        heights_below = self._collide_vertical_rays(origins, -1.0)
+        heights_above = self._collide_vertical_rays(origins, 1.0)
+
+        y = positions[:, 1]
+        above_is_closer = numpy.abs(y - heights_below) > numpy.abs(y - heights_above)
+        heights = numpy.where(above_is_closer, heights_above, heights_below)
+        return numpy.where(numpy.isnan(heights_below), heights_above, heights)
+
+    def _collide_vertical_rays(self, origins, direction):
+        grid_arrays = _get_grid_arrays(self.grid) if self.grid is not None else _NO_GRID_ARRAYS
+        return _collide_vertical_rays(
+            numpy.ascontiguousarray(origins),
+            direction,
+            self.flat_triangles,
+            self.bvh_nodes,
+            self.bvh_bounds,
+            self.bvh_triangles,
+            *grid_arrays,
+        )
+
     def collide_ray_legacy(self, ray):
         best_distance = None
         place_at = None
@@ -88,6 +253,28 @@ class Collision:
         return place_at
 
     def collide_ray(self, ray):
+        place_at = _collide_ray_and_bvh(
+            ray.origin.x,
+            ray.origin.y,
+            ray.origin.z,
+            ray.direction.x,
+            ray.direction.y,
+            ray.direction.z,
+            self.flat_triangles,
+            self.bvh_nodes,
+            self.bvh_bounds,
+            self.bvh_triangles,
+        )
+
+        if math.isnan(place_at[0]):
+            return None
+
+        return Vector3(*place_at)
+
+    def collide_ray_brute_force(self, ray):
+        """
+        Same as `collide_ray()`, but tests the ray against every triangle. Used as reference.
+        """
         place_at = _collide_ray_and_triangles(
             ray.origin.x,
             ray.origin.y,
@@ -105,6 +292,10 @@ class Collision:
 
     @staticmethod
     def get_closest_point(ray, points, clip_y, radius=0):
+        """
+        Same as `SnappingPoints.get_closest_point()`, but tests the ray against every point of the
+        given list. Used as reference.
+        """
         squared_distances_and_points = []
         for i, point in enumerate(points):
             if clip_y is not None and point.z > clip_y:
@@ -224,6 +415,142 @@ def _squared_distance_between_line_and_point(
     return length2(*cross(*p1_to_p2, *p3_to_p1)) / length2(*p1_to_p2)
 
 
+@numba.jit(nopython=True, nogil=True, cache=True)
+def _squared_distance_between_line_and_box(
+    x: float,
+    y: float,
+    z: float,
+    dx: float,
+    dy: float,
+    dz: float,
+    bounds: numpy.array,
+    node: int,
+) -> float:
+    """
+    Returns a lower bound of the squared distance between the line and the points in the box of the
+    node, from the distance to the sphere that encloses the box.
+    """
+    half_x = (bounds[node, 3] - bounds[node, 0]) / 2.0
+    half_y = (bounds[node, 4] - bounds[node, 1]) / 2.0
+    half_z = (bounds[node, 5] - bounds[node, 2]) / 2.0
+    distance = math.sqrt(
+        _squared_distance_between_line_and_point(x, y, z, dx, dy, dz, bounds[node, 0] + half_x,
+                                                 bounds[node, 1] + half_y,
+                                                 bounds[node, 2] + half_z))
+    distance -= length(half_x, half_y, half_z)
+    if distance <= 0.0:
+        return 0.0
+    return distance * distance
+
+
+@numba.jit(nopython=True, nogil=True, cache=True)
+def _get_closest_point_in_bvh(
+    x: float,
+    y: float,
+    z: float,
+    dx: float,
+    dy: float,
+    dz: float,
+    clip_y: float,
+    squared_radius: float,
+    points: numpy.array,
+    nodes: numpy.array,
+    bounds: numpy.array,
+    order: numpy.array,
+) -> int:
+    """
+    Returns the index of the snapping point picked for the line (see
+    `SnappingPoints.get_closest_point()`), or -1 if there is none.
+    """
+    if len(nodes) == 0 or length2(*subtract(dx + x, dy + y, dz + z, x, y, z)) == 0.0:
+        return -1
+
+    stack = numpy.empty(128, dtype=numpy.int32)
+    stack_distances = numpy.empty(128)
+
+    # First pass: the distance between the line and the closest point.
+    closest_distance = math.inf
+    stack[0] = 0
+    stack_distances[0] = 0.0
+    stack_size = 1
+    while stack_size:
+        stack_size -= 1
+        node = stack[stack_size]
+        if stack_distances[stack_size] > closest_distance or bounds[node, 2] > clip_y:
+            continue
+
+        left = nodes[node, 0]
+        if left < 0:
+            first = nodes[node, 2]
+            for i in range(first, first + nodes[node, 3]):
+                p = order[i]
+                if points[p, 2] > clip_y:
+                    continue
+                distance = _squared_distance_between_line_and_point(
+                    x, y, z, dx, dy, dz, points[p, 0], points[p, 1], points[p, 2])
+                closest_distance = min(closest_distance, distance)
+            continue
+
+        # Push the nearest child last, so that it is visited first.
+        right = nodes[node, 1]
+        left_distance = _squared_distance_between_line_and_box(x, y, z, dx, dy, dz, bounds, left)
+        right_distance = _squared_distance_between_line_and_box(x, y, z, dx, dy, dz, bounds, right)
+        if left_distance > right_distance:
+            left, right = right, left
+            left_distance, right_distance = right_distance, left_distance
+        stack[stack_size] = right
+        stack_distances[stack_size] = right_distance
+        stack[stack_size + 1] = left
+        stack_distances[stack_size + 1] = left_distance
+        stack_size += 2
+
+    if closest_distance == math.inf:
+        return -1
+
+    # Second pass: among the points within the radius of the closest distance, the one closest to
+    # the origin of the line (or with the lowest index, on ties).
+    best_index = -1
+    best_distance = math.inf
+    stack[0] = 0
+    stack_distances[0] = 0.0
+    stack_size = 1
+    while stack_size:
+        stack_size -= 1
+        node = stack[stack_size]
+        if (stack_distances[stack_size] - closest_distance > squared_radius
+                or bounds[node, 2] > clip_y):
+            continue
+
+        left = nodes[node, 0]
+        if left < 0:
+            first = nodes[node, 2]
+            for i in range(first, first + nodes[node, 3]):
+                p = order[i]
+                if points[p, 2] > clip_y:
+                    continue
+                distance = _squared_distance_between_line_and_point(
+                    x, y, z, dx, dy, dz, points[p, 0], points[p, 1], points[p, 2])
+                if abs(closest_distance - distance) > squared_radius:
+                    continue
+                distance = ((x - points[p, 0])**2 + (y - points[p, 1])**2 +
+                            (z - points[p, 2])**2)
+                if distance < best_distance or (distance == best_distance and p < best_index):
+                    best_index = p
+                    best_distance = distance
+            continue
+
+        right = nodes[node, 1]
+        stack[stack_size] = right
+        stack_distances[stack_size] = _squared_distance_between_line_and_box(
+            x, y, z, dx, dy, dz, bounds, right)
+        stack[stack_size + 1] = left
+        stack_distances[stack_size + 1] = _squared_distance_between_line_and_box(
+            x, y, z, dx, dy, dz, bounds, left)
+        stack_size += 2
+
+    return best_index
+
+
 @numba.jit(nopython=True, nogil=True, cache=True)
 def _collide_ray_and_triangle(
     x: float,
@@ -265,6 +592,48 @@ def _collide_ray_and_triangle(
     return -1.0, 0.0, 0.0, 0.0
 
 
+@numba.jit(nopython=True, nogil=True, cache=True)
+def _is_closer_collision(
+    collision: tuple[float, float, float, float],
+    best: tuple[float, float, float, float],
+) -> bool:
+    # Collisions are ordered by distance, then by position (as tuples would), so that the same
+    # collision is picked regardless of the order in which the triangles are tested.
+    if best[0] < 0.0:
+        return True
+    return collision < best
+
+
+@numba.jit(nopython=True, nogil=True, cache=True)
+def _collide_ray_and_triangle_at(
+    x: float,
+    y: float,
+    z: float,
+    dx: float,
+    dy: float,
+    dz: float,
+    triangles: numpy.array,
+    t: int,
+) -> tuple[float, float, float, float]:
+    return _collide_ray_and_triangle(
+        x,
+        y,
+        z,
+        dx,
+        dy,
+        dz,
+        triangles[t * 9 + 0],
+        triangles[t * 9 + 1],
+        triangles[t * 9 + 2],
+        triangles[t * 9 + 3],
+        triangles[t * 9 + 4],
+        triangles[t * 9 + 5],
+        triangles[t * 9 + 6],
+        triangles[t * 9 + 7],
+        triangles[t * 9 + 8],
+    )
+
+
 @numba.jit(nopython=True, nogil=True, cache=True)
 def _collide_ray_and_triangles(
     x: float,
@@ -275,30 +644,299 @@ def _collide_ray_and_triangles(
     dz: float,
     triangles: numpy.array,
 ) -> tuple[float, float, float]:
-    collisions = []
+    best = (-1.0, 0.0, 0.0, 0.0)
     for t in range(len(triangles) // 9):
-        collision = _collide_ray_and_triangle(
-            x,
-            y,
-            z,
-            dx,
-            dy,
-            dz,
-            triangles[t * 9 + 0],
-            triangles[t * 9 + 1],
-            triangles[t * 9 + 2],
-            triangles[t * 9 + 3],
-            triangles[t * 9 + 4],
-            triangles[t * 9 + 5],
-            triangles[t * 9 + 6],
-            triangles[t * 9 + 7],
-            triangles[t * 9 + 8],
-        )
+        collision = _collide_ray_and_triangle_at(x, y, z, dx, dy, dz, triangles, t)
+        if collision[0] >= 0.0 and _is_closer_collision(collision, best):
+            best = collision
+
+    if best[0] >= 0.0:
+        return best[1:]
+
+    return math.nan, math.nan, math.nan
+
+
+def _get_grid_arrays(grid) -> tuple:
+    return (float(grid.origin_x), float(grid.origin_z), float(grid.cell_xsize),
+            float(grid.cell_zsize), grid.xsize, grid.zsize, grid.entry_children,
+            grid.entry_offsets, grid.entry_triangles)
+
 
-        if collision[0] >= 0.0:
-            collisions.append(collision)
+# Arguments of the grid kernels for collisions without a grid: every position falls outside of it.
+_NO_GRID_ARRAYS = (0.0, 0.0, 1.0, 1.0, 0, 0, numpy.zeros(0, dtype=numpy.int32),
+                   numpy.zeros(1, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int32))
 
-    if collisions:
-        return min(collisions)[1:]
+
+@numba.jit(nopython=True, nogil=True, cache=True)
+def _collide_vertical_ray_and_grid(
+    x: float,
+    y: float,
+    z: float,
+    dz: float,
+    triangles: numpy.array,
+    origin_x: float,
+    origin_z: float,
+    cell_xsize: float,
+    cell_zsize: float,
+    xsize: int,
+    zsize: int,
+    entry_children: numpy.array,
+    entry_offsets: numpy.array,
+    entry_triangles: numpy.array,
+) -> tuple[float, float, float]:
+    # The grid is in BOL coordinates, where the Y axis of the collision is the negated Z axis.
+    bol_z = -y
+    ix = math.floor((x - origin_x) / cell_xsize)
+    iz = math.floor((bol_z - origin_z) / cell_zsize)
+    if not (0 <= ix < xsize and 0 <= iz < zsize):
+        return math.nan, math.nan, math.nan
+
+    entry = iz * xsize + ix
+    cell_x = origin_x + ix * cell_xsize
+    cell_z = origin_z + iz * cell_zsize
+    while entry_children[entry]:
+        cell_xsize /= 2.0
+        cell_zsize /= 2.0
+        quadrant = 0
+        if x >= cell_x + cell_xsize:
+            cell_x += cell_xsize
+            quadrant += 1
+        if bol_z >= cell_z + cell_zsize:
+            cell_z += cell_zsize
+            quadrant += 2
+        entry = entry_children[entry] + quadrant
+
+    best = (-1.0, 0.0, 0.0, 0.0)
+    for i in range(entry_offsets[entry], entry_offsets[entry + 1]):
+        collision = _collide_ray_and_triangle_at(x, y, z, 0.0, 0.0, dz, triangles,
+                                                 entry_triangles[i])
+        if collision[0] >= 0.0 and _is_closer_collision(collision, best):
+            best = collision
+
+    if best[0] >= 0.0:
+        return best[1:]
 
     return math.nan, math.nan, math.nan
+
+
+@numba.jit(nopython=True, nogil=True, cache=True)
+def _build_bvh(triangles: numpy.array, leaf_size: int) -> tuple[numpy.array, numpy.array,
+                                                                 numpy.array]:
+    """
+    Builds a bounding volume hierarchy over the given triangles (N x 9), by splitting the triangles
+    in halves along the longest axis of their centroids, until the leaf size is reached.
+
+    Returns the nodes (M x 4: left child, right child, first triangle and triangle count; leaves
+    have no children), the bounding boxes of the nodes (M x 6: minimum and maximum), and the
+    triangle indices that the leaves refer to. The root is the first node.
+    """
+    count = len(triangles)
+    order = numpy.arange(count)
+    minimums = numpy.empty((count, 3))
+    maximums = numpy.empty((count, 3))
+    centroids = numpy.empty((count, 3))
+    for t in range(count):
+        for axis in range(3):
+            a = triangles[t, axis]
+            b = triangles[t, axis + 3]
+            c = triangles[t, axis + 6]
+            minimums[t, axis] = min(a, b, c)
+            maximums[t, axis] = max(a, b, c)
+            centroids[t, axis] = (a + b + c) / 3.0
+
+    max_nodes = max(1, 2 * count)
+    nodes = numpy.full((max_nodes, 4), -1, dtype=numpy.int32)
+    bounds = numpy.empty((max_nodes, 6))
+    if count == 0:
+        return nodes[:0], bounds[:0], order
+
+    # Pending nodes: node index, first and last (exclusive) position in `order`.
+    stack = numpy.empty((max_nodes, 3), dtype=numpy.int64)
+    stack[0, 0], stack[0, 1], stack[0, 2] = 0, 0, count
+    stack_size = 1
+    node_count = 1
+    while stack_size:
+        stack_size -= 1
+        node, first, last = stack[stack_size]
+
+        low = numpy.full(3, numpy.inf)
+        high = numpy.full(3, -numpy.inf)
+        centroid_low = numpy.full(3, numpy.inf)
+        centroid_high = numpy.full(3, -numpy.inf)
+        for i in range(first, last):
+            t = order[i]
+            for axis in range(3):
+                low[axis] = min(low[axis], minimums[t, axis])
+                high[axis] = max(high[axis], maximums[t, axis])
+                centroid_low[axis] = min(centroid_low[axis], centroids[t, axis])
+                centroid_high[axis] = max(centroid_high[axis], centroids[t, axis])
+        for axis in range(3):
+            bounds[node, axis] = low[axis] - BVH_MARGIN
+            bounds[node, axis + 3] = high[axis] + BVH_MARGIN
+
+        spans = centroid_high - centroid_low
+        axis = numpy.argmax(spans)
+        if last - first <= leaf_size or spans[axis] <= 0.0:
+            nodes[node, 2] = first
+            nodes[node, 3] = last - first
+            continue
+
+        segment = order[first:last]
+        order[first:last] = segment[numpy.argsort(centroids[segment, axis], kind='mergesort')]
+        middle = (first + last) // 2
+
+        left = node_count
+        right = node_count + 1
+        node_count += 2
+        nodes[node, 0] = left
+        nodes[node, 1] = right
+        stack[stack_size, 0], stack[stack_size, 1], stack[stack_size, 2] = left, first, middle
+        stack_size += 1
+        stack[stack_size, 0], stack[stack_size, 1], stack[stack_size, 2] = right, middle, last
+        stack_size += 1
+
+    return nodes[:node_count], bounds[:node_count], order
+
+
+@numba.jit(nopython=True, nogil=True, cache=True)
+def _clip_ray_to_slab(
+    origin: float,
+    inverse: float,
+    low: float,
+    high: float,
+    near: float,
+    far: float,
+) -> tuple[float, float]:
+    if math.isinf(inverse):
+        # Parallel to the slab.
+        if origin < low or origin > high:
+            return 0.0, -1.0
+        return near, far
+    t0 = (low - origin) * inverse
+    t1 = (high - origin) * inverse
+    if t0 > t1:
+        t0, t1 = t1, t0
+    return max(near, t0), min(far, t1)
+
+
+@numba.jit(nopython=True, nogil=True, cache=True)
+def _intersect_ray_and_box(
+    x: float,
+    y: float,
+    z: float,
+    inverse_dx: float,
+    inverse_dy: float,
+    inverse_dz: float,
+    bounds: numpy.array,
+    node: int,
+) -> float:
+    """
+    Returns the distance along the ray (in units of its direction) at which it enters the box of
+    the node, or -1 if it misses it. Rays that start inside the box enter it at 0.
+    """
+    near, far = _clip_ray_to_slab(x, inverse_dx, bounds[node, 0], bounds[node, 3], 0.0, math.inf)
+    if near > far:
+        return -1.0
+    near, far = _clip_ray_to_slab(y, inverse_dy, bounds[node, 1], bounds[node, 4], near, far)
+    if near > far:
+        return -1.0
+    near, far = _clip_ray_to_slab(z, inverse_dz, bounds[node, 2], bounds[node, 5], near, far)
+    if near > far:
+        return -1.0
+    return near
+
+
+@numba.jit(nopython=True, nogil=True, cache=True)
+def _collide_ray_and_bvh(
+    x: float,
+    y: float,
+    z: float,
+    dx: float,
+    dy: float,
+    dz: float,
+    triangles: numpy.array,
+    nodes: numpy.array,
+    bounds: numpy.array,
+    order: numpy.array,
+) -> tuple[float, float, float]:
+    best = (-1.0, 0.0, 0.0, 0.0)
+    if len(nodes) == 0:
+        return math.nan, math.nan, math.nan
+
+    inverse_dx = 1.0 / dx if dx != 0.0 else math.inf
+    inverse_dy = 1.0 / dy if dy != 0.0 else math.inf
+    inverse_dz = 1.0 / dz if dz != 0.0 else math.inf
+
+    # Pending nodes, with the distance at which the ray enters them.
+    stack = numpy.empty(128, dtype=numpy.int32)
+    stack_distances = numpy.empty(128)
+    stack[0] = 0
+    stack_distances[0] = _intersect_ray_and_box(x, y, z, inverse_dx, inverse_dy, inverse_dz,
+                                                bounds, 0)
+    stack_size = 1 if stack_distances[0] >= 0.0 else 0
+    while stack_size:
+        stack_size -= 1
+        node = stack[stack_size]
+        if best[0] >= 0.0 and stack_distances[stack_size] > best[0]:
+            # Farther than the closest collision found so far.
+            continue
+
+        left = nodes[node, 0]
+        if left < 0:
+            first = nodes[node, 2]
+            for i in range(first, first + nodes[node, 3]):
+                collision = _collide_ray_and_triangle_at(x, y, z, dx, dy, dz, triangles, order[i])
+                if collision[0] >= 0.0 and _is_closer_collision(collision, best):
+                    best = collision
+            continue
+
+        # Push the nearest child last, so that it is visited first, and the farther one can be
+        # skipped if a collision is found before it.
+        right = nodes[node, 1]
+        left_distance = _intersect_ray_and_box(x, y, z, inverse_dx, inverse_dy, inverse_dz,
+                                               bounds, left)
+        right_distance = _intersect_ray_and_box(x, y, z, inverse_dx, inverse_dy, inverse_dz,
+                                                bounds, right)
+        if left_distance > right_distance:
+            left, right = right, left
+            left_distance, right_distance = right_distance, left_distance
+        for child, child_distance in ((right, right_distance), (left, left_distance)):
+            if child_distance >= 0.0:
+                stack[stack_size] = child
+                stack_distances[stack_size] = child_distance
+                stack_size += 1
+
+    if best[0] >= 0.0:
+        return best[1:]
+
+    return math.nan, math.nan, math.nan
+
+
+@numba.jit(nopython=True, nogil=True, cache=True, parallel=True)
+def _collide_vertical_rays(
+    origins: numpy.array,
+    dz: float,
+    triangles: numpy.array,
+    nodes: numpy.array,
+    bounds: numpy.array,
+    order: numpy.array,
+    origin_x: float,
+    origin_z: float,
+    cell_xsize: float,
+    cell_zsize: float,
+    xsize: int,
+    zsize: int,
+    entry_children: numpy.array,
+    entry_offsets: numpy.array,
+    entry_triangles: numpy.array,
+) -> numpy.array:
+    heights = numpy.empty(len(origins))
+    for i in numba.prange(len(origins)):
+        x, y, z = origins[i, 0], origins[i, 1], origins[i, 2]
+        place_at = _collide_vertical_ray_and_grid(x, y, z, dz, triangles, origin_x, origin_z,
+                                                  cell_xsize, cell_zsize, xsize, zsize,
+                                                  entry_children, entry_offsets, entry_triangles)
+        if math.isnan(place_at[0]):
+            place_at = _collide_ray_and_bvh(x, y, z, 0.0, 0.0, dz, triangles, nodes, bounds, order)
+        heights[i] = place_at[2]
+    return heights
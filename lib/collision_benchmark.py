@@ -0,0 +1,261 @@
+"""
+Benchmarks for the `collision` module.
+
+Usage:
+
+    python -m lib.collision_benchmark [<.bco file>...]
+
+When no file is given, a synthetic terrain of about 60k triangles (180k vertices and edge centers)
+is generated and used instead.
+"""
+import os
+import random
+import sys
+import timeit
+
+import numpy
+
+from . import BCOllider
+from .collision import Collision, SnappingPoints
+from .vectors import Line, Vector3
+
+
+def make_synthetic_terrain(quads_per_side: int = 175,
+                           size: float = 100000.0,
+                           seed: int = 0) -> 'list[tuple[Vector3, Vector3, Vector3]]':
+    """
+    Generates a bumpy terrain (in BOL coordinates) of two triangles per quad.
+    """
+    rng = random.Random(seed)
+    step = size / quads_per_side
+    heights = [[rng.uniform(-200.0, 200.0) for _ in range(quads_per_side + 1)]
+               for _ in range(quads_per_side + 1)]
+
+    def vertex(i, j):
+        return Vector3(i * step - size / 2.0, heights[i][j], j * step - size / 2.0)
+
+    triangles = []
+    for i in range(quads_per_side):
+        for j in range(quads_per_side):
+            v1, v2, v3, v4 = vertex(i, j), vertex(i + 1, j), vertex(i + 1, j + 1), vertex(i, j + 1)
+            triangles.append((v1, v2, v3))
+            triangles.append((v1, v3, v4))
+    return triangles
+
+
+def make_grid(triangles: list, cells_per_side: int = 128) -> BCOllider.CollisionGrid:
+    """
+    Generates a spatial grid for the given triangles (in BOL coordinates), as BCO files have.
+    """
+    vertices = numpy.array([[(v.x, v.z) for v in triangle] for triangle in triangles])
+    low = vertices.min(axis=(0, 1))
+    high = vertices.max(axis=(0, 1))
+    cell_size = numpy.ceil((high - low) / cells_per_side) + 1
+    first_cells = ((vertices.min(axis=1) - low) // cell_size).astype(int)
+    last_cells = ((vertices.max(axis=1) - low) // cell_size).astype(int)
+
+    cells = [[] for _ in range(cells_per_side * cells_per_side)]
+    for i, ((x0, z0), (x1, z1)) in enumerate(zip(first_cells.tolist(), last_cells.tolist())):
+        for iz in range(z0, z1 + 1):
+            for ix in range(x0, x1 + 1):
+                cells[iz * cells_per_side + ix].append(i)
+
+    children = numpy.zeros(len(cells), dtype=numpy.int32)
+    offsets = numpy.zeros(len(cells) + 1, dtype=numpy.int64)
+    numpy.cumsum([len(cell) for cell in cells], out=offsets[1:])
+    triangle_indices = numpy.array([i for cell in cells for i in cell], dtype=numpy.int32)
+    return BCOllider.CollisionGrid(int(low[0]), int(low[1]), int(cell_size[0]), int(cell_size[1]),
+                                   cells_per_side, cells_per_side, children, offsets,
+                                   triangle_indices)
+
+
+def load_bco(filepath: str) -> 'tuple[list[tuple[Vector3, Vector3, Vector3]], object]':
+    """
+    Returns the triangles of a BCO file, and its spatial grid.
+    """
+    bco = BCOllider.RacetrackCollision()
+    with open(filepath, 'rb') as f:
+        bco.load_file(f)
+    vertices = bco.vertex_positions[bco.triangle_indices].tolist()
+    triangles = [(Vector3(*v1), Vector3(*v2), Vector3(*v3)) for v1, v2, v3 in vertices]
+    return triangles, bco.grid
+
+
+def benchmark_collide_ray(name: str, triangles: list, ray_count: int = 200):
+    """
+    Compares the bounding volume hierarchy with testing every triangle, on vertical rays (as used
+    for grounding) and on rays in random directions (as used for placing objects in the 3D view).
+    """
+    build_time = min(timeit.repeat(lambda: Collision(triangles), number=1, repeat=3))
+    collision = Collision(triangles)
+    extent = collision.extent
+
+    rng = random.Random(0)
+
+    def position():
+        return Vector3(rng.uniform(extent[0], extent[3]), rng.uniform(extent[1], extent[4]),
+                       extent[5] + 1000.0)
+
+    rays = {
+        'downwards': [Line(position(), Vector3(0.0, 0.0, -1.0)) for _ in range(ray_count)],
+        'random': [
+            Line(position(), Vector3(rng.uniform(-1.0, 1.0), rng.uniform(-1.0, 1.0), -0.5))
+            for _ in range(ray_count)
+        ],
+    }
+
+    # Compile the functions before timing them.
+    collision.collide_ray(rays['random'][0])
+    collision.collide_ray_brute_force(rays['random'][0])
+
+    results = []
+    for kind, kind_rays in rays.items():
+        for ray in kind_rays:
+            expected = collision.collide_ray_brute_force(ray)
+            result = collision.collide_ray(ray)
+            assert (expected is None) == (result is None)
+            if expected is not None:
+                assert (result.x, result.y, result.z) == (expected.x, expected.y, expected.z)
+
+        brute_force_time = min(
+            timeit.repeat(lambda: [collision.collide_ray_brute_force(ray) for ray in kind_rays],
+                          number=1,
+                          repeat=3))
+        bvh_time = min(
+            timeit.repeat(lambda: [collision.collide_ray(ray) for ray in kind_rays],
+                          number=1,
+                          repeat=3))
+        results.append(f'{kind}: {brute_force_time / ray_count * 1e6:.1f} us -> '
+                       f'{bvh_time / ray_count * 1e6:.1f} us per ray')
+
+    print(f'{name}: {collision.triangle_count} triangles, {len(collision.bvh_nodes)} nodes, '
+          f'built in {build_time * 1000:.0f} ms | (brute force -> BVH) ' + ' | '.join(results))
+
+
+def benchmark_construction(name: str, triangles: list):
+    """
+    Compares building the collision from `Vector3` triples and from vertex and face arrays.
+    """
+    vertices = numpy.array([(v.x, v.y, v.z) for triangle in triangles for v in triangle])
+    faces = numpy.arange(len(vertices)).reshape(-1, 3)
+
+    results = []
+    for label, function in (
+        ('Vector3 triples', lambda: Collision(triangles)),
+        ('arrays', lambda: Collision.from_arrays(vertices, faces)),
+    ):
+        elapsed = min(timeit.repeat(function, number=1, repeat=3))
+        results.append(f'{label}: {elapsed * 1000:.0f} ms')
+
+    print(f'{name}: built from ' + ' | '.join(results))
+
+
+def benchmark_grounding(name: str, triangles: list, grid: BCOllider.CollisionGrid,
+                        ray_count: int = 2000):
+    """
+    Compares grounding positions with and without the spatial grid, one by one and in a batch.
+    """
+    collision = Collision(triangles)
+    grid_collision = Collision(triangles, grid)
+    extent = collision.extent
+
+    rng = random.Random(0)
+    positions = numpy.array([(rng.uniform(extent[0], extent[3]), rng.uniform(-500.0, 500.0),
+                              -rng.uniform(extent[1], extent[4])) for _ in range(ray_count)])
+    position_list = positions.tolist()
+
+    def ground_one_by_one(instance):
+        return [instance.collide_ray_closest(x, z, y) for x, y, z in position_list]
+
+    expected = ground_one_by_one(collision)
+    for instance in (collision, grid_collision):
+        assert ground_one_by_one(instance) == expected
+        heights = instance.collide_rays_closest(positions).tolist()
+        assert [None if height != height else height for height in heights] == expected
+
+    results = []
+    for label, function in (
+        ('BVH', lambda: ground_one_by_one(collision)),
+        ('grid', lambda: ground_one_by_one(grid_collision)),
+        ('batch BVH', lambda: collision.collide_rays_closest(positions)),
+        ('batch grid', lambda: grid_collision.collide_rays_closest(positions)),
+    ):
+        elapsed = min(timeit.repeat(function, number=1, repeat=3))
+        results.append(f'{label}: {elapsed * 1000:.2f} ms')
+
+    entry_sizes = numpy.diff(grid.entry_offsets)[grid.entry_children == 0]
+    print(f'{name}: {len(entry_sizes)} cells, {entry_sizes.mean():.1f} triangles per cell | '
+          f'grounding {ray_count} positions: ' + ' | '.join(results))
+
+
+def benchmark_snapping(name: str, triangles: list, query_count: int = 50):
+    """
+    Compares picking snapping points by testing every point and with the spatial index, from the 3D
+    view (random rays) and from the top-down view (vertical rays, clipped at their origin).
+    """
+    collision = Collision(triangles)
+    extent = collision.extent
+
+    rng = random.Random(0)
+    rays = []
+    for i in range(query_count):
+        if i % 2:
+            origin = Vector3(rng.uniform(extent[0], extent[3]), rng.uniform(extent[1], extent[4]),
+                             extent[5] + 1000.0)
+            rays.append((Line(origin, Vector3(0.0, 0.0, -1.0)), origin.z, 50.0))
+        else:
+            origin = Vector3(rng.uniform(extent[0], extent[3]), rng.uniform(extent[1], extent[4]),
+                             extent[5] + 5000.0)
+            direction = Vector3(rng.uniform(-1.0, 1.0), rng.uniform(-1.0, 1.0), -0.5)
+            rays.append((Line(origin, direction), None, 25.0))
+
+    results = []
+    for label, points, snapping_points in (
+        ('vertices', collision.vertices, collision.vertex_snapping_points),
+        ('edge centers', collision.edge_centers, collision.edge_center_snapping_points),
+        ('face centers', collision.face_centers, collision.face_center_snapping_points),
+    ):
+        build_time = min(
+            timeit.repeat(lambda: SnappingPoints(snapping_points.positions), number=1, repeat=3))
+        for ray, clip_y, radius in rays:
+            expected = Collision.get_closest_point(ray, points, clip_y, radius)
+            result = snapping_points.get_closest_point(ray, clip_y, radius)
+            assert (result.x, result.y, result.z) == (expected.x, expected.y, expected.z)
+
+        def brute_force(rays):
+            return [Collision.get_closest_point(ray, points, clip_y, radius)
+                    for ray, clip_y, radius in rays]
+
+        def indexed(rays):
+            return [snapping_points.get_closest_point(ray, clip_y, radius)
+                    for ray, clip_y, radius in rays]
+
+        # Testing every point is slow enough that a few rays suffice.
+        brute_force_time = min(timeit.repeat(lambda: brute_force(rays[:4]), number=1,
+                                             repeat=3)) / 4
+        index_time = min(timeit.repeat(lambda: indexed(rays), number=1, repeat=3)) / len(rays)
+        results.append(f'{label} ({len(points)}, indexed in {build_time * 1000:.0f} ms): '
+                       f'{brute_force_time * 1000:.1f} ms -> {index_time * 1e6:.1f} us')
+
+    print(f'{name}: snapping (every point -> index) ' + ' | '.join(results))
+
+
+def main(argv: list[str]):
+    if argv:
+        for filepath in argv:
+            triangles, grid = load_bco(filepath)
+            benchmark_construction(os.path.basename(filepath), triangles)
+            benchmark_collide_ray(os.path.basename(filepath), triangles)
+            benchmark_snapping(os.path.basename(filepath), triangles)
+            if grid is not None:
+                benchmark_grounding(os.path.basename(filepath), triangles, grid)
+    else:
+        triangles = make_synthetic_terrain()
+        benchmark_construction('synthetic terrain', triangles)
+        benchmark_collide_ray('synthetic terrain', triangles)
+        benchmark_snapping('synthetic terrain', triangles)
+        benchmark_grounding('synthetic terrain', triangles, make_grid(triangles))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,171 @@
+"""
+Unit tests for the `collision` module.
+"""
+import random
+
+import numpy
+
+from .BCOllider import CollisionGrid
+from .collision import Collision
+from .vectors import Line, Vector3
+
+
+def _make_triangles(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+
+    def vertex(center):
+        return Vector3(*(c + rng.uniform(-500.0, 500.0) for c in center))
+
+    triangles = []
+    for _ in range(count):
+        center = (rng.uniform(-5000.0, 5000.0), rng.uniform(-1000.0, 1000.0),
+                  rng.uniform(-5000.0, 5000.0))
+        triangles.append((vertex(center), vertex(center), vertex(center)))
+    return triangles
+
+
+def test_construction_from_arrays():
+    triangles = _make_triangles(50)
+    # Degenerate triangle; left out of the ray casts, but not of the snapping points.
+    triangles.append((Vector3(1.0, 2.0, 3.0), Vector3(1.0, 2.0, 3.0), Vector3(4.0, 5.0, 6.0)))
+    collision = Collision(triangles)
+
+    vertices = numpy.array([(v.x, v.y, v.z) for triangle in triangles for v in triangle])
+    faces = numpy.arange(len(vertices)).reshape(-1, 3)[:, (1, 2, 0)]
+    array_collision = Collision.from_arrays(vertices, faces)
+
+    assert collision.triangle_count == len(triangles) - 1
+    assert len(collision.vertices) == len(triangles) * 3
+    assert len(collision.face_centers) == len(triangles)
+    assert len(collision.edge_centers) == len(triangles) * 3
+    assert (collision.vertices[0].x, collision.vertices[0].y,
+            collision.vertices[0].z) == (triangles[0][0].x, -triangles[0][0].z, triangles[0][0].y)
+    v1, v2, v3 = (Vector3(v.x, -v.z, v.y) for v in triangles[1])
+    center = (v1 + v2 + v3) / 3.0
+    assert (collision.face_centers[1].x, collision.face_centers[1].y,
+            collision.face_centers[1].z) == (center.x, center.y, center.z)
+    center = (v2 + v3) / 2.0
+    assert (collision.edge_centers[5].x, collision.edge_centers[5].y,
+            collision.edge_centers[5].z) == (center.x, center.y, center.z)
+
+    positions = collision.flat_triangles.reshape(-1, 3)
+    assert collision.extent == (*positions.min(axis=0), *positions.max(axis=0))
+    assert collision.triangles[1].origin.x == v1.x
+
+    # Same triangles, but starting at a different vertex.
+    assert array_collision.triangle_count == collision.triangle_count
+    assert numpy.allclose(numpy.sort(array_collision.face_center_positions, axis=0),
+                          numpy.sort(collision.face_center_positions, axis=0))
+    assert array_collision.extent == collision.extent
+
+
+def test_collide_ray():
+    collision = Collision(_make_triangles(2000))
+    assert len(collision.bvh_triangles) == collision.triangle_count
+
+    rng = random.Random(1)
+    hits = 0
+    for i in range(500):
+        origin = Vector3(rng.uniform(-6000.0, 6000.0), rng.uniform(-6000.0, 6000.0),
+                         rng.uniform(-2000.0, 2000.0))
+        if i % 2:
+            direction = Vector3(0.0, 0.0, rng.choice((-1.0, 1.0)))
+        else:
+            direction = Vector3(rng.uniform(-1.0, 1.0), rng.uniform(-1.0, 1.0),
+                                rng.uniform(-1.0, 1.0))
+        ray = Line(origin, direction)
+
+        expected = collision.collide_ray_brute_force(ray)
+        result = collision.collide_ray(ray)
+        if expected is None:
+            assert result is None
+        else:
+            hits += 1
+            assert (result.x, result.y, result.z) == (expected.x, expected.y, expected.z)
+    assert hits > 100
+
+
+def test_collide_ray_without_triangles():
+    collision = Collision([])
+    assert collision.collide_ray(Line(Vector3(0.0, 0.0, 0.0), Vector3(0.0, 0.0, -1.0))) is None
+    assert collision.collide_ray_downwards(0.0, 0.0) is None
+
+
+def test_collide_vertical_ray_with_grid():
+    triangles = [
+        (Vector3(0.0, 0.0, 0.0), Vector3(100.0, 0.0, 0.0), Vector3(0.0, 0.0, 100.0)),
+        # Degenerate triangle; left out of the collision.
+        (Vector3(0.0, 0.0, 0.0), Vector3(0.0, 0.0, 0.0), Vector3(0.0, 0.0, 0.0)),
+        (Vector3(0.0, 200.0, 0.0), Vector3(100.0, 200.0, 0.0), Vector3(0.0, 200.0, 100.0)),
+        (Vector3(0.0, -50.0, 0.0), Vector3(100.0, -50.0, 0.0), Vector3(0.0, -50.0, 100.0)),
+    ]
+    # A single cell that lists all the triangles but the last one.
+    grid = CollisionGrid(-1000, -1000, 2000, 2000, 1, 1, numpy.zeros(1), numpy.array((0, 3)),
+                         numpy.array((0, 1, 2)))
+    collision = Collision(triangles, grid)
+    assert collision.grid.entry_triangles.tolist() == [0, 1]
+
+    assert collision.collide_ray_downwards(10.0, 10.0) == 200.0
+    assert collision.collide_ray_downwards(10.0, 10.0, 100.0) == 0.0
+    assert collision.collide_ray_closest(10.0, 10.0, 150.0) == 200.0
+    # Not in the cell; found by the fallback.
+    assert collision.collide_ray_downwards(10.0, 10.0, -10.0) == -50.0
+    # Outside of the grid.
+    assert collision.collide_ray_downwards(3000.0, 10.0) is None
+
+    heights = collision.collide_rays_closest(((10.0, 150.0, 10.0), (10.0, -40.0, 10.0),
+                                              (3000.0, 0.0, 10.0)))
+    assert heights.tolist()[:2] == [200.0, -50.0]
+    assert numpy.isnan(heights[2])
+
+
+def test_collide_rays():
+    collision = Collision(_make_triangles(2000))
+    rng = random.Random(2)
+    positions = [(rng.uniform(-6000.0, 6000.0), rng.uniform(-2000.0, 2000.0),
+                  rng.uniform(-6000.0, 6000.0)) for _ in range(300)]
+
+    heights = collision.collide_rays_closest(positions).tolist()
+    expected = [collision.collide_ray_closest(x, z, y) for x, y, z in positions]
+    assert [None if height != height else height for height in heights] == expected
+    assert sum(height is not None for height in expected) > 100
+
+    heights = collision.collide_rays_downwards([(x, z) for x, _y, z in positions]).tolist()
+    expected = [collision.collide_ray_downwards(x, z) for x, _y, z in positions]
+    assert [None if height != height else height for height in heights] == expected
+
+    assert collision.collide_rays_closest(numpy.zeros((0, 3))).shape == (0, )
+
+
+def test_get_closest_point():
+    collision = Collision(_make_triangles(500))
+    rng = random.Random(3)
+    for points, snapping_points in (
+        (collision.vertices, collision.vertex_snapping_points),
+        (collision.edge_centers, collision.edge_center_snapping_points),
+        (collision.face_centers, collision.face_center_snapping_points),
+    ):
+        assert len(snapping_points) == len(points)
+        for i in range(100):
+            origin = Vector3(rng.uniform(-6000.0, 6000.0), rng.uniform(-6000.0, 6000.0),
+                             rng.uniform(-2000.0, 2000.0))
+            if i % 2:
+                direction = Vector3(0.0, 0.0, -1.0)
+                clip_y = origin.z
+            else:
+                direction = Vector3(rng.uniform(-1.0, 1.0), rng.uniform(-1.0, 1.0),
+                                    rng.uniform(-1.0, 1.0))
+                clip_y = None
+            ray = Line(origin, direction)
+            radius = rng.choice((0, 25, 200))
+
+            expected = Collision.get_closest_point(ray, points, clip_y, radius)
+            result = snapping_points.get_closest_point(ray, clip_y, radius)
+            if expected is None:
+                assert result is None
+            else:
+                assert (result.x, result.y, result.z) == (expected.x, expected.y, expected.z)
+
+    ray = Line(Vector3(0.0, 0.0, -9000.0), Vector3(0.0, 0.0, -1.0))
+    assert collision.vertex_snapping_points.get_closest_point(ray, -9000.0) is None
+    assert Collision([]).vertex_snapping_points.get_closest_point(ray) is None
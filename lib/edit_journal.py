@@ -0,0 +1,286 @@
+"""
+Crash-safe journal of the edits made to a document.
+
+The states of the document (given as versions from the `undo_history` module) are appended to a
+journal file as compressed deltas against the previous state, with a keyframe at the start of the
+journal. The deltas that the undo history has already computed are reused where possible. Writes are performed in a background thread, so that recording a state costs
+the UI thread no disk I/O, and each batch of records is flushed to disk before the next one.
+
+Each record is framed with its length and checksum; when the journal is read, records that were
+only partially written (e.g. because the editor crashed) are discarded.
+"""
+import os
+import queue
+import struct
+import threading
+import zlib
+from typing import Iterable
+
+from .undo_history import DocumentVersion, apply_delta, compute_delta
+
+MAGIC = b'MKDDJRN1'
+
+KEYFRAME_RECORD = 0
+DELTA_RECORD = 1
+
+# Record type, payload size, and CRC-32 of the payload.
+RECORD_HEADER_STRUCT = struct.Struct('>BII')
+COUNT_STRUCT = struct.Struct('>H')
+SIZE_STRUCT = struct.Struct('>I')
+ENEMY_PATH_STRUCT = struct.Struct('>?i')
+DELTA_STRUCT = struct.Struct('>HIII')
+
+# Commands for the writer thread.
+_RECORD = 0
+_RESET = 1
+_CLOSE = 2
+
+
+def get_journal_filepath(filepath: str) -> str:
+    return filepath + '.journal'
+
+
+def _encode_enemy_path_data(enemy_path_data: 'tuple[tuple[bool, int]]') -> 'list[bytes]':
+    parts = [COUNT_STRUCT.pack(len(enemy_path_data))]
+    parts.extend(ENEMY_PATH_STRUCT.pack(empty, path_id) for empty, path_id in enemy_path_data)
+    return parts
+
+
+def _encode_keyframe(chunks: 'tuple[bytes]', enemy_path_data) -> bytes:
+    parts = _encode_enemy_path_data(enemy_path_data)
+    parts.append(COUNT_STRUCT.pack(len(chunks)))
+    for chunk in chunks:
+        parts.append(SIZE_STRUCT.pack(len(chunk)))
+        parts.append(chunk)
+    return b''.join(parts)
+
+
+def _encode_deltas(chunk_deltas: 'Iterable[tuple[int, int, bytes] | None]',
+                   enemy_path_data) -> bytes:
+    deltas = [(i, delta) for i, delta in enumerate(chunk_deltas) if delta is not None]
+
+    parts = _encode_enemy_path_data(enemy_path_data)
+    parts.append(COUNT_STRUCT.pack(len(deltas)))
+    for i, (start, end, data) in deltas:
+        parts.append(DELTA_STRUCT.pack(i, start, end, len(data)))
+        parts.append(data)
+    return b''.join(parts)
+
+
+class _Reader:
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, struct_: struct.Struct) -> tuple:
+        values = struct_.unpack_from(self.data, self.offset)
+        self.offset += struct_.size
+        return values
+
+    def read(self, size: int) -> bytes:
+        data = self.data[self.offset:self.offset + size]
+        if len(data) != size:
+            raise ValueError('Unexpected end of record.')
+        self.offset += size
+        return data
+
+    def read_enemy_path_data(self) -> 'tuple[tuple[bool, int]]':
+        count, = self.unpack(COUNT_STRUCT)
+        return tuple(self.unpack(ENEMY_PATH_STRUCT) for _ in range(count))
+
+
+def read_journal(filepath: str) -> 'tuple[tuple[bytes], tuple] | None':
+    """
+    Replays the journal, and returns the chunks and the enemy path data of the last state that was
+    completely written, or `None` if the journal holds no state other than its keyframe.
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    if not data.startswith(MAGIC):
+        return None
+
+    keyframe_chunks = None
+    chunks = None
+    enemy_path_data = None
+
+    offset = len(MAGIC)
+    while offset + RECORD_HEADER_STRUCT.size <= len(data):
+        record_type, size, checksum = RECORD_HEADER_STRUCT.unpack_from(data, offset)
+        offset += RECORD_HEADER_STRUCT.size
+        payload = data[offset:offset + size]
+        offset += size
+        if len(payload) != size or zlib.crc32(payload) != checksum:
+            break  # Partially written record.
+
+        try:
+            reader = _Reader(zlib.decompress(payload))
+            record_enemy_path_data = reader.read_enemy_path_data()
+            if record_type == KEYFRAME_RECORD:
+                count, = reader.unpack(COUNT_STRUCT)
+                record_chunks = []
+                for _ in range(count):
+                    chunk_size, = reader.unpack(SIZE_STRUCT)
+                    record_chunks.append(reader.read(chunk_size))
+                keyframe_chunks = chunks = tuple(record_chunks)
+            elif record_type == DELTA_RECORD and chunks is not None:
+                record_chunks = list(chunks)
+                count, = reader.unpack(COUNT_STRUCT)
+                for _ in range(count):
+                    i, start, end, data_size = reader.unpack(DELTA_STRUCT)
+                    record_chunks[i] = apply_delta(record_chunks[i],
+                                                   (start, end, reader.read(data_size)))
+                chunks = tuple(record_chunks)
+            else:
+                break
+        except (ValueError, IndexError, struct.error, zlib.error):
+            break
+
+        enemy_path_data = record_enemy_path_data
+
+    if chunks is None or chunks == keyframe_chunks:
+        return None
+
+    return chunks, enemy_path_data
+
+
+class EditJournal:
+    """
+    Append-only journal of the states of a document, written in a background thread.
+
+    The first state that is recorded (and the first one after a reset) is written as a keyframe;
+    subsequent states are written as deltas against the previous one. When a version is based on
+    the previously recorded version, its deltas are written as they are; otherwise (e.g. after an
+    undo), the deltas are computed in the writer thread.
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.error = None
+
+        # The last version that was recorded, which the next version is written against.
+        self._previous_version = None
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='EditJournal', daemon=True)
+        self._thread.start()
+
+    def record(self, version: DocumentVersion,
+               enemy_path_data: 'tuple[tuple[bool, int]]' = ()):
+        """
+        Queues a state of the document.
+        """
+        previous_version = self._previous_version
+        self._previous_version = version
+
+        if previous_version is None:
+            record = (KEYFRAME_RECORD, version.get_chunks())
+        elif version is previous_version:
+            record = (DELTA_RECORD, ())
+        elif version.base is previous_version:
+            record = (DELTA_RECORD, version.deltas)
+        else:
+            previous_chunks = previous_version.get_chunks()
+            chunks = version.get_chunks()
+            if len(previous_chunks) == len(chunks):
+                # Evaluated lazily, in the writer thread.
+                record = (DELTA_RECORD, map(compute_delta, previous_chunks, chunks))
+            else:
+                record = (KEYFRAME_RECORD, chunks)
+
+        self._queue.put((_RECORD, *record, tuple(enemy_path_data)))
+
+    def reset(self):
+        """
+        Discards the states recorded so far (e.g. once the document has been saved).
+        """
+        self._previous_version = None
+        self._queue.put((_RESET, ))
+
+    def flush(self):
+        """
+        Blocks until all the queued states have been written.
+        """
+        self._queue.join()
+
+    def close(self, delete: bool = False):
+        """
+        Writes the queued states and stops the writer thread. If `delete` is true, the journal
+        file is removed.
+        """
+        self._queue.put((_CLOSE, delete))
+        self._thread.join()
+
+    def _run(self):
+        f = None
+
+        try:
+            f = open(self.filepath, 'wb')
+            f.write(MAGIC)
+        except OSError as error:
+            self.error = error
+            print(f'Edit journal "{self.filepath}" could not be opened: {error}')
+
+        running = True
+        while running:
+            commands = [self._queue.get()]
+            while True:
+                try:
+                    commands.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for command in commands:
+                if command[0] == _RECORD:
+                    self._write_record(f, command)
+                elif command[0] == _RESET:
+                    if f is not None and self.error is None:
+                        try:
+                            f.seek(0)
+                            f.truncate()
+                            f.write(MAGIC)
+                        except OSError as error:
+                            self.error = error
+                elif command[0] == _CLOSE:
+                    running = False
+                    delete = command[1]
+
+            if f is not None and self.error is None:
+                try:
+                    f.flush()
+                    os.fsync(f.fileno())
+                except OSError as error:
+                    self.error = error
+
+            for _command in commands:
+                self._queue.task_done()
+
+        if f is not None:
+            f.close()
+            if delete:
+                try:
+                    os.remove(self.filepath)
+                except OSError:
+                    pass
+
+    def _write_record(self, f, command: tuple):
+        if f is None or self.error is not None:
+            return
+
+        _command_type, record_type, data, enemy_path_data = command
+        if record_type == KEYFRAME_RECORD:
+            body = _encode_keyframe(data, enemy_path_data)
+        else:
+            body = _encode_deltas(data, enemy_path_data)
+
+        payload = zlib.compress(body, 1)
+        try:
+            f.write(RECORD_HEADER_STRUCT.pack(record_type, len(payload), zlib.crc32(payload)))
+            f.write(payload)
+        except OSError as error:
+            self.error = error
+            print(f'Edit journal "{self.filepath}" could not be written: {error}')
@@ -0,0 +1,136 @@
+"""
+Unit tests for the `edit_journal` module.
+"""
+import os
+import tempfile
+
+from .edit_journal import EditJournal, read_journal
+from .libbol_benchmark import make_synthetic_course
+from .undo_history import DocumentVersion
+
+
+def _record_edits(journal: EditJournal, edit_count: int) -> 'list[tuple[bytes]]':
+    bol = make_synthetic_course(enemy_points=500, checkpoints=200, route_points=200)
+    states = []
+    version = None
+    for step in range(edit_count + 1):
+        if step:
+            respawn_point = bol.respawnpoints[step % len(bol.respawnpoints)]
+            respawn_point.position.x += 1.0
+            bol.mark_objects_dirty([respawn_point])
+        version = DocumentVersion.create(bol.encode(extended_format=True), version)
+        journal.record(version, ((False, step), ))
+        states.append(version.get_chunks())
+    return states
+
+
+def test_replay():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = os.path.join(tmp_dir, 'course.bol.journal')
+        journal = EditJournal(filepath)
+        states = _record_edits(journal, 50)
+        journal.close()
+
+        chunks, enemy_path_data = read_journal(filepath)
+        assert chunks == states[-1]
+        assert enemy_path_data == ((False, 50), )
+
+
+def test_deltas_are_small():
+    bol = make_synthetic_course()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = os.path.join(tmp_dir, 'course.bol.journal')
+        journal = EditJournal(filepath)
+        version = DocumentVersion.create(bol.encode(extended_format=True))
+        journal.record(version)
+        journal.flush()
+        keyframe_size = os.path.getsize(filepath)
+
+        bol.respawnpoints[0].position.x += 1.0
+        bol.mark_objects_dirty([bol.respawnpoints[0]])
+        journal.record(DocumentVersion.create(bol.encode(extended_format=True), version))
+        journal.close()
+
+        delta_size = os.path.getsize(filepath) - keyframe_size
+        assert delta_size < 100 < keyframe_size
+
+
+def test_truncated_journal():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = os.path.join(tmp_dir, 'course.bol.journal')
+        journal = EditJournal(filepath)
+        bol = make_synthetic_course(enemy_points=500, checkpoints=200, route_points=200)
+        states = []
+        version = None
+        for step in range(10):
+            bol.respawnpoints[step].position.x += 1.0
+            bol.mark_objects_dirty([bol.respawnpoints[step]])
+            version = DocumentVersion.create(bol.encode(extended_format=True), version)
+            states.append(version.get_chunks())
+            journal.record(version)
+            # Flushing between states, so that every state gets its own record.
+            journal.flush()
+        journal.close()
+
+        with open(filepath, 'rb') as f:
+            data = f.read()
+
+        # A crash in the middle of a write leaves a partial record at the end of the journal.
+        for size in range(len(data) - 1, len(data) - 200, -7):
+            with open(filepath, 'wb') as f:
+                f.write(data[:size])
+            result = read_journal(filepath)
+            assert result is None or result[0] in states[:-1]
+
+
+def test_reset():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = os.path.join(tmp_dir, 'course.bol.journal')
+        journal = EditJournal(filepath)
+        _record_edits(journal, 5)
+        journal.reset()
+        journal.flush()
+        assert read_journal(filepath) is None
+
+        journal.close(delete=True)
+        assert not os.path.exists(filepath)
+
+
+def test_keyframe_is_kept():
+    bol = make_synthetic_course(enemy_points=500, checkpoints=200, route_points=200)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = os.path.join(tmp_dir, 'course.bol.journal')
+        journal = EditJournal(filepath)
+        # Queued at once; the first state is still written as the keyframe.
+        version = DocumentVersion.create(bol.encode(extended_format=True))
+        journal.record(version)
+        bol.respawnpoints[0].position.x += 1.0
+        bol.mark_objects_dirty([bol.respawnpoints[0]])
+        journal.record(DocumentVersion.create(bol.encode(extended_format=True), version))
+        journal.close()
+
+        chunks, _enemy_path_data = read_journal(filepath)
+        assert b''.join(chunks) == bol.to_bytes(extended_format=True)
+
+
+def test_unrelated_versions():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = os.path.join(tmp_dir, 'course.bol.journal')
+        bol = make_synthetic_course(enemy_points=500, checkpoints=200, route_points=200)
+        versions = [DocumentVersion.create(bol.encode(extended_format=True))]
+        for step in range(3):
+            bol.respawnpoints[step].position.x += 1.0
+            bol.mark_objects_dirty([bol.respawnpoints[step]])
+            versions.append(DocumentVersion.create(bol.encode(extended_format=True), versions[-1]))
+
+        journal = EditJournal(filepath)
+        for version in versions:
+            journal.record(version)
+        # As when undoing edits: the recorded versions are no longer based on the previous one.
+        journal.record(versions[1])
+        journal.record(versions[1], ((True, 0), ))
+        journal.close()
+
+        chunks, enemy_path_data = read_journal(filepath)
+        assert chunks == versions[1].get_chunks()
+        assert enemy_path_data == ((True, 0), )
@@ -0,0 +1,185 @@
+"""
+Per-frame profiling of the viewer.
+
+A frame is split in consecutive stages (e.g. picking, collision, routes) that are timed with a lap
+timer, and each category of objects reports the number of draw calls that it submitted and the
+number of objects that it drew. The last frames are kept in a rolling window, which can be shown on
+screen, and written periodically to a CSV or JSON log file.
+
+The profiler does not depend on OpenGL; the owner can provide a `synchronize` function (such as
+`glFinish()`) that is called at the end of each stage, so that the time that the GPU spends on a
+stage is attributed to it rather than to the stage that happens to wait on it.
+"""
+import collections
+import csv
+import json
+import os
+from timeit import default_timer
+
+FrameRecord = collections.namedtuple('FrameRecord', 'frame time total stages draws objects')
+
+
+class FrameProfiler:
+
+    def __init__(self,
+                 history_size: int = 600,
+                 clock: 'callable[[], float]' = default_timer,
+                 synchronize: 'callable[[], None] | None' = None):
+        self.history = collections.deque(maxlen=history_size)
+        self.show_overlay = False
+        self.log_path = None
+        self.log_interval = 1.0
+
+        self._clock = clock
+        self._synchronize = synchronize
+        self._frame_count = 0
+        self._frame_start = None
+        self._stage = None
+        self._stage_start = None
+        self._stages = {}
+        self._draws = {}
+        self._objects = {}
+        self._last_log_write = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.show_overlay or self.log_path is not None
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._frame_start = self._clock()
+        self._stages = {}
+        self._draws = {}
+        self._objects = {}
+        self._stage = None
+        self.begin_stage('setup')
+
+    def begin_stage(self, name: str):
+        """
+        Ends the current stage, and starts the next one. A stage that is entered more than once in
+        the same frame accumulates its time.
+        """
+        if self._frame_start is None:
+            return
+        now = self._end_stage()
+        self._stage = name
+        self._stage_start = now
+
+    def count(self, category: str, draws: int = 0, objects: int = 0):
+        if self._frame_start is None:
+            return
+        self._draws[category] = self._draws.get(category, 0) + draws
+        self._objects[category] = self._objects.get(category, 0) + objects
+
+    def end_frame(self) -> 'FrameRecord | None':
+        if self._frame_start is None:
+            return None
+        now = self._end_stage()
+        record = FrameRecord(self._frame_count, self._frame_start, now - self._frame_start,
+                             self._stages, self._draws, self._objects)
+        self.history.append(record)
+        self._frame_count += 1
+        self._frame_start = None
+        self._stage = None
+
+        if self.log_path is not None:
+            if self._last_log_write is None or now - self._last_log_write >= self.log_interval:
+                self._last_log_write = now
+                write_log(self.log_path, self.history)
+
+        return record
+
+    def start_log(self, path: str):
+        self.log_path = path
+        self._last_log_write = None
+
+    def stop_log(self):
+        if self.log_path is not None:
+            write_log(self.log_path, self.history)
+        self.log_path = None
+
+    def _end_stage(self) -> float:
+        if self._stage is not None and self._synchronize is not None:
+            self._synchronize()
+        now = self._clock()
+        if self._stage is not None:
+            self._stages[self._stage] = self._stages.get(self._stage, 0.0) + now - self._stage_start
+        return now
+
+    def get_summary(self) -> dict:
+        """
+        Returns the average and maximum time of the frame and of each stage, and the average draw
+        calls and objects of each category, over the frames in the rolling window.
+        """
+        frame_count = len(self.history)
+        summary = {'frames': frame_count, 'total': (0.0, 0.0), 'stages': {}, 'draws': {},
+                   'objects': {}}
+        if not frame_count:
+            return summary
+
+        totals = [record.total for record in self.history]
+        summary['total'] = (sum(totals) / frame_count, max(totals))
+
+        for field in ('stages', 'draws', 'objects'):
+            values = collections.defaultdict(list)
+            for record in self.history:
+                for name, value in getattr(record, field).items():
+                    values[name].append(value)
+            for name, name_values in values.items():
+                average = sum(name_values) / frame_count
+                summary[field][name] = (average, max(name_values)) if field == 'stages' else average
+
+        return summary
+
+    def format_overlay(self) -> str:
+        summary = self.get_summary()
+        average, maximum = summary['total']
+        lines = [f'Frame: {average * 1000.0:.2f} ms (max {maximum * 1000.0:.2f} ms, '
+                 f'{summary["frames"]} frames)']
+        for name, (average, maximum) in summary['stages'].items():
+            lines.append(f'  {name}: {average * 1000.0:.2f} ms (max {maximum * 1000.0:.2f} ms)')
+        if summary['draws']:
+            lines.append('Draw calls / objects:')
+            for name, draws in summary['draws'].items():
+                lines.append(f'  {name}: {draws:.0f} / {summary["objects"][name]:.0f}')
+        return '\n'.join(lines)
+
+
+def _get_columns(records: 'list[FrameRecord]') -> 'tuple[list[str], list[str]]':
+    stages = {}
+    categories = {}
+    for record in records:
+        stages.update(dict.fromkeys(record.stages))
+        categories.update(dict.fromkeys(record.draws))
+    return list(stages), list(categories)
+
+
+def write_log(path: str, records: 'list[FrameRecord]'):
+    """
+    Writes the given frame records to a CSV file (one row per frame, times in milliseconds), or to a
+    JSON file if the path has the `.json` extension. The file is written atomically, so that it can
+    be inspected while it is rewritten periodically.
+    """
+    records = list(records)
+    tmp_path = f'{path}.tmp'
+
+    if os.path.splitext(path)[1].lower() == '.json':
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump([record._asdict() for record in records], f, indent=1)
+    else:
+        stages, categories = _get_columns(records)
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'time', 'total_ms'] + [f'{name}_ms' for name in stages] +
+                            [f'{name}_{field}' for name in categories
+                             for field in ('draws', 'objects')])
+            for record in records:
+                row = [record.frame, f'{record.time:.6f}', f'{record.total * 1000.0:.3f}']
+                row.extend(f'{record.stages.get(name, 0.0) * 1000.0:.3f}' for name in stages)
+                for name in categories:
+                    row.append(record.draws.get(name, 0))
+                    row.append(record.objects.get(name, 0))
+                writer.writerow(row)
+
+    os.replace(tmp_path, path)
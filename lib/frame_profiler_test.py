@@ -0,0 +1,80 @@
+"""
+Unit tests for the `frame_profiler` module.
+"""
+import csv
+import json
+
+import pytest
+
+from .frame_profiler import FrameProfiler
+
+
+def _profile_frame(profiler, now: 'list[float]'):
+    # The profiler's clock returns `now[0]`.
+    profiler.begin_frame()
+    now[0] += 0.001
+    profiler.begin_stage('routes')
+    profiler.count('routes', draws=3, objects=100)
+    now[0] += 0.004
+    profiler.begin_stage('objects')
+    profiler.count('objects', draws=20, objects=10)
+    now[0] += 0.002
+    profiler.begin_stage('routes')
+    now[0] += 0.001
+    return profiler.end_frame()
+
+
+def test_disabled():
+    now = [0.0]
+    profiler = FrameProfiler(clock=lambda: now[0])
+    assert _profile_frame(profiler, now) is None
+    assert not profiler.history
+
+
+def test_stages_and_counters():
+    now = [0.0]
+    synchronized = []
+    profiler = FrameProfiler(history_size=2, clock=lambda: now[0],
+                             synchronize=lambda: synchronized.append(now[0]))
+    profiler.show_overlay = True
+
+    record = _profile_frame(profiler, now)
+    assert record.total == pytest.approx(0.008)
+    assert record.stages == pytest.approx({'setup': 0.001, 'routes': 0.005, 'objects': 0.002})
+    assert record.draws == {'routes': 3, 'objects': 20}
+    assert record.objects == {'routes': 100, 'objects': 10}
+    assert len(synchronized) == 4
+
+    for _ in range(3):
+        _profile_frame(profiler, now)
+    assert [record.frame for record in profiler.history] == [2, 3]
+
+    summary = profiler.get_summary()
+    assert summary['total'] == pytest.approx((0.008, 0.008))
+    assert summary['draws'] == {'routes': 3, 'objects': 20}
+    assert 'routes: 3 / 100' in profiler.format_overlay()
+
+
+@pytest.mark.parametrize("extension", ('csv', 'json'))
+def test_log(tmp_path, extension):
+    now = [0.0]
+    profiler = FrameProfiler(clock=lambda: now[0])
+    path = tmp_path / f'frames.{extension}'
+    profiler.start_log(str(path))
+    profiler.log_interval = 1.0
+
+    for _ in range(5):
+        _profile_frame(profiler, now)
+    profiler.stop_log()
+    assert not profiler.enabled
+
+    with open(path, newline='') as f:
+        if extension == 'json':
+            rows = json.load(f)
+            assert rows[-1]['stages']['routes'] == pytest.approx(0.005)
+            assert rows[-1]['draws']['objects'] == 20
+        else:
+            rows = list(csv.DictReader(f))
+            assert float(rows[-1]['routes_ms']) == pytest.approx(5.0)
+            assert rows[-1]['objects_draws'] == '20'
+    assert len(rows) == 5
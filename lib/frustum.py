@@ -0,0 +1,101 @@
+"""
+View frustum culling and distance level of detail.
+
+Entities are approximated by a bounding sphere. Spheres that lie entirely outside one of the six
+planes of the frustum are culled; the rest are either rendered in full, or simplified (e.g. drawn
+as points) when they would cover only a few pixels on screen.
+
+Positions are given in BOL coordinates, and converted to GL coordinates (`x, -z, y`) internally.
+"""
+import math
+
+import numpy
+
+CULLED = 0
+SIMPLIFIED = 1
+VISIBLE = 2
+
+
+def extract_frustum_planes(mvp_mat: numpy.ndarray) -> numpy.ndarray:
+    """
+    Returns the left, right, bottom, top, near and far planes (6 x 4) of the frustum of the given
+    model-view-projection matrix. The normals point to the inside of the frustum, and are
+    normalized, so that the plane equation yields the signed distance to the plane.
+    """
+    m = numpy.asarray(mvp_mat, dtype=numpy.float64)
+    planes = numpy.array((
+        m[3] + m[0],
+        m[3] - m[0],
+        m[3] + m[1],
+        m[3] - m[1],
+        m[3] + m[2],
+        m[3] - m[2],
+    ))
+    planes /= numpy.linalg.norm(planes[:, :3], axis=1)[:, numpy.newaxis]
+    return planes
+
+
+def get_lod_factor(fov_y: float, viewport_height: int, min_pixels: float) -> float:
+    """
+    Returns the factor that, multiplied by the radius of a bounding sphere, gives the distance from
+    which the sphere covers less than `min_pixels` pixels (in radius) on screen, for a perspective
+    projection with the given vertical field of view (in degrees).
+    """
+    if min_pixels <= 0:
+        return 0.0
+    return viewport_height / 2.0 / (math.tan(math.radians(fov_y) / 2.0) * min_pixels)
+
+
+class FrustumCuller:
+
+    def __init__(self,
+                 mvp_mat: numpy.ndarray,
+                 camera_position: 'tuple[float, float, float] | None' = None,
+                 lod_factor: float = 0.0):
+        """
+        Level of detail is only applied if a camera position (in BOL coordinates) and a positive
+        LOD factor (see `get_lod_factor()`) are given.
+        """
+        self.planes = extract_frustum_planes(mvp_mat)
+        self.camera_position = (numpy.array(camera_position, dtype=numpy.float64)
+                                if camera_position is not None else None)
+        self.lod_factor = lod_factor
+
+        self.culled = 0
+        self.simplified = 0
+        self.draws_saved = 0
+
+    def classify(self,
+                 positions: numpy.ndarray,
+                 radii: 'float | numpy.ndarray',
+                 draws: 'int | numpy.ndarray' = 1,
+                 detailed: 'numpy.ndarray | None' = None) -> numpy.ndarray:
+        """
+        Returns `CULLED`, `SIMPLIFIED` or `VISIBLE` for each of the given bounding spheres
+        (positions in BOL coordinates). `draws` is the number of draw calls that rendering an
+        entity in full takes (a scalar, or one per entity), and is used to account the draw calls
+        saved. Entities flagged in the optional `detailed` mask (e.g. selected objects) are never
+        simplified.
+        """
+        positions = numpy.asarray(positions, dtype=numpy.float64).reshape(-1, 3)
+        radii = numpy.broadcast_to(numpy.asarray(radii, dtype=numpy.float64), len(positions))
+
+        gl_positions = positions[:, (0, 2, 1)] * (1.0, -1.0, 1.0)
+        distances = gl_positions @ self.planes[:, :3].T + self.planes[:, 3]
+        inside = (distances >= -radii[:, numpy.newaxis]).all(axis=1)
+        result = numpy.where(inside, VISIBLE, CULLED).astype(numpy.int8)
+
+        if self.camera_position is not None and self.lod_factor > 0:
+            camera_distances = numpy.linalg.norm(positions - self.camera_position, axis=1)
+            simplified = inside & (camera_distances > radii * self.lod_factor)
+            if detailed is not None:
+                simplified &= ~numpy.asarray(detailed, dtype=bool)
+            result[simplified] = SIMPLIFIED
+
+        saved = result != VISIBLE
+        draws = numpy.broadcast_to(numpy.asarray(draws), len(positions))
+        self.culled += len(result) - int(numpy.count_nonzero(inside))
+        self.simplified += int(numpy.count_nonzero(result == SIMPLIFIED))
+        self.draws_saved += int(draws[saved].sum())
+
+        return result
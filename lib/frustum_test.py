@@ -0,0 +1,51 @@
+"""
+Unit tests for the `frustum` module.
+"""
+import math
+
+import numpy
+import pytest
+
+from .frustum import CULLED, SIMPLIFIED, VISIBLE, FrustumCuller, get_lod_factor
+
+
+def _perspective(fov_y, aspect, near, far):
+    f = 1.0 / math.tan(math.radians(fov_y) / 2.0)
+    return numpy.array((
+        (f / aspect, 0.0, 0.0, 0.0),
+        (0.0, f, 0.0, 0.0),
+        (0.0, 0.0, (far + near) / (near - far), 2.0 * far * near / (near - far)),
+        (0.0, 0.0, -1.0, 0.0),
+    ))
+
+
+def test_classify():
+    # Camera at the origin, looking down the negative GL Z axis (BOL Y axis).
+    culler = FrustumCuller(_perspective(90.0, 1.0, 1.0, 10000.0))
+    positions = (
+        (0.0, -100.0, 0.0),  # In front of the camera.
+        (0.0, 100.0, 0.0),  # Behind the camera.
+        (0.0, 10.0, 0.0),  # Behind the camera, but its bounding sphere reaches the near plane.
+        (500.0, -100.0, 0.0),  # Beyond the right plane.
+        (0.0, -20000.0, 0.0),  # Beyond the far plane.
+        (0.0, -100.0, 200.0),  # Beyond the bottom plane (BOL Z is -GL Y).
+    )
+    result = culler.classify(positions, 50.0, draws=2)
+    assert result.tolist() == [VISIBLE, CULLED, VISIBLE, CULLED, CULLED, CULLED]
+    assert culler.culled == 4
+    assert culler.draws_saved == 8
+
+
+def test_lod():
+    lod_factor = get_lod_factor(90.0, 1000, 5.0)
+    assert lod_factor == pytest.approx(100.0)
+    assert get_lod_factor(90.0, 1000, 0.0) == 0.0
+
+    culler = FrustumCuller(_perspective(90.0, 1.0, 1.0, 100000.0), (0.0, 0.0, 0.0), lod_factor)
+    positions = ((0.0, -1000.0, 0.0), (0.0, -5000.0, 0.0), (0.0, -2000.0, 0.0))
+    result = culler.classify(positions, numpy.array((20.0, 20.0, 10.0)))
+    assert result.tolist() == [VISIBLE, SIMPLIFIED, SIMPLIFIED]
+    assert (culler.culled, culler.simplified, culler.draws_saved) == (0, 2, 2)
+
+    result = culler.classify(positions, 10.0, detailed=numpy.array((False, True, False)))
+    assert result.tolist() == [VISIBLE, VISIBLE, SIMPLIFIED]
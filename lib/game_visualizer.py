@@ -174,18 +174,25 @@ class Game:
                 glDisable(GL_LINE_STIPPLE)
                 renderer.models.render_player_position_colored_smaller(item_target, False, p)
 
-    def render_collision(self, renderer: BolMapViewer, objlist, objselectioncls, selected):
+    def add_selection_entries(self, objlist, objselectioncls, selected):
         if not self.dolphin.initialized():
             return
 
-        idbase = 0x100000
-        offset = len(objlist)
         for ptr, pos in self.karts[:self.kart_count]:
             if ptr in selected:
                 continue
             objlist.append(objselectioncls(obj=ptr, pos1=pos, pos2=None, pos3=None, rotation=None))
-            renderer.models.render_generic_position_colored_id(pos, idbase + (offset) * 4)
-            offset += 1
+
+    def get_update_interval(self) -> 'float | None':
+        """
+        Returns the interval (in seconds) at which `logic()` needs to be called: every frame while
+        hooked into Dolphin, periodically while trying to connect to it, or not at all.
+        """
+        if self.dolphin.initialized():
+            return 0.0
+        if self.autoconnect:
+            return max(0.0, 1.0 - (time.monotonic() - self.last_autoconnect))
+        return None
 
     def logic(self, renderer: BolMapViewer, delta, diff):
         if not self.dolphin.initialized():
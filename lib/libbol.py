@@ -1,8 +1,9 @@
 import collections
 import functools
+import itertools
 import json
 import math
-from struct import unpack, pack
+from struct import unpack, pack, Struct
 from numpy import ndarray, array
 from math import cos, sin
 from .vectors import Vector3
@@ -55,6 +56,22 @@ def read_string(f):
     return string
 
 
+@functools.lru_cache
+def record_struct(fmt: str, hidden_flag: bool) -> Struct:
+    """
+    Returns the precompiled struct for a record format, optionally followed by the byte that holds
+    the hidden flag in the extended format.
+    """
+    return Struct(fmt + 'B' if hidden_flag else fmt)
+
+
+def iter_records(buffer, offset: int, count: int, struct: Struct):
+    """
+    Decodes `count` consecutive records with the given struct, starting at `offset` in the buffer.
+    """
+    return struct.iter_unpack(buffer[offset:offset + count * struct.size])
+
+
 def write_uint16(f, val):
     f.write(pack(">H", val))
 
@@ -86,27 +103,57 @@ def combine_attr(obj1, obj2, attr, default):
         setattr(obj1, attr, default)
 
 
-class Rotation(object):
-    def __init__(self, forward, up, left):
-        self.mtx = ndarray(shape=(4,4), dtype=float, order="F")
+def get_slot_values(obj) -> list:
+    """
+    Returns the values of the attributes of the object that are stored in slots, as opposed to the
+    ones in `__dict__`.
+    """
+    values = []
+    for cls in type(obj).__mro__:
+        for name in cls.__dict__.get('__slots__', ()):
+            try:
+                values.append(getattr(obj, name))
+            except AttributeError:
+                pass  # Unset slot.
+    return values
 
-        self.mtx[0][0] = forward.x
-        self.mtx[0][1] = -forward.z
-        self.mtx[0][2] = forward.y
-        self.mtx[0][3] = 0.0
 
-        self.mtx[1][0] = left.x
-        self.mtx[1][1] = -left.z
-        self.mtx[1][2] = left.y
-        self.mtx[1][3] = 0.0
+ROTATION_STRUCT = Struct(">hhhhhh")
 
-        self.mtx[2][0] = up.x
-        self.mtx[2][1] = -up.z
-        self.mtx[2][2] = up.y
-        self.mtx[2][3] = 0.0
 
-        self.mtx[3][0] = self.mtx[3][1] = self.mtx[3][2] = 0.0
-        self.mtx[3][3] = 1.0
+class Rotation(object):
+    # Rotations read from a file are kept in their packed form (the forward and up vectors as six
+    # int16 values) until the matrix is needed, or modified.
+    __slots__ = ('_packed', '_mtx')
+
+    def __init__(self, forward, up, left):
+        self._packed = None
+        self._mtx = array((
+            (forward.x, -forward.z, forward.y, 0.0),
+            (left.x, -left.z, left.y, 0.0),
+            (up.x, -up.z, up.y, 0.0),
+            (0.0, 0.0, 0.0, 1.0),
+        ), dtype=float, order="F")
+
+    @property
+    def mtx(self) -> ndarray:
+        if self._mtx is None:
+            values = ROTATION_STRUCT.unpack(self._packed)
+            forward = Vector3(values[0] * 0.0001, values[1] * 0.0001, values[2] * 0.0001)
+            up = Vector3(values[3] * 0.0001, values[4] * 0.0001, values[5] * 0.0001)
+            left = up.cross(forward)
+            self._mtx = array((
+                (forward.x, -forward.z, forward.y, 0.0),
+                (left.x, -left.z, left.y, 0.0),
+                (up.x, -up.z, up.y, 0.0),
+                (0.0, 0.0, 0.0, 1.0),
+            ), dtype=float, order="F")
+        return self._mtx
+
+    @mtx.setter
+    def mtx(self, mtx: ndarray):
+        self._mtx = mtx
+        self._packed = None
 
     def rotate_around_x(self, degrees):
         mtx = ndarray(shape=(4,4), dtype=float, order="F", buffer=array([
@@ -176,18 +223,11 @@ class Rotation(object):
     def from_mkdd_rotation(cls,
                            s16forwardx, s16forwardy, s16forwardz,
                            s16upx, s16upy, s16upz):
-        forward = Vector3(s16forwardx * 0.0001, s16forwardy * 0.0001, s16forwardz * 0.0001)
-        up = Vector3(s16upx * 0.0001, s16upy * 0.0001, s16upz * 0.0001)
-        left = up.cross(forward)
-
-        return cls(forward, up, left)
-
-    @classmethod
-    def from_file(cls, f):
-        return cls.from_mkdd_rotation(
-            read_int16(f), read_int16(f), read_int16(f),
-            read_int16(f), read_int16(f), read_int16(f)
-        )
+        rotation = cls.__new__(cls)
+        rotation._packed = ROTATION_STRUCT.pack(s16forwardx, s16forwardy, s16forwardz,
+                                                s16upx, s16upy, s16upz)
+        rotation._mtx = None
+        return rotation
 
     def get_vectors(self):
         forward = Vector3(self.mtx[0][0], self.mtx[0][2], -self.mtx[0][1])
@@ -196,27 +236,36 @@ class Rotation(object):
         return forward, up, left
 
     def set_vectors(self, forward, up, left):
-        self.mtx[0][0] = forward.x
-        self.mtx[0][1] = -forward.z
-        self.mtx[0][2] = forward.y
-        self.mtx[0][3] = 0.0
+        mtx = self.mtx
+        self._packed = None
 
-        self.mtx[1][0] = left.x
-        self.mtx[1][1] = -left.z
-        self.mtx[1][2] = left.y
-        self.mtx[1][3] = 0.0
+        mtx[0][0] = forward.x
+        mtx[0][1] = -forward.z
+        mtx[0][2] = forward.y
+        mtx[0][3] = 0.0
 
-        self.mtx[2][0] = up.x
-        self.mtx[2][1] = -up.z
-        self.mtx[2][2] = up.y
-        self.mtx[2][3] = 0.0
+        mtx[1][0] = left.x
+        mtx[1][1] = -left.z
+        mtx[1][2] = left.y
+        mtx[1][3] = 0.0
 
-        self.mtx[3][0] = self.mtx[3][1] = self.mtx[3][2] = 0.0
-        self.mtx[3][3] = 1.0
+        mtx[2][0] = up.x
+        mtx[2][1] = -up.z
+        mtx[2][2] = up.y
+        mtx[2][3] = 0.0
+
+        mtx[3][0] = mtx[3][1] = mtx[3][2] = 0.0
+        mtx[3][3] = 1.0
 
     def write(self, f):
-        forward = Vector3(self.mtx[0][0], self.mtx[0][2], -self.mtx[0][1])
-        up = Vector3(self.mtx[2][0], self.mtx[2][2], -self.mtx[2][1])
+        if self._packed is not None:
+            f.write(self._packed)
+            return
+
+        # Rounding is notably faster on Python floats than on NumPy scalars.
+        mtx = self.mtx.tolist()
+        forward = Vector3(mtx[0][0], mtx[0][2], -mtx[0][1])
+        up = Vector3(mtx[2][0], mtx[2][2], -mtx[2][1])
 
         f.write(pack(">hhh",
                      int(round(forward.x * 10000)),
@@ -245,13 +294,11 @@ class ObjectContainer(list):
         self.object_type = object_type
 
     @classmethod
-    def from_file(cls, f, count, objcls, extended_format, *args):
-        container = cls()
-        container.object_type = objcls
+    def from_buffer(cls, buffer, offset, count, objcls, extended_format, *args):
+        container = cls(object_type=objcls)
 
-        for i in range(count):
-            obj = objcls.from_file(f, extended_format, *args)
-            container.append(obj)
+        for values in iter_records(buffer, offset, count, objcls.get_struct(extended_format)):
+            container.append(objcls.from_unpacked(values, extended_format, *args))
 
         return container
 
@@ -268,30 +315,33 @@ RESPAWNPOINT = 9
 LIGHTPARAM = 10
 MINIGAME = 11
 
+# Header fields that follow the magic: roll, ambient color, light color and light source position.
+# The last two are not present in the old BOL format.
+HEADER_PREFIX_STRUCT = Struct(">B3B4B3f")
+OLD_HEADER_PREFIX_STRUCT = Struct(">B3B")
+# Remaining header fields, up to the start of the first section.
+HEADER_STRUCT = Struct(">BB7HB3BffBBBB3BBBBBBI11I12s")
+
 
 class ColorRGB(object):
+    __slots__ = ('r', 'g', 'b')
+
     def __init__(self, r, g, b):
         self.r = r
         self.g = g
         self.b = b
 
-    @classmethod
-    def from_file(cls, f):
-        return cls(read_uint8(f), read_uint8(f), read_uint8(f))
-
     def write(self, f):
         f.write(pack(">BBB", self.r, self.g, self.b))
 
 
 class ColorRGBA(ColorRGB):
+    __slots__ = ('a', )
+
     def __init__(self, r, g, b, a):
         super().__init__(r, g, b)
         self.a = a
 
-    @classmethod
-    def from_file(cls, f):
-        return cls(*unpack(">BBBB", f.read(4)))
-
     def write(self, f):
         super().write(f)
         f.write(pack(">B", self.a))
@@ -314,6 +364,8 @@ class ColorRGBA(ColorRGB):
 
 
 class PositionedObject:
+    __slots__ = ('position', )
+
     def __init__(self, position):
         self.position = position
 
@@ -329,6 +381,11 @@ class PositionedObject:
 # Section 1
 # Enemy/Item Route Code Start
 class EnemyPoint(PositionedObject):
+    STRUCT_FORMAT = ">fffHhfbBBBBBB5s"
+    OLD_STRUCT_FORMAT = ">fffHhfHBB"
+    __slots__ = ('group', 'link', 'scale', 'itemsonly', 'swerve', 'nomushroomzone',
+                 'driftdirection', 'driftacuteness', 'driftduration', 'driftsupplement', 'hidden',
+                 'widget')
 
     def __init__(self,
                  position,
@@ -371,25 +428,22 @@ class EnemyPoint(PositionedObject):
         )
 
     @classmethod
-    def from_file(cls, f, old_bol: bool, extended_format: bool):
-        start = f.tell()
-        args = [Vector3(*unpack(">fff", f.read(12)))]
+    def get_struct(cls, extended_format: bool, old_bol: bool = False) -> Struct:
+        return record_struct(cls.OLD_STRUCT_FORMAT if old_bol else cls.STRUCT_FORMAT,
+                             extended_format)
+
+    @classmethod
+    def from_unpacked(cls, values, old_bol: bool, extended_format: bool):
         if not old_bol:
-            args.extend(unpack(">HhfbBBBBBB", f.read(15)))
-            padding = f.read(5)  # padding
+            padding = values[13]
             assert padding == b"\x00" * 5
+            obj = cls(Vector3(values[0], values[1], values[2]), *values[3:13])
         else:
-            args.extend(unpack(">HhfHBB", f.read(12)))
-            args.extend((0, 0, 0, 0))
-
-        obj = cls(*args)
+            obj = cls(Vector3(values[0], values[1], values[2]), *values[3:9], 0, 0, 0, 0)
 
         if extended_format:
-            obj.hidden = f.read(1) != b'\x00'
+            obj.hidden = values[-1] != 0
 
-        obj._size = f.tell() - start
-        if old_bol:
-            obj._size += 8
         return obj
 
     def write(self, f, extended_format: bool):
@@ -398,7 +452,6 @@ class EnemyPoint(PositionedObject):
         f.write(pack(">Hhf", self.driftdirection, self.link, self.scale))
         f.write(pack(">bBBBBBB", self.swerve, self.itemsonly, self.group, self.driftacuteness, self.driftduration, self.driftsupplement, self.nomushroomzone))
         f.write(b"\x00"*5)
-        #assert f.tell() - start == self._size
 
         if extended_format:
             f.write(b'\x01' if self.hidden else b'\x00')
@@ -512,27 +565,208 @@ class EnemyPointGroup(object):
         return self
 
 
+class EnemyPointIndex:
+    """
+    Lookup tables over the enemy points of a document: the location of each point, the first and
+    last points of the groups keyed by their link, and a uniform grid (in the XZ plane) for nearest
+    point queries.
+
+    The index reflects the points at the time it was built. Moved points can be updated in place
+    with `update_point()`; any other change requires a new index.
+    """
+
+    def __init__(self, groups: 'list[EnemyPointGroup]'):
+        self.groups = groups
+
+        # Group, index in the group, and index across all groups of each point, keyed by ID.
+        self.locations = {}
+        points = []
+        for group in groups:
+            for index, point in enumerate(group.points):
+                self.locations[id(point)] = (group, index, len(points))
+                points.append(point)
+
+        self.first_points = {}
+        self.last_points = {}
+        self.update_links()
+
+        if points:
+            xs = [point.position.x for point in points]
+            zs = [point.position.z for point in points]
+            extent = max(max(xs) - min(xs), max(zs) - min(zs))
+            # Cells hold a few points each on average, if the points were evenly spread. The larger
+            # extent is used so that points along a line do not end up in tiny cells.
+            self.cell_size = max(1.0, extent / math.sqrt(len(points)) * 2.0)
+        else:
+            self.cell_size = 1.0
+
+        self.cells = collections.defaultdict(list)
+        self.point_cells = {}
+        self.cell_bounds = None
+        for point in points:
+            self._add_to_grid(point)
+
+    def update_links(self):
+        self.first_points.clear()
+        self.last_points.clear()
+        for group in self.groups:
+            if group.points:
+                first_point = group.points[0]
+                last_point = group.points[-1]
+                self.first_points.setdefault(first_point.link, []).append(first_point)
+                self.last_points.setdefault(last_point.link, []).append(last_point)
+
+    def locate(self, point: EnemyPoint) -> 'tuple[EnemyPointGroup, int, int] | None':
+        """
+        Returns the group of the point, its index in the group, and its index across all groups; or
+        `None` if the point was not indexed.
+        """
+        location = self.locations.get(id(point))
+        if location is None:
+            return None
+        group, index, _flat_index = location
+        if index >= len(group.points) or group.points[index] is not point:
+            return None
+        return location
+
+    def _get_cell(self, position: Vector3) -> 'tuple[int, int]':
+        return (math.floor(position.x / self.cell_size), math.floor(position.z / self.cell_size))
+
+    def _add_to_grid(self, point: EnemyPoint):
+        cell = self._get_cell(point.position)
+        self.cells[cell].append(point)
+        self.point_cells[id(point)] = cell
+
+        if self.cell_bounds is None:
+            self.cell_bounds = [cell[0], cell[1], cell[0], cell[1]]
+        else:
+            self.cell_bounds[0] = min(self.cell_bounds[0], cell[0])
+            self.cell_bounds[1] = min(self.cell_bounds[1], cell[1])
+            self.cell_bounds[2] = max(self.cell_bounds[2], cell[0])
+            self.cell_bounds[3] = max(self.cell_bounds[3], cell[1])
+
+    def update_point(self, point: EnemyPoint) -> bool:
+        """
+        Updates the index after the position or the link of the point have changed. Returns `False`
+        if the point was not indexed, in which case the index needs to be rebuilt.
+        """
+        location = self.locate(point)
+        if location is None:
+            return False
+
+        cell = self.point_cells[id(point)]
+        if cell != self._get_cell(point.position):
+            self.cells[cell].remove(point)
+            self._add_to_grid(point)
+
+        group, index, _flat_index = location
+        if index == 0 or index == len(group.points) - 1:
+            self.update_links()
+
+        return True
+
+    def find_nearest_point(self, position: Vector3) -> 'tuple[int, EnemyPoint] | None':
+        """
+        Returns the point that is closest to the given position, along with its index across all
+        groups. Ties are resolved in favor of the lowest index.
+        """
+        if self.cell_bounds is None:
+            return None
+
+        center_x, center_z = self._get_cell(position)
+        min_x, min_z, max_x, max_z = self.cell_bounds
+        max_radius = max(abs(center_x - min_x), abs(center_x - max_x), abs(center_z - min_z),
+                         abs(center_z - max_z))
+
+        # Past this many rings, more cells than points would be visited; scanning every point is
+        # cheaper then (e.g. when the position is far away from all the points).
+        max_radius = min(max_radius, math.isqrt(len(self.point_cells)) // 2 + 1)
+
+        best = None
+        for radius in range(max_radius + 1):
+            if radius == 0:
+                ring = ((center_x, center_z), )
+            else:
+                ring = itertools.chain(
+                    ((center_x + i, center_z + j) for i in range(-radius, radius + 1)
+                     for j in (-radius, radius)),
+                    ((center_x + i, center_z + j) for i in (-radius, radius)
+                     for j in range(-radius + 1, radius)),
+                )
+            for cell in ring:
+                for point in self.cells.get(cell, ()):
+                    candidate = (position.distance2(point.position),
+                                 self.locations[id(point)][2], point)
+                    if best is None or candidate[0:2] < best[0:2]:
+                        best = candidate
+
+            # Points in outer rings are at least this far (in the XZ plane) from the position.
+            if best is not None and best[0] <= (radius * self.cell_size)**2:
+                return best[1], best[2]
+
+        for cell_points in self.cells.values():
+            for point in cell_points:
+                candidate = (position.distance2(point.position), self.locations[id(point)][2],
+                             point)
+                if best is None or candidate[0:2] < best[0:2]:
+                    best = candidate
+
+        return best[1], best[2]
+
+
 class EnemyPointGroups(object):
     def __init__(self):
         self.groups = []
 
+        self._index = None
+
+    def __getstate__(self):
+        # The index is keyed by object IDs, which do not carry over to copies.
+        state = self.__dict__.copy()
+        state['_index'] = None
+        return state
+
+    def get_index(self) -> EnemyPointIndex:
+        """
+        Returns the index over the points, which is built on demand.
+        """
+        if self._index is None or self._index.groups is not self.groups:
+            self._index = EnemyPointIndex(self.groups)
+        return self._index
+
+    def invalidate_index(self):
+        """
+        Discards the index. To be called when points or groups are inserted, removed or reordered.
+        """
+        self._index = None
+
+    def update_index(self, points):
+        """
+        Updates the index after the given points were moved or had their link changed.
+        """
+        if self._index is None:
+            return
+        for point in points:
+            if not self._index.update_point(point):
+                self._index = None
+                return
+
     @classmethod
-    def from_file(cls, f, count, old_bol, extended_format: bool):
+    def from_buffer(cls, buffer, offset, count, old_bol, extended_format: bool):
         enemypointgroups = cls()
         group_ids = {}
-        curr_group = None
 
-        for i in range(count):
-            enemypoint = EnemyPoint.from_file(f, old_bol, extended_format)
-            if enemypoint.group not in group_ids:
+        struct = EnemyPoint.get_struct(extended_format, old_bol)
+        for values in iter_records(buffer, offset, count, struct):
+            enemypoint = EnemyPoint.from_unpacked(values, old_bol, extended_format)
+            group = group_ids.get(enemypoint.group)
+            if group is None:
                 # start of group
-                curr_group = EnemyPointGroup()
-                curr_group.id = enemypoint.group
-                group_ids[enemypoint.group] = curr_group
-                curr_group.points.append(enemypoint)
-                enemypointgroups.groups.append(curr_group)
-            else:
-                group_ids[enemypoint.group].points.append(enemypoint)
+                group = EnemyPointGroup()
+                group.id = enemypoint.group
+                group_ids[enemypoint.group] = group
+                enemypointgroups.groups.append(group)
+            group.points.append(enemypoint)
 
         return enemypointgroups
 
@@ -593,42 +827,37 @@ class EnemyPointGroups(object):
         A position is provided as reference for selecting the closest point when multiple groups
         with the same link are available.
         """
-        next_point = None
-        for group in self.groups:
-            if point not in group.points:
-                continue
-            index = group.points.index(point)
-            inc = -1 if previous else 1
-            if 0 <= index + inc < len(group.points):
-                # In the middle of the group: return next (or previous) point in the group.
-                next_point = group.points[index + inc]
-            else:
-                # At the end of group: try to find the first (or last) point of one of its next
-                # groups.
-                if point.link != -1:
-                    linked_points = []
-                    for group in self.groups:
-                        if not group.points:
-                            continue
-                        first_or_last_point = group.points[-1 if previous else 0]
-                        if point.link == first_or_last_point.link:
-                            linked_points.append(first_or_last_point)
-                    if linked_points:
-                        sorted_linked_points = sorted(
-                            (position.distance2(p.position), p) for p in linked_points)
-                        _distance2, next_point = sorted_linked_points[0]
-            break
-        return next_point
+        location = self.get_index().locate(point)
+        if location is None:
+            # The index may be stale if the groups were modified without notice.
+            self.invalidate_index()
+            location = self.get_index().locate(point)
+            if location is None:
+                return None
+
+        group, index, _flat_index = location
+        inc = -1 if previous else 1
+        if 0 <= index + inc < len(group.points):
+            # In the middle of the group: return next (or previous) point in the group.
+            return group.points[index + inc]
+
+        # At the end of group: try to find the first (or last) point of one of its next groups.
+        if point.link == -1:
+            return None
+        linked_points = (self._index.last_points if previous else self._index.first_points).get(
+            point.link)
+        if not linked_points:
+            return None
+        return min(linked_points, key=lambda p: position.distance2(p.position))
 
     def find_closest_forward_point(self, position: Vector3):
-        points = tuple(self.points())
-        if not points:
-            raise ValueError('Enemy path does not have any point')
+        index = self.get_index()
 
         # 1. Find the closest enemy point (B) to the given position (P).
-        sorted_points = sorted(
-            (point.position.distance2(position), i, point) for i, point in enumerate(points))
-        _distance2, pointB_index, pointB = sorted_points[0]
+        closest_point = index.find_nearest_point(position)
+        if closest_point is None:
+            raise ValueError('Enemy path does not have any point')
+        pointB_index, pointB = closest_point
 
         # 2. Find the previous and the next enemy points (A and C respectively).
         pointA = self.find_next_point(pointB, position, previous=True)
@@ -642,7 +871,7 @@ class EnemyPointGroups(object):
         angle = math.acos((pointB.position - pointA.position).cos_angle(pointB.position - position))
         if angle < math.pi / 180:
             return pointB_index, pointB
-        pointC_index = points.index(pointC)
+        pointC_index = self.get_index().locate(pointC)[2]
         return pointC_index, pointC
 
 # Enemy/Item Route Code End
@@ -652,6 +881,8 @@ class EnemyPointGroups(object):
 # Section 2
 # Checkpoint Group Code Start
 class CheckpointGroup(object):
+    STRUCT_FORMAT = ">HHhhhhhhhh"
+
     def __init__(self, grouplink):
         self.points = []
         self._pointcount = 0
@@ -694,16 +925,15 @@ class CheckpointGroup(object):
         self.points = self.points[:pos+1]
 
     @classmethod
-    def from_file(cls, f, extended_format: bool):
-        pointcount = read_uint16(f)
-        checkpointgroup = cls(read_uint16(f))
-        checkpointgroup._pointcount = pointcount
-
-        for i in range(4):
-            checkpointgroup.prevgroup[i] = read_int16(f)
+    def get_struct(cls, extended_format: bool) -> Struct:
+        return record_struct(cls.STRUCT_FORMAT, False)
 
-        for i in range(4):
-            checkpointgroup.nextgroup[i] = read_int16(f)
+    @classmethod
+    def from_unpacked(cls, values, extended_format: bool):
+        checkpointgroup = cls(values[1])
+        checkpointgroup._pointcount = values[0]
+        checkpointgroup.prevgroup = list(values[2:6])
+        checkpointgroup.nextgroup = list(values[6:10])
 
         return checkpointgroup
 
@@ -731,10 +961,14 @@ class CheckpointGroup(object):
 
 
 class Checkpoint(object):
+    STRUCT_FORMAT = ">ffffffBBBB"
+    __slots__ = ('start', 'mid', 'end', 'unk1', 'unk2', 'unk3', 'unk4', 'hidden', 'widget')
+
     def __init__(self, start, end, unk1=0, unk2=0, unk3=0, unk4=0):
         self.start = start
         self.end = end
-        self.mid = (start+end)/2.0
+        self.mid = Vector3((start.x + end.x) / 2.0, (start.y + end.y) / 2.0,
+                           (start.z + end.z) / 2.0)
         self.unk1 = unk1
         self.unk2 = unk2
         self.unk3 = unk3
@@ -750,19 +984,21 @@ class Checkpoint(object):
 
 
     @classmethod
-    def from_file(cls, f, extended_format: bool):
-        startoff = f.tell()
-        start = Vector3(*unpack(">fff", f.read(12)))
-        end = Vector3(*unpack(">fff", f.read(12)))
-        unk1, unk2, unk3, unk4 = unpack(">BBBB", f.read(4))
+    def get_struct(cls, extended_format: bool) -> Struct:
+        return record_struct(cls.STRUCT_FORMAT, extended_format)
+
+    @classmethod
+    def from_unpacked(cls, values, extended_format: bool):
+        unk1, unk2, unk3, unk4 = values[6:10]
         assert unk2 == 0 or unk2 == 1
         assert unk3 == 0 or unk3 == 1
         assert unk4 in (0, 1)  # 1 expected only for the custom "Lap Checkpoint" parameter
 
-        obj = cls(start, end, unk1, unk2, unk3, unk4)
+        obj = cls(Vector3(values[0], values[1], values[2]), Vector3(values[3], values[4], values[5]),
+                  unk1, unk2, unk3, unk4)
 
         if extended_format:
-            obj.hidden = f.read(1) != b'\x00'
+            obj.hidden = values[-1] != 0
 
         return obj
 
@@ -803,17 +1039,21 @@ class CheckpointGroups(object):
         self.groups = []
 
     @classmethod
-    def from_file(cls, f, count, extended_format: bool):
+    def from_buffer(cls, buffer, offset, count, extended_format: bool):
         checkpointgroups = cls()
 
-        for i in range(count):
-            group = CheckpointGroup.from_file(f, extended_format)
+        group_struct = CheckpointGroup.get_struct(extended_format)
+        for values in iter_records(buffer, offset, count, group_struct):
+            group = CheckpointGroup.from_unpacked(values, extended_format)
             checkpointgroups.groups.append(group)
 
+        offset += count * group_struct.size
+        checkpoint_struct = Checkpoint.get_struct(extended_format)
+
         for group in checkpointgroups.groups:
-            for i in range(group._pointcount):
-                checkpoint = Checkpoint.from_file(f, extended_format)
-                group.points.append(checkpoint)
+            for values in iter_records(buffer, offset, group._pointcount, checkpoint_struct):
+                group.points.append(Checkpoint.from_unpacked(values, extended_format))
+            offset += group._pointcount * checkpoint_struct.size
 
         return checkpointgroups
 
@@ -845,6 +1085,8 @@ class CheckpointGroups(object):
 # Section 3
 # Routes/Paths for cameras, objects and other things
 class Route(object):
+    STRUCT_FORMAT = ">HHIB7s"
+
     def __init__(self):
         self.points = []
         self._pointcount = 0
@@ -860,17 +1102,15 @@ class Route(object):
 
 
     @classmethod
-    def from_file(cls, f, extended_format: bool):
+    def get_struct(cls, extended_format: bool) -> Struct:
+        return record_struct(cls.STRUCT_FORMAT, False)
+
+    @classmethod
+    def from_unpacked(cls, values, extended_format: bool):
         route = cls()
-        route._pointcount = read_uint16(f)
-        route._pointstart = read_uint16(f)
-        #pad = f.read(4)
-        #assert pad == b"\x00\x00\x00\x00"
-        route.unk1 = read_uint32(f)
+        route._pointcount, route._pointstart, route.unk1, route.unk2, pad = values[0:5]
         assert route.unk1 in (0, 1)
-        route.unk2 = read_uint8(f)
         assert route.unk2 == 0
-        pad = f.read(7)
         assert pad == b"\x00"*7
 
         return route
@@ -912,6 +1152,9 @@ class Route(object):
 # Section 4
 # Route point for use with routes from section 3
 class RoutePoint(PositionedObject):
+    STRUCT_FORMAT = ">fffI16s"
+    __slots__ = ('unk', 'hidden', 'widget')
+
     def __init__(self, position):
         super().__init__(position)
         self.unk = 0
@@ -925,17 +1168,19 @@ class RoutePoint(PositionedObject):
 
 
     @classmethod
-    def from_file(cls, f, extended_format: bool):
-        position = Vector3(*unpack(">fff", f.read(12)))
-        point = cls(position)
+    def get_struct(cls, extended_format: bool) -> Struct:
+        return record_struct(cls.STRUCT_FORMAT, extended_format)
 
-        point.unk = read_uint32(f)
+    @classmethod
+    def from_unpacked(cls, values, extended_format: bool):
+        point = cls(Vector3(values[0], values[1], values[2]))
+        point.unk = values[3]
 
-        padding = f.read(16)
+        padding = values[4]
         assert padding == b"\x00"*16
 
         if extended_format:
-            point.hidden = f.read(1) != b'\x00'
+            point.hidden = values[-1] != 0
 
         return point
 
@@ -979,10 +1224,14 @@ class RoutePoint(PositionedObject):
 # Section 5
 # Objects
 class MapObject(PositionedObject):
-    def __init__(self, position, objectid):
+    STRUCT_FORMAT = ">ffffffhhhhhhHhHhBBBBhhhhhhhh"
+    __slots__ = ('objectid', 'scale', 'rotation', 'route', 'userdata', 'presence_filter',
+                 'presence', 'unk_flag', 'unk_28', 'unk_2a', 'unk_2f', 'hidden', 'widget')
+
+    def __init__(self, position, objectid, rotation: Rotation = None):
         super().__init__(position)
         self.scale = Vector3(1.0, 1.0, 1.0)
-        self.rotation = Rotation.default()
+        self.rotation = rotation if rotation is not None else Rotation.default()
         self.objectid = objectid
         self.route = None
         self.unk_28 = 0
@@ -1001,19 +1250,17 @@ class MapObject(PositionedObject):
         return cls(Vector3(0.0, 0.0, 0.0), 1)
 
     @classmethod
-    def from_file(cls, f, routes: ObjectContainer, extended_format: bool):
-        start = f.tell()
-        position = Vector3(*unpack(">fff", f.read(12)))
-        scale = Vector3(*unpack(">fff", f.read(12)))
-        fx, fy, fz = read_int16(f), read_int16(f), read_int16(f)
-        ux, uy, uz = read_int16(f), read_int16(f), read_int16(f)
+    def get_struct(cls, extended_format: bool) -> Struct:
+        return record_struct(cls.STRUCT_FORMAT, extended_format)
 
-        objectid = read_uint16(f)
+    @classmethod
+    def from_unpacked(cls, values, extended_format: bool, routes: ObjectContainer):
+        objectid = values[12]
 
-        obj = MapObject(position, objectid)
-        obj.scale = scale
-        obj.rotation = Rotation.from_mkdd_rotation(fx, fy, fz, ux, uy, uz)
-        pathid = read_int16(f)
+        obj = MapObject(Vector3(values[0], values[1], values[2]), objectid,
+                        Rotation.from_mkdd_rotation(*values[6:12]))
+        obj.scale = Vector3(values[3], values[4], values[5])
+        pathid = values[13]
 
         if pathid < 0:
             obj.route = None
@@ -1024,24 +1271,18 @@ class MapObject(PositionedObject):
                 print("Object", objectid, "had an invalid route id")
                 obj.route = None
 
-        obj.unk_28 = read_uint16(f)
-        obj.unk_2a = read_int16(f)
-        obj.presence_filter = read_uint8(f)
-        obj.presence = read_uint8(f)
-        obj.unk_flag = read_uint8(f)
-        obj.unk_2f = read_uint8(f)
+        (obj.unk_28, obj.unk_2a, obj.presence_filter, obj.presence, obj.unk_flag,
+         obj.unk_2f) = values[14:20]
 
         assert obj.unk_28 == 0
         assert obj.unk_2f == 0
         assert obj.presence in (0, 1, 2, 3)
 
-        for i in range(8):
-            obj.userdata[i] = read_int16(f)
+        obj.userdata = list(values[20:28])
 
         if extended_format:
-            obj.hidden = f.read(1) != b'\x00'
+            obj.hidden = values[-1] != 0
 
-        obj._size = f.tell() - start
         return obj
 
     def write(self, f, routes: ObjectContainer, extended_format: bool):
@@ -1067,7 +1308,6 @@ class MapObject(PositionedObject):
         if extended_format:
             f.write(b'\x01' if self.hidden else b'\x00')
 
-        #assert f.tell() - start == self._size
 
     def read_json_file(self):
         if self.objectid not in OBJECTNAMES:
@@ -1150,12 +1390,13 @@ class MapObjects(object):
         self.objects = []
 
     @classmethod
-    def from_file(cls, f, objectcount, routes: ObjectContainer, extended_format: bool):
+    def from_buffer(cls, buffer, offset, objectcount, routes: ObjectContainer,
+                    extended_format: bool):
         mapobjs = cls()
-
-        for i in range(objectcount):
-            obj = MapObject.from_file(f, routes, extended_format)
-            mapobjs.objects.append(obj)
+        mapobjs.objects = [
+            MapObject.from_unpacked(values, extended_format, routes) for values in iter_records(
+                buffer, offset, objectcount, MapObject.get_struct(extended_format))
+        ]
 
         return mapobjs
 
@@ -1167,10 +1408,13 @@ POLE_RIGHT = 1
 
 
 class KartStartPoint(PositionedObject):
-    def __init__(self, position):
+    STRUCT_FORMAT = ">ffffffhhhhhhBBH"
+    __slots__ = ('scale', 'rotation', 'poleposition', 'playerid', 'unknown', 'hidden', 'widget')
+
+    def __init__(self, position, rotation: Rotation = None):
         super().__init__(position)
         self.scale = Vector3(1.0, 1.0, 1.0)
-        self.rotation = Rotation.default()
+        self.rotation = rotation if rotation is not None else Rotation.default()
         self.poleposition = POLE_LEFT
 
         # 0xFF = All, otherwise refers to player who starts here
@@ -1187,19 +1431,18 @@ class KartStartPoint(PositionedObject):
         return cls(Vector3(0.0, 0.0, 0.0))
 
     @classmethod
-    def from_file(cls, f, extended_format: bool):
-        position = Vector3(*unpack(">fff", f.read(12)))
+    def get_struct(cls, extended_format: bool) -> Struct:
+        return record_struct(cls.STRUCT_FORMAT, extended_format)
 
-        kstart = cls(position)
-        kstart.scale = Vector3(*unpack(">fff", f.read(12)))
-        kstart.rotation = Rotation.from_file(f)
-        kstart.poleposition = read_uint8(f)
-        kstart.playerid = read_uint8(f)
-        kstart.unknown = read_uint16(f)
-        #assert kstart.unknown == 0
+    @classmethod
+    def from_unpacked(cls, values, extended_format: bool):
+        kstart = cls(Vector3(values[0], values[1], values[2]),
+                     Rotation.from_mkdd_rotation(*values[6:12]))
+        kstart.scale = Vector3(values[3], values[4], values[5])
+        kstart.poleposition, kstart.playerid, kstart.unknown = values[12:15]
 
         if extended_format:
-            kstart.hidden = f.read(1) != b'\x00'
+            kstart.hidden = values[-1] != 0
 
         return kstart
 
@@ -1253,12 +1496,12 @@ class KartStartPoints(object):
         self.positions = []
 
     @classmethod
-    def from_file(cls, f, count, extended_format: bool):
+    def from_buffer(cls, buffer, offset, count, extended_format: bool):
         kspoints = cls()
-
-        for i in range(count):
-            kstart = KartStartPoint.from_file(f, extended_format)
-            kspoints.positions.append(kstart)
+        kspoints.positions = [
+            KartStartPoint.from_unpacked(values, extended_format) for values in iter_records(
+                buffer, offset, count, KartStartPoint.get_struct(extended_format))
+        ]
 
         return kspoints
 
@@ -1281,6 +1524,8 @@ REVERSE_AREA_TYPES = dict(zip(AREA_TYPES.values(), AREA_TYPES.keys()))
 
 
 class Feather:
+    __slots__ = ('i0', 'i1')
+
     def __init__(self):
         self.i0 = 0
         self.i1 = 0
@@ -1299,10 +1544,14 @@ class Feather:
 
 
 class Area(PositionedObject):
-    def __init__(self, position):
+    STRUCT_FORMAT = ">ffffffhhhhhhBBhIIhhhh"
+    __slots__ = ('scale', 'rotation', 'shape', 'area_type', 'camera', '_cameraindex', 'feather',
+                 'unkfixedpoint', 'unkshort', 'shadow_id', 'lightparam_index', 'hidden', 'widget')
+
+    def __init__(self, position, rotation: Rotation = None):
         super().__init__(position)
         self.scale = Vector3(1.0, 1.0, 1.0)
-        self.rotation = Rotation.default()
+        self.rotation = rotation if rotation is not None else Rotation.default()
         self.shape = 0
         self.area_type = 0
         self.camera = None
@@ -1321,28 +1570,23 @@ class Area(PositionedObject):
         return cls(Vector3(0.0, 0.0, 0.0))
 
     @classmethod
-    def from_file(cls, f, extended_format: bool):
-        position = Vector3(*unpack(">fff", f.read(12)))
-
-        area = cls(position)
-        area.scale = Vector3(*unpack(">fff", f.read(12)))
-        area.rotation = Rotation.from_file(f)
-        area.shape = read_uint8(f)
-        area.area_type = read_uint8(f)
-        area._cameraindex = read_int16(f)
-
-        area.feather.i0 = read_uint32(f)
-        area.feather.i1 = read_uint32(f)
-        area.unkfixedpoint = read_int16(f)
-        area.unkshort = read_int16(f)
-        area.shadow_id = read_int16(f)
-        area.lightparam_index = read_int16(f)
+    def get_struct(cls, extended_format: bool) -> Struct:
+        return record_struct(cls.STRUCT_FORMAT, extended_format)
+
+    @classmethod
+    def from_unpacked(cls, values, extended_format: bool):
+        area = cls(Vector3(values[0], values[1], values[2]),
+                   Rotation.from_mkdd_rotation(*values[6:12]))
+        area.scale = Vector3(values[3], values[4], values[5])
+        area.shape, area.area_type, area._cameraindex = values[12:15]
+        area.feather.i0, area.feather.i1 = values[15:17]
+        area.unkfixedpoint, area.unkshort, area.shadow_id, area.lightparam_index = values[17:21]
 
         assert area.shape in (0, 1)
-        assert area.area_type in list(AREA_TYPES.keys())
+        assert area.area_type in AREA_TYPES
 
         if extended_format:
-            area.hidden = f.read(1) != b'\x00'
+            area.hidden = values[-1] != 0
 
         return area
 
@@ -1421,10 +1665,12 @@ class Areas(object):
         self.areas = []
 
     @classmethod
-    def from_file(cls, f, count, extended_format: bool):
+    def from_buffer(cls, buffer, offset, count, extended_format: bool):
         areas = cls()
-        for i in range(count):
-            areas.areas.append(Area.from_file(f, extended_format))
+        areas.areas = [
+            Area.from_unpacked(values, extended_format)
+            for values in iter_records(buffer, offset, count, Area.get_struct(extended_format))
+        ]
 
         return areas
 
@@ -1433,6 +1679,8 @@ class Areas(object):
 # Cameras
 
 class FOV:
+    __slots__ = ('start', 'end')
+
     def __init__(self):
         self.start = 0
         self.end = 0
@@ -1451,6 +1699,8 @@ class FOV:
 
 
 class Shimmer:
+    __slots__ = ('z0', 'z1')
+
     def __init__(self):
         self.z0 = 0
         self.z1 = 0
@@ -1469,11 +1719,16 @@ class Shimmer:
 
 
 class Camera(PositionedObject):
-    def __init__(self, position):
+    STRUCT_FORMAT = ">fffhhhhhhffffffHHHHHHhHHh4s"
+    __slots__ = ('position2', 'position3', 'rotation', 'camtype', 'fov', 'camduration',
+                 'startcamera', 'shimmer', 'route', 'routespeed', 'nextcam', '_nextcam', 'name',
+                 'hidden', 'widget')
+
+    def __init__(self, position, rotation: Rotation = None):
         super().__init__(position)
         self.position2 = Vector3(0.0, 0.0, 0.0)
         self.position3 = Vector3(0.0, 0.0, 0.0)
-        self.rotation = Rotation.default()
+        self.rotation = rotation if rotation is not None else Rotation.default()
         self.camtype = 0
         self.fov = FOV()
         self.camduration = 0
@@ -1493,21 +1748,19 @@ class Camera(PositionedObject):
         return cls(Vector3(0.0, 0.0, 0.0))
 
     @classmethod
-    def from_file(cls, f, routes: ObjectContainer, extended_format: bool):
-        position = Vector3(*unpack(">fff", f.read(12)))
-
-        cam = cls(position)
-        cam.rotation = Rotation.from_file(f)
-        cam.position2 = Vector3(*unpack(">fff", f.read(12)))
-        cam.position3 = Vector3(*unpack(">fff", f.read(12)))
-        cam.camtype = read_uint16(f)
-        cam.fov.start = read_uint16(f)
-        cam.camduration = read_uint16(f)
-        cam.startcamera = read_uint16(f)
-        cam.shimmer.z0 = read_uint16(f)
-        cam.shimmer.z1 = read_uint16(f)
-
-        pathid = read_int16(f)
+    def get_struct(cls, extended_format: bool) -> Struct:
+        return record_struct(cls.STRUCT_FORMAT, extended_format)
+
+    @classmethod
+    def from_unpacked(cls, values, extended_format: bool, routes: ObjectContainer):
+        cam = cls(Vector3(values[0], values[1], values[2]),
+                  Rotation.from_mkdd_rotation(*values[3:9]))
+        cam.position2 = Vector3(values[9], values[10], values[11])
+        cam.position3 = Vector3(values[12], values[13], values[14])
+        (cam.camtype, cam.fov.start, cam.camduration, cam.startcamera, cam.shimmer.z0,
+         cam.shimmer.z1) = values[15:21]
+
+        pathid = values[21]
 
         if pathid < 0:
             cam.route = None
@@ -1518,13 +1771,11 @@ class Camera(PositionedObject):
                 print("Camera had an invalid route id")
                 cam.route = None
 
-        cam.routespeed = read_uint16(f)
-        cam.fov.end = read_uint16(f)
-        cam._nextcam = read_int16(f)
-        cam.name = str(f.read(4), encoding="ascii")
+        cam.routespeed, cam.fov.end, cam._nextcam = values[22:25]
+        cam.name = str(values[25], encoding="ascii")
 
         if extended_format:
-            cam.hidden = f.read(1) != b'\x00'
+            cam.hidden = values[-1] != 0
 
         return cam
 
@@ -1624,9 +1875,12 @@ class Camera(PositionedObject):
 # Section 9
 # Jugem Points
 class JugemPoint(PositionedObject):
-    def __init__(self, position):
+    STRUCT_FORMAT = ">fffhhhhhhHHhh"
+    __slots__ = ('rotation', 'respawn_id', 'unk1', 'unk2', 'unk3', 'hidden', 'widget')
+
+    def __init__(self, position, rotation: Rotation = None):
         super().__init__(position)
-        self.rotation = Rotation.default()
+        self.rotation = rotation if rotation is not None else Rotation.default()
         self.respawn_id = 0
         self.unk1 = 0
         self.unk2 = 0
@@ -1640,17 +1894,17 @@ class JugemPoint(PositionedObject):
         return cls(Vector3(0.0, 0.0, 0.0))
 
     @classmethod
-    def from_file(cls, f, extended_format: bool):
-        position = Vector3(*unpack(">fff", f.read(12)))
-        jugem = cls(position)
-        jugem.rotation = Rotation.from_file(f)
-        jugem.respawn_id = read_uint16(f)
-        jugem.unk1 = read_uint16(f)
-        jugem.unk2 = read_int16(f)
-        jugem.unk3 = read_int16(f)
+    def get_struct(cls, extended_format: bool) -> Struct:
+        return record_struct(cls.STRUCT_FORMAT, extended_format)
+
+    @classmethod
+    def from_unpacked(cls, values, extended_format: bool):
+        jugem = cls(Vector3(values[0], values[1], values[2]),
+                    Rotation.from_mkdd_rotation(*values[3:9]))
+        jugem.respawn_id, jugem.unk1, jugem.unk2, jugem.unk3 = values[9:13]
 
         if extended_format:
-            jugem.hidden = f.read(1) != b'\x00'
+            jugem.hidden = values[-1] != 0
 
         return jugem
 
@@ -1693,6 +1947,9 @@ class JugemPoint(PositionedObject):
 # Section 10
 # LightParam
 class LightParam(PositionedObject):
+    STRUCT_FORMAT = ">BBBBfffBBBB"
+    __slots__ = ('color1', 'color2', 'widget')
+
     def __init__(self, position):
         super().__init__(position)
         self.color1 = ColorRGBA(0x64, 0x64, 0x64, 0xFF)
@@ -1705,11 +1962,15 @@ class LightParam(PositionedObject):
         return cls(Vector3(0.0, 0.0, 0.0))
 
     @classmethod
-    def from_file(cls, f, extended_format: bool):
+    def get_struct(cls, extended_format: bool) -> Struct:
+        return record_struct(cls.STRUCT_FORMAT, False)
+
+    @classmethod
+    def from_unpacked(cls, values, extended_format: bool):
         lp = cls.new()
-        lp.color1 = ColorRGBA.from_file(f)
-        lp.position = Vector3(*unpack(">fff", f.read(12)))
-        lp.color2 = ColorRGBA.from_file(f)
+        lp.color1 = ColorRGBA(*values[0:4])
+        lp.position = Vector3(*values[4:7])
+        lp.color2 = ColorRGBA(*values[7:11])
 
         return lp
 
@@ -1747,6 +2008,9 @@ class LightParam(PositionedObject):
 # Section 11
 # MG (MiniGame?)
 class MGEntry(object):
+    STRUCT_FORMAT = ">hhhh"
+    __slots__ = ('unk1', 'unk2', 'unk3', 'unk4', 'widget')
+
     def __init__(self):
         self.unk1 = 0
         self.unk2 = 0
@@ -1760,12 +2024,13 @@ class MGEntry(object):
         return cls()
 
     @classmethod
-    def from_file(cls, f, extended_format: bool):
+    def get_struct(cls, extended_format: bool) -> Struct:
+        return record_struct(cls.STRUCT_FORMAT, False)
+
+    @classmethod
+    def from_unpacked(cls, values, extended_format: bool):
         mgentry = MGEntry()
-        mgentry.unk1 = read_int16(f)
-        mgentry.unk2 = read_int16(f)
-        mgentry.unk3 = read_int16(f)
-        mgentry.unk4 = read_int16(f)
+        mgentry.unk1, mgentry.unk2, mgentry.unk3, mgentry.unk4 = values[0:4]
 
         return mgentry
 
@@ -1797,6 +2062,85 @@ class MGEntry(object):
         return self
 
 
+# Sections each type of entity is encoded in. Groups also cover the points they contain.
+OBJECT_SECTIONS = {
+    EnemyPointGroup: (ENEMYITEMPOINT, ),
+    EnemyPoint: (ENEMYITEMPOINT, ),
+    CheckpointGroup: (CHECKPOINT, ),
+    Checkpoint: (CHECKPOINT, ),
+    Route: (ROUTEGROUP, ROUTEPOINT),
+    RoutePoint: (ROUTEPOINT, ),
+    MapObject: (OBJECTS, ),
+    KartStartPoint: (KARTPOINT, ),
+    Area: (AREA, ),
+    Camera: (CAMERA, ),
+    JugemPoint: (RESPAWNPOINT, ),
+    LightParam: (LIGHTPARAM, ),
+    MGEntry: (MINIGAME, ),
+}
+
+# Sections that refer to entries of another section by index, and that therefore need to be
+# re-encoded when the other section changes.
+SECTION_DEPENDENTS = {
+    ROUTEGROUP: (OBJECTS, CAMERA),
+    CAMERA: (AREA, ),
+}
+
+# Attributes that hold the entries of each section. Route groups and route points are held together.
+SECTION_ATTRIBUTES = {
+    ENEMYITEMPOINT: 'enemypointgroups',
+    CHECKPOINT: 'checkpoints',
+    ROUTEGROUP: 'routes',
+    ROUTEPOINT: 'routes',
+    OBJECTS: 'objects',
+    KARTPOINT: 'kartpoints',
+    AREA: 'areas',
+    CAMERA: 'cameras',
+    RESPAWNPOINT: 'respawnpoints',
+    LIGHTPARAM: 'lightparams',
+    MINIGAME: 'mgentries',
+}
+
+# Attributes of the document that are encoded in the header.
+HEADER_ATTRIBUTES = (
+    'roll', 'rgb_ambient', 'rgba_light', 'lightsource', 'fog_type', 'fog_color', 'fog_startz',
+    'fog_endz', 'lod_bias', 'dummy_start_line', 'snow_effects', 'shadow_opacity',
+    'starting_point_count', 'sky_follow', 'shadow_color', 'lap_count', 'music_id'
+)
+
+# Section that each attribute of the document holds the entries of.
+ATTRIBUTE_SECTIONS = {
+    attribute: section
+    for section, attribute in reversed(SECTION_ATTRIBUTES.items())
+}
+
+# Sections that are decoded together in lazily decoded documents, as their entries refer to each
+# other.
+LAZY_SECTION_GROUPS = (
+    (ENEMYITEMPOINT, ),
+    (CHECKPOINT, ),
+    (ROUTEGROUP, ROUTEPOINT, OBJECTS, AREA, CAMERA),
+    (KARTPOINT, ),
+    (RESPAWNPOINT, ),
+    (LIGHTPARAM, ),
+    (MINIGAME, ),
+)
+
+# Encoded document that sections are decoded from, along with the section counts and offsets that
+# were read from its header.
+SectionTable = collections.namedtuple('SectionTable',
+                                      ('data', 'old_bol', 'extended_format', 'counts', 'offsets'))
+
+# Whether reused encoded sections are compared with a fresh encoding of the section, to catch
+# modifications that were not notified through `BOL.mark_dirty()` or `BOL.mark_objects_dirty()`.
+# Enabled in the debug UI, as it defeats the purpose of the cache.
+CHECK_ENCODED_SECTIONS = False
+
+# Source of the version stamps of the documents. Stamps are unique across all `BOL` instances, so
+# that a stamp identifies both a document and its state.
+_version_stamps = itertools.count()
+
+
 class BOL(object):
     def __init__(self):
         self.roll = 0
@@ -1833,6 +2177,119 @@ class BOL(object):
         self.lightparams = ObjectContainer()
         self.mgentries = ObjectContainer()
 
+        # Encoded bytes of the sections that have not been modified since they were last written,
+        # keyed by section and format.
+        self._encoded_sections = {}
+
+        # Stamp that changes on every modification of the document, which is cheaper to compare
+        # than the encoded document.
+        self.version = next(_version_stamps)
+
+    def mark_dirty(self, *sections: int):
+        """
+        Marks the given sections (or all sections if none is given) as modified, so that they are
+        encoded again in the next write. The version stamp of the document is also renewed.
+
+        Entries in a section are cached in their encoded form once written; any change in the
+        section must be notified through this method, or else stale data will be written.
+        """
+        self._clear_encoded_sections(sections)
+
+        if (not sections or ENEMYITEMPOINT in sections) and self.is_decoded(ENEMYITEMPOINT):
+            self.enemypointgroups.invalidate_index()
+
+    def _clear_encoded_sections(self, sections):
+        self.version = next(_version_stamps)
+
+        if not sections:
+            self._encoded_sections.clear()
+            return
+
+        pending = list(sections)
+        while pending:
+            section = pending.pop()
+            self._encoded_sections.pop((section, False), None)
+            self._encoded_sections.pop((section, True), None)
+            pending.extend(SECTION_DEPENDENTS.get(section, ()))
+
+    def mark_objects_dirty(self, objects):
+        """
+        Marks the sections that the given objects belong to as modified.
+
+        Only modifications to the objects themselves are expected (e.g. a moved point); inserted or
+        removed objects must be notified through `mark_dirty()`.
+        """
+        sections = set()
+        enemy_points = []
+        enemy_point_groups = False
+        for obj in objects:
+            sections.update(OBJECT_SECTIONS.get(type(obj), ()))
+            if isinstance(obj, EnemyPoint):
+                enemy_points.append(obj)
+            elif isinstance(obj, EnemyPointGroup):
+                enemy_point_groups = True
+        if sections:
+            self._clear_encoded_sections(sections)
+
+            if ENEMYITEMPOINT in sections and self.is_decoded(ENEMYITEMPOINT):
+                if enemy_point_groups:
+                    self.enemypointgroups.invalidate_index()
+                else:
+                    self.enemypointgroups.update_index(enemy_points)
+        else:
+            # Objects that are not encoded in a section (e.g. the document itself, whose fields
+            # are encoded in the header) only renew the version stamp.
+            self.version = next(_version_stamps)
+
+    def is_dirty(self, section: int, extended_format: bool = False) -> bool:
+        return (section, extended_format) not in self._encoded_sections
+
+    def update_sections(self, other: 'BOL', sections) -> 'set[int]':
+        """
+        Adopts the header fields of `other`, and the entries of the given sections. Entries in the
+        remaining sections are kept, so that their identity (and the widgets bound to them) is
+        preserved; the two documents are expected to only differ in the given sections.
+
+        References across sections (e.g. the route of an object, or the camera of an area) are
+        relinked by index. Returns the sections that were adopted.
+        """
+        sections = set(sections)
+        if ROUTEGROUP in sections or ROUTEPOINT in sections:
+            sections.update((ROUTEGROUP, ROUTEPOINT))
+
+        for attribute in HEADER_ATTRIBUTES:
+            setattr(self, attribute, getattr(other, attribute))
+
+        route_indexes = {}
+        camera_indexes = {}
+        for bol in (self, other):
+            route_indexes.update((id(route), i) for i, route in enumerate(bol.routes))
+            camera_indexes.update((id(camera), i) for i, camera in enumerate(bol.cameras))
+
+        for attribute in set(SECTION_ATTRIBUTES[section] for section in sections):
+            setattr(self, attribute, getattr(other, attribute))
+
+        def relink(obj, attribute, indexes, container):
+            target = getattr(obj, attribute)
+            if target is not None:
+                index = indexes.get(id(target))
+                if index is not None and index < len(container):
+                    setattr(obj, attribute, container[index])
+
+        for obj in self.objects.objects:
+            relink(obj, 'route', route_indexes, self.routes)
+        for camera in self.cameras:
+            relink(camera, 'route', route_indexes, self.routes)
+        for area in self.areas.areas:
+            relink(area, 'camera', camera_indexes, self.cameras)
+
+        if sections:
+            self.mark_dirty(*sections)
+        else:
+            self.version = next(_version_stamps)
+
+        return sections
+
     def objects_with_position(self):
         for group in self.enemypointgroups.groups.values():
             for point in group.points:
@@ -1920,130 +2377,261 @@ class BOL(object):
         return area_cameras
 
     @classmethod
-    def from_file(cls, f, extended_format: bool = False):
+    def from_file(cls, f, extended_format: bool = False, lazy: bool = False):
+        return cls.from_buffer(f.read(), extended_format, lazy)
+
+    @classmethod
+    def _from_header(cls, view: memoryview) -> 'tuple[BOL, bool, dict, dict]':
+        """
+        Decodes the header into a new document, and returns it with the old format flag and the
+        section counts and offsets.
+        """
         bol = cls()
-        magic = f.read(4)
+        magic = bytes(view[0:4])
         assert magic == b"0015" or magic == b"0012"
         old_bol = magic == b"0012"
 
-        bol.roll = read_uint8(f)
-        bol.rgb_ambient = ColorRGB.from_file(f)
-
         if not old_bol:
-            bol.rgba_light = ColorRGBA.from_file(f)
-            bol.lightsource = Vector3(read_float(f), read_float(f), read_float(f))
-
-        bol.lap_count = read_uint8(f)
-        bol.music_id = read_uint8(f)
-
-        sectioncounts = {}
-        for i in (ENEMYITEMPOINT, CHECKPOINT, OBJECTS, AREA, CAMERA, ROUTEGROUP, RESPAWNPOINT):
-            sectioncounts[i] = read_uint16(f)
-
-        bol.fog_type = read_uint8(f)
-        bol.fog_color = ColorRGB.from_file(f)
-
-        bol.fog_startz = read_float(f)
-        bol.fog_endz = read_float(f)
-        bol.lod_bias = read_uint8(f)
-        bol.dummy_start_line = read_uint8(f)
+            values = HEADER_PREFIX_STRUCT.unpack_from(view, 4)
+            bol.roll = values[0]
+            bol.rgb_ambient = ColorRGB(*values[1:4])
+            bol.rgba_light = ColorRGBA(*values[4:8])
+            bol.lightsource = Vector3(*values[8:11])
+            offset = 4 + HEADER_PREFIX_STRUCT.size
+        else:
+            values = OLD_HEADER_PREFIX_STRUCT.unpack_from(view, 4)
+            bol.roll = values[0]
+            bol.rgb_ambient = ColorRGB(*values[1:4])
+            offset = 4 + OLD_HEADER_PREFIX_STRUCT.size
+
+        values = HEADER_STRUCT.unpack_from(view, offset)
+        bol.lap_count, bol.music_id = values[0:2]
+
+        sectioncounts = dict(zip(
+            (ENEMYITEMPOINT, CHECKPOINT, OBJECTS, AREA, CAMERA, ROUTEGROUP, RESPAWNPOINT),
+            values[2:9]))
+
+        bol.fog_type = values[9]
+        bol.fog_color = ColorRGB(*values[10:13])
+        bol.fog_startz, bol.fog_endz = values[13:15]
+        bol.lod_bias, bol.dummy_start_line, bol.snow_effects, bol.shadow_opacity = values[15:19]
         assert bol.lod_bias in (0, 1)
         assert bol.dummy_start_line in (0, 1)
-        bol.snow_effects = read_uint8(f)
-        bol.shadow_opacity = read_uint8(f)
-        bol.shadow_color = ColorRGB.from_file(f)
-        bol.starting_point_count = read_uint8(f)
-        bol.sky_follow = read_uint8(f)
+        bol.shadow_color = ColorRGB(*values[19:22])
+        bol.starting_point_count, bol.sky_follow = values[22:24]
         assert bol.sky_follow in (0, 1)
 
-        sectioncounts[LIGHTPARAM] = read_uint8(f)
-        sectioncounts[MINIGAME] = read_uint8(f)
-        padding = read_uint8(f)
+        sectioncounts[LIGHTPARAM], sectioncounts[MINIGAME] = values[24:26]
+        padding = values[26]
         assert padding == 0
 
-        filestart = read_uint32(f)
+        filestart = values[27]
         assert filestart == 0
 
-        sectionoffsets = {}
-        for i in range(11):
-            sectionoffsets[i+1] = read_uint32(f)
+        sectionoffsets = dict(zip(range(1, 12), values[28:39]))
 
-        padding = f.read(12) # padding
+        padding = values[39]
         assert padding == b"\x00"*12
-        endofheader = f.tell()
-
-
-        #calculated_count = (sectionoffsets[CHECKPOINT] - sectionoffsets[ENEMYITEMPOINT])//0x20
-        #assert sectioncounts[ENEMYITEMPOINT] == calculated_count
-        f.seek(sectionoffsets[ENEMYITEMPOINT])
-        bol.enemypointgroups = EnemyPointGroups.from_file(f, sectioncounts[ENEMYITEMPOINT], old_bol,
-                                                          extended_format)
 
-        f.seek(sectionoffsets[CHECKPOINT])
-        bol.checkpoints = CheckpointGroups.from_file(f, sectioncounts[CHECKPOINT], extended_format)
+        return bol, old_bol, sectioncounts, sectionoffsets
 
-        f.seek(sectionoffsets[ROUTEGROUP])
-        bol.routes = ObjectContainer.from_file(f, sectioncounts[ROUTEGROUP], Route, extended_format)
-
-        f.seek(sectionoffsets[ROUTEPOINT])
-        routepoints = []
-        route_struct_size = RoutePoint.get_struct_size(extended_format)
-        count = (sectionoffsets[OBJECTS] - sectionoffsets[ROUTEPOINT]) // route_struct_size
-        for i in range(count):
-            routepoints.append(RoutePoint.from_file(f, extended_format))
+    @classmethod
+    def from_buffer(cls, data, extended_format: bool = False, lazy: bool = False) -> 'BOL':
+        """
+        Decodes the document. If `lazy` is true, only the header is decoded upfront; each section
+        is decoded the first time that its attribute is accessed, and sections that are never
+        accessed are written back with their original bytes.
+        """
+        if lazy:
+            data = bytes(data)
+        view = memoryview(data)
+        bol, old_bol, sectioncounts, sectionoffsets = cls._from_header(view)
+        sectioncounts[ROUTEPOINT] = ((sectionoffsets[OBJECTS] - sectionoffsets[ROUTEPOINT]) //
+                                     RoutePoint.get_struct_size(extended_format))
+        sectioncounts[KARTPOINT] = ((sectionoffsets[AREA] - sectionoffsets[KARTPOINT]) //
+                                    KartStartPoint.get_struct_size(extended_format))
+        table = SectionTable(data, old_bol, extended_format, sectioncounts, sectionoffsets)
+
+        if not lazy:
+            bol._decode_sections(table, range(ENEMYITEMPOINT, MINIGAME + 1))
+            return bol
+
+        for attribute in set(SECTION_ATTRIBUTES.values()):
+            delattr(bol, attribute)
+        bol._lazy_table = table
+        bol._undecoded_sections = set(range(ENEMYITEMPOINT, MINIGAME + 1))
+
+        # Unless the sections are laid out back to back, their original bytes cannot be sliced.
+        offsets = [sectionoffsets[section] for section in range(ENEMYITEMPOINT, MINIGAME + 1)]
+        if offsets == sorted(offsets):
+            end = (sectionoffsets[MINIGAME] +
+                   sectioncounts[MINIGAME] * MGEntry.get_struct(extended_format).size)
+            for section, start, end in zip(range(ENEMYITEMPOINT, MINIGAME + 1), offsets,
+                                           offsets[1:] + [end]):
+                if section == ENEMYITEMPOINT and old_bol:
+                    continue  # Enemy points are always written in the new format.
+                bol._encoded_sections[(section, extended_format)] = bytes(view[start:end])
 
-        for route in bol.routes:
-            route.add_routepoints(routepoints)
+        return bol
 
-        f.seek(sectionoffsets[OBJECTS])
-        bol.objects = MapObjects.from_file(f, sectioncounts[OBJECTS], bol.routes, extended_format)
+    def __getattr__(self, name: str):
+        # Only reached for attributes that are not set, which in lazily decoded documents include
+        # the sections that have not been decoded yet.
+        table = self.__dict__.get('_lazy_table')
+        section = ATTRIBUTE_SECTIONS.get(name)
+        if table is None or section is None:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
 
-        f.seek(sectionoffsets[KARTPOINT])
-        kart_start_point_struct_size = KartStartPoint.get_struct_size(extended_format)
-        count = (sectionoffsets[AREA] - sectionoffsets[KARTPOINT]) // kart_start_point_struct_size
-        bol.kartpoints = KartStartPoints.from_file(f, count, extended_format)
+        sections = next(group for group in LAZY_SECTION_GROUPS if section in group)
+        self._decode_sections(table, sections)
 
-        # on the dekoboko dev track from a MKDD demo this assertion doesn't hold for some reason
-        if not old_bol:
-            assert len(bol.kartpoints.positions) == bol.starting_point_count
-        else:
-            print("Old bol detected, fixing starting point count and player id of first kart position...")
-            bol.starting_point_count = bol.kartpoints.positions
-            if len(bol.kartpoints.positions) > 0:
-                bol.kartpoints.positions[0].playerid = 0xFF
+        # Once accessed, sections may be modified; they are no longer written with their original
+        # bytes.
+        for section in sections:
+            self._encoded_sections.pop((section, False), None)
+            self._encoded_sections.pop((section, True), None)
 
-        f.seek(sectionoffsets[AREA])
-        bol.areas = Areas.from_file(f, sectioncounts[AREA], extended_format)
+        self._undecoded_sections.difference_update(sections)
+        if not self._undecoded_sections:
+            del self._lazy_table
 
-        f.seek(sectionoffsets[CAMERA])
-        bol.cameras = ObjectContainer.from_file(f, sectioncounts[CAMERA], Camera, bol.routes,
-                                                extended_format)
-        for camera in bol.cameras:
-            camera.setnextcam(bol.cameras)
+        return self.__dict__[name]
 
-        for area in bol.areas.areas:
-            area.setcam(bol.cameras)
+    def is_decoded(self, section: int) -> bool:
+        """
+        Returns whether the entries of the section have been decoded, which is only not the case in
+        lazily decoded documents.
+        """
+        return section not in self.__dict__.get('_undecoded_sections', ())
 
-        f.seek(sectionoffsets[RESPAWNPOINT])
-        bol.respawnpoints = ObjectContainer.from_file(f, sectioncounts[RESPAWNPOINT], JugemPoint,
+    def get_section_count(self, section: int) -> int:
+        """
+        Returns the number of entries in the section, as written in the header. Sections that have
+        not been decoded are not decoded to count their entries.
+        """
+        if not self.is_decoded(section):
+            return self._lazy_table.counts[section]
+
+        if section == ENEMYITEMPOINT:
+            return sum(len(group.points) for group in self.enemypointgroups.groups)
+        if section == CHECKPOINT:
+            return len(self.checkpoints.groups)
+        if section == ROUTEGROUP:
+            return len(self.routes)
+        if section == ROUTEPOINT:
+            return sum(len(route.points) for route in self.routes)
+        if section == OBJECTS:
+            return len(self.objects.objects)
+        if section == KARTPOINT:
+            return len(self.kartpoints.positions)
+        if section == AREA:
+            return len(self.areas.areas)
+        return len(getattr(self, SECTION_ATTRIBUTES[section]))
+
+    def _decode_sections(self, table: 'SectionTable', sections):
+        view = memoryview(table.data)
+        old_bol = table.old_bol
+        extended_format = table.extended_format
+        sectioncounts = table.counts
+        sectionoffsets = table.offsets
+
+        if ENEMYITEMPOINT in sections:
+            self.enemypointgroups = EnemyPointGroups.from_buffer(
+                view, sectionoffsets[ENEMYITEMPOINT], sectioncounts[ENEMYITEMPOINT], old_bol,
+                extended_format)
+
+        if CHECKPOINT in sections:
+            self.checkpoints = CheckpointGroups.from_buffer(view, sectionoffsets[CHECKPOINT],
+                                                            sectioncounts[CHECKPOINT],
+                                                            extended_format)
+
+        if ROUTEGROUP in sections:
+            self.routes = ObjectContainer.from_buffer(view, sectionoffsets[ROUTEGROUP],
+                                                      sectioncounts[ROUTEGROUP], Route,
                                                       extended_format)
 
-        f.seek(sectionoffsets[LIGHTPARAM])
+            routepoints = [
+                RoutePoint.from_unpacked(values, extended_format)
+                for values in iter_records(view, sectionoffsets[ROUTEPOINT],
+                                           sectioncounts[ROUTEPOINT],
+                                           RoutePoint.get_struct(extended_format))
+            ]
 
-        bol.lightparams = ObjectContainer.from_file(f, sectioncounts[LIGHTPARAM], LightParam,
-                                                    extended_format)
+            for route in self.routes:
+                route.add_routepoints(routepoints)
 
-        f.seek(sectionoffsets[MINIGAME])
-        bol.mgentries = ObjectContainer.from_file(f, sectioncounts[MINIGAME], MGEntry,
+        if OBJECTS in sections:
+            self.objects = MapObjects.from_buffer(view, sectionoffsets[OBJECTS],
+                                                  sectioncounts[OBJECTS], self.routes,
                                                   extended_format)
 
-        return bol
+        if KARTPOINT in sections:
+            self.kartpoints = KartStartPoints.from_buffer(view, sectionoffsets[KARTPOINT],
+                                                          sectioncounts[KARTPOINT],
+                                                          extended_format)
+
+            # on the dekoboko dev track from a MKDD demo this assertion doesn't hold for some reason
+            if not old_bol:
+                assert len(self.kartpoints.positions) == self.starting_point_count
+            else:
+                print("Old bol detected, fixing starting point count and player id of first kart position...")
+                self.starting_point_count = self.kartpoints.positions
+                if len(self.kartpoints.positions) > 0:
+                    self.kartpoints.positions[0].playerid = 0xFF
+
+        if AREA in sections:
+            self.areas = Areas.from_buffer(view, sectionoffsets[AREA], sectioncounts[AREA],
+                                           extended_format)
+
+        if CAMERA in sections:
+            self.cameras = ObjectContainer.from_buffer(view, sectionoffsets[CAMERA],
+                                                       sectioncounts[CAMERA], Camera,
+                                                       extended_format, self.routes)
+            for camera in self.cameras:
+                camera.setnextcam(self.cameras)
+
+        if AREA in sections:
+            for area in self.areas.areas:
+                area.setcam(self.cameras)
+
+        if RESPAWNPOINT in sections:
+            self.respawnpoints = ObjectContainer.from_buffer(view, sectionoffsets[RESPAWNPOINT],
+                                                             sectioncounts[RESPAWNPOINT],
+                                                             JugemPoint, extended_format)
+
+        if LIGHTPARAM in sections:
+            self.lightparams = ObjectContainer.from_buffer(view, sectionoffsets[LIGHTPARAM],
+                                                           sectioncounts[LIGHTPARAM], LightParam,
+                                                           extended_format)
+
+        if MINIGAME in sections:
+            self.mgentries = ObjectContainer.from_buffer(view, sectionoffsets[MINIGAME],
+                                                         sectioncounts[MINIGAME], MGEntry,
+                                                         extended_format)
 
     @classmethod
-    def from_bytes(cls, data: bytes, extended_format: bool = False) -> 'BOL':
-        return BOL.from_file(BytesIO(data), extended_format)
+    def from_bytes(cls, data: bytes, extended_format: bool = False, lazy: bool = False) -> 'BOL':
+        return BOL.from_buffer(data, extended_format, lazy)
+
+    def write(self, f, extended_format: bool = False, use_cache: bool = True):
+        for chunk in self.encode(extended_format, f.tell(), use_cache):
+            f.write(chunk)
 
-    def write(self, f, extended_format: bool = False):
+    def encode(self,
+               extended_format: bool = False,
+               start: int = 0,
+               use_cache: bool = True) -> 'list[bytes]':
+        """
+        Returns the encoded document as a list of chunks: the header, followed by the encoded bytes
+        of each section. `start` is the position of the document in the file, which the section
+        offsets in the header are relative to.
+        """
+        sections = [
+            self.encode_section(section, extended_format, use_cache)
+            for section in range(ENEMYITEMPOINT, MINIGAME + 1)
+        ]
+
+        f = BytesIO()
         f.write(b"0015")
         f.write(pack(">B", self.roll))
         self.rgb_ambient.write(f)
@@ -2051,16 +2639,9 @@ class BOL(object):
         f.write(pack(">fff", self.lightsource.x, self.lightsource.y, self.lightsource.z))
         f.write(pack(">BB", self.lap_count, self.music_id))
 
-        enemypoints = 0
-        for group in self.enemypointgroups.groups:
-            enemypoints += len(group.points)
-        write_uint16(f, enemypoints)
-        write_uint16(f, len(self.checkpoints.groups))
-        write_uint16(f, len(self.objects.objects))
-        write_uint16(f, len(self.areas.areas))
-        write_uint16(f, len(self.cameras))
-        write_uint16(f, len(self.routes))
-        write_uint16(f, len(self.respawnpoints))
+        for section in (ENEMYITEMPOINT, CHECKPOINT, OBJECTS, AREA, CAMERA, ROUTEGROUP,
+                        RESPAWNPOINT):
+            write_uint16(f, self.get_section_count(section))
 
         f.write(pack(">B", self.fog_type))
         self.fog_color.write(f)
@@ -2068,81 +2649,102 @@ class BOL(object):
                 self.fog_startz, self.fog_endz,
                 self.lod_bias, self.dummy_start_line, self.snow_effects, self.shadow_opacity))
         self.shadow_color.write(f)
-        f.write(pack(">BB", len(self.kartpoints.positions), self.sky_follow))
-        f.write(pack(">BB", len(self.lightparams), len(self.mgentries)))
+        f.write(pack(">BB", self.get_section_count(KARTPOINT), self.sky_follow))
+        f.write(pack(">BB", self.get_section_count(LIGHTPARAM), self.get_section_count(MINIGAME)))
         f.write(pack(">B", 0))  # padding
 
         f.write(b"\x00"*4) # Filestart 0
 
-        offset_start = f.tell()
-        offsets = []
-        for i in range(11):
-            f.write(b"FOOB") # placeholder for offsets
+        offset = start + f.tell() + 11 * 4 + 12
+        for section in sections:
+            f.write(pack(">I", offset))
+            offset += len(section)
         f.write(b"\x00"*12) # padding
 
-        offsets.append(f.tell())
-        for group in self.enemypointgroups.groups:
-            #group = self.enemypointgroups.groups[groupindex]
-            for point in group.points:
-                point.group = group.id
-                point.write(f, extended_format)
-
-        offsets.append(f.tell())
-        for group in self.checkpoints.groups:
-            group.write(f, extended_format)
-        for group in self.checkpoints.groups:
-            for point in group.points:
-                point.write(f, extended_format)
-
-        offsets.append(f.tell())
-
-        index = 0
-        for route in self.routes:
-            route.write(f, index, extended_format)
-            index += len(route.points)
-
-        offsets.append(f.tell())
-        for route in self.routes:
-            for point in route.points:
-                point.write(f, extended_format)
-
-        offsets.append(f.tell())
-        for obj in self.objects.objects:
-            obj.write(f, self.routes, extended_format)
-
-        offsets.append(f.tell())
-        for startpoint in self.kartpoints.positions:
-            startpoint.write(f, extended_format)
-
-        offsets.append(f.tell())
-        for area in self.areas.areas:
-            area.write(f, self.cameras, extended_format)
+        return [f.getvalue()] + sections
 
-        offsets.append(f.tell())
-        for camera in self.cameras:
-            camera.write(f, self.routes, self.cameras, extended_format)
-
-        offsets.append(f.tell())
-        for respawnpoint in self.respawnpoints:
-            respawnpoint.write(f, extended_format)
+    def encode_section(self,
+                       section: int,
+                       extended_format: bool = False,
+                       use_cache: bool = True) -> bytes:
+        """
+        Returns the encoded bytes of the given section. Sections that have not been marked as dirty
+        since they were last encoded are not encoded again, unless `use_cache` is `False` (e.g. when
+        saving to disk, so that a modification that was not notified is not lost).
+        """
+        key = (section, extended_format)
+        data = self._encoded_sections.get(key) if use_cache else None
+        if data is not None:
+            if CHECK_ENCODED_SECTIONS:
+                assert data == self._encode_section(section, extended_format), (
+                    f'Section {section} was modified without being marked as dirty')
+            return data
+
+        data = self._encoded_sections[key] = self._encode_section(section, extended_format)
+        return data
+
+    def _encode_section(self, section: int, extended_format: bool) -> bytes:
+        f = BytesIO()
 
-        offsets.append(f.tell())
-        for lightparam in self.lightparams:
-            lightparam.write(f, extended_format)
+        if section == ENEMYITEMPOINT:
+            for group in self.enemypointgroups.groups:
+                for point in group.points:
+                    point.group = group.id
+                    point.write(f, extended_format)
+
+        elif section == CHECKPOINT:
+            for group in self.checkpoints.groups:
+                group.write(f, extended_format)
+            for group in self.checkpoints.groups:
+                for point in group.points:
+                    point.write(f, extended_format)
+
+        elif section == ROUTEGROUP:
+            index = 0
+            for route in self.routes:
+                route.write(f, index, extended_format)
+                index += len(route.points)
+
+        elif section == ROUTEPOINT:
+            for route in self.routes:
+                for point in route.points:
+                    point.write(f, extended_format)
+
+        elif section == OBJECTS:
+            for obj in self.objects.objects:
+                obj.write(f, self.routes, extended_format)
+
+        elif section == KARTPOINT:
+            for startpoint in self.kartpoints.positions:
+                startpoint.write(f, extended_format)
+
+        elif section == AREA:
+            for area in self.areas.areas:
+                area.write(f, self.cameras, extended_format)
+
+        elif section == CAMERA:
+            for camera in self.cameras:
+                camera.write(f, self.routes, self.cameras, extended_format)
+
+        elif section == RESPAWNPOINT:
+            for respawnpoint in self.respawnpoints:
+                respawnpoint.write(f, extended_format)
+
+        elif section == LIGHTPARAM:
+            for lightparam in self.lightparams:
+                lightparam.write(f, extended_format)
+
+        elif section == MINIGAME:
+            for mgentry in self.mgentries:
+                mgentry.write(f, extended_format)
 
-        offsets.append(f.tell())
-        for mgentry in self.mgentries:
-            mgentry.write(f, extended_format)
+        else:
+            raise ValueError(f'Invalid section: {section}')
 
-        assert len(offsets) == 11
-        f.seek(offset_start)
-        for offset in offsets:
-            f.write(pack(">I", offset))
+        return f.getvalue()
 
     def to_bytes(self, extended_format: bool = False) -> bytes:
-        f = BytesIO()
-        self.write(f, extended_format)
-        return f.getvalue()
+        return b"".join(self.encode(extended_format))
 
     def adjust_respawn_point(self,
                              respawn_point: JugemPoint,
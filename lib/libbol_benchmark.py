@@ -0,0 +1,341 @@
+"""
+Benchmarks for the `libbol` module.
+
+Usage:
+
+    python -m lib.libbol_benchmark [--baseline <revision>] [<.bol or .arc file>...]
+
+When no file is given, a large synthetic course is generated and used instead.
+
+The decoder and the memory usage are compared against the `libbol` module of a baseline revision
+(by default, the first commit of the repository), which is loaded from Git.
+"""
+import argparse
+import gc
+import importlib
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from io import BytesIO
+
+from . import libbol
+from . import libbol_columns
+from . import rarc
+from .vectors import Vector3
+
+
+def make_synthetic_course(enemy_points: int = 5000,
+                          enemy_groups: int = 10,
+                          checkpoints: int = 2000,
+                          checkpoint_groups: int = 10,
+                          route_points: int = 2000,
+                          routes: int = 50,
+                          objects: int = 500,
+                          areas: int = 50,
+                          cameras: int = 20,
+                          respawn_points: int = 50,
+                          seed: int = 0) -> libbol.BOL:
+    """
+    Generates a course with the given number of entities, with pseudorandom values that survive a
+    round trip through the binary format.
+    """
+    rng = random.Random(seed)
+
+    def position():
+        return Vector3(float(rng.randint(-50000, 50000)), float(rng.randint(-500, 5000)),
+                       float(rng.randint(-50000, 50000)))
+
+    bol = libbol.BOL()
+
+    for group_index in range(enemy_groups):
+        group = libbol.EnemyPointGroup()
+        group.id = group_index
+        for _ in range(enemy_points // enemy_groups):
+            point = libbol.EnemyPoint.new()
+            point.position = position()
+            point.scale = float(rng.randint(500, 3000))
+            point.swerve = rng.randint(-3, 3)
+            point.group = group_index
+            group.points.append(point)
+        group.points[0].link = group_index
+        group.points[-1].link = (group_index + 1) % enemy_groups
+        bol.enemypointgroups.groups.append(group)
+
+    for group_index in range(checkpoint_groups):
+        group = libbol.CheckpointGroup(group_index)
+        group.prevgroup = [(group_index - 1) % checkpoint_groups, -1, -1, -1]
+        group.nextgroup = [(group_index + 1) % checkpoint_groups, -1, -1, -1]
+        for _ in range(checkpoints // checkpoint_groups):
+            group.points.append(libbol.Checkpoint(position(), position()))
+        bol.checkpoints.groups.append(group)
+
+    for _ in range(routes):
+        route = libbol.Route.new()
+        for _ in range(route_points // routes):
+            route.points.append(libbol.RoutePoint(position()))
+        bol.routes.append(route)
+
+    for i in range(objects):
+        obj = libbol.MapObject(position(), 1)
+        obj.route = bol.routes[i % routes] if routes and i % 2 else None
+        obj.userdata = [rng.randint(-100, 100) for _ in range(8)]
+        bol.objects.objects.append(obj)
+
+    for player in range(8):
+        kartpoint = libbol.KartStartPoint(position())
+        kartpoint.playerid = player
+        bol.kartpoints.positions.append(kartpoint)
+
+    for i in range(cameras):
+        camera = libbol.Camera(position())
+        camera.position2 = position()
+        camera.position3 = position()
+        camera.route = bol.routes[i % routes] if routes else None
+        camera.name = "cam{0}".format(i % 10)
+        bol.cameras.append(camera)
+    for i, camera in enumerate(bol.cameras[:-1]):
+        camera.nextcam = bol.cameras[i + 1]
+
+    for i in range(areas):
+        area = libbol.Area(position())
+        area.area_type = 1 if cameras else 0
+        area.camera = bol.cameras[i % cameras] if cameras else None
+        bol.areas.areas.append(area)
+
+    for i in range(respawn_points):
+        respawn_point = libbol.JugemPoint(position())
+        respawn_point.respawn_id = i
+        bol.respawnpoints.append(respawn_point)
+
+    bol.lightparams.append(libbol.LightParam.new())
+    bol.mgentries.append(libbol.MGEntry.new())
+
+    return bol
+
+
+def _read_bol_file(filepath: str) -> bytes:
+    if filepath.endswith('.bol'):
+        with open(filepath, 'rb') as f:
+            return f.read()
+
+    with open(filepath, 'rb') as f:
+        archive = rarc.Archive.from_file(f)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archive.extract_to(tmp_dir)
+        for dirpath, _dirnames, filenames in os.walk(tmp_dir):
+            for filename in filenames:
+                if filename.endswith('.bol'):
+                    with open(os.path.join(dirpath, filename), 'rb') as f:
+                        return f.read()
+
+    raise RuntimeError(f'No BOL file found in "{filepath}".')
+
+
+def load_baseline_libbol(revision: str = None):
+    """
+    Imports the `libbol` module, and the files that it depends on, as they were in the given
+    revision (by default, the first commit). Returns `None` if Git cannot provide them.
+    """
+    repository_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def git(*args) -> bytes:
+        return subprocess.run(('git', ) + args, cwd=repository_dir, capture_output=True,
+                              check=True).stdout
+
+    try:
+        if revision is None:
+            revision = git('rev-list', '--max-parents=0', 'HEAD').split()[-1].decode()
+        # The module loads JSON files next to it.
+        filenames = ['libbol.py', 'vectors.py']
+        filenames.extend(
+            os.path.basename(filepath)
+            for filepath in git('ls-tree', '--name-only', revision, 'lib/').decode().split()
+            if filepath.endswith('.json'))
+        sources = {filename: git('show', f'{revision}:lib/{filename}') for filename in filenames}
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    package_name = 'baseline_lib'
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        package_dir = os.path.join(tmp_dir, package_name)
+        os.mkdir(package_dir)
+        with open(os.path.join(package_dir, '__init__.py'), 'wb'):
+            pass
+        for filename, source in sources.items():
+            with open(os.path.join(package_dir, filename), 'wb') as f:
+                f.write(source)
+
+        sys.path.insert(0, tmp_dir)
+        try:
+            return importlib.import_module(f'{package_name}.libbol')
+        finally:
+            sys.path.remove(tmp_dir)
+
+
+def benchmark_decoder(name: str, data: bytes, baseline_libbol, repeat: int = 20):
+    if baseline_libbol is None:
+        print(f'{name}: no baseline revision to compare the decoder against')
+        return
+    baseline = min(
+        timeit.repeat(lambda: baseline_libbol.BOL.from_file(BytesIO(data)), number=1,
+                      repeat=repeat))
+    bulk = min(timeit.repeat(lambda: libbol.BOL.from_bytes(data), number=1, repeat=repeat))
+    print(f'{name}: {len(data)} bytes | baseline: {baseline * 1000:.2f} ms | '
+          f'bulk: {bulk * 1000:.2f} ms | speedup: {baseline / bulk:.2f}x')
+
+
+def _measure_memory(decode) -> 'tuple[int, object]':
+    gc.collect()
+    tracemalloc.start()
+    try:
+        bol = decode()
+        memory_usage, _peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return memory_usage, bol
+
+
+def benchmark_memory(name: str, data: bytes, baseline_libbol):
+    """
+    Compares the memory used by the decoded slotted objects with the memory used by the
+    dict-backed objects of the baseline revision.
+    """
+    memory_usage, bol = _measure_memory(lambda: libbol.BOL.from_bytes(data))
+    del bol
+    if baseline_libbol is not None:
+        baseline_memory_usage, bol = _measure_memory(
+            lambda: baseline_libbol.BOL.from_file(BytesIO(data)))
+    else:
+        baseline_memory_usage, bol = None, libbol.BOL.from_bytes(data)
+
+    point_count = (sum(len(group.points) for group in bol.enemypointgroups.groups) +
+                   sum(len(group.points) for group in bol.checkpoints.groups) +
+                   sum(len(route.points) for route in bol.routes))
+    del bol
+
+    def format_memory_usage(memory_usage: int) -> str:
+        return (f'{memory_usage / 1024 / 1024:.2f} MB '
+                f'({memory_usage / max(1, point_count):.0f} bytes per point)')
+
+    if baseline_memory_usage is None:
+        print(f'{name}: {point_count} points | slotted: {format_memory_usage(memory_usage)} | '
+              'no baseline revision to compare against')
+        return
+    print(f'{name}: {point_count} points | '
+          f'baseline: {format_memory_usage(baseline_memory_usage)} | '
+          f'slotted: {format_memory_usage(memory_usage)} | '
+          f'reduction: {baseline_memory_usage / memory_usage:.2f}x')
+
+
+def benchmark_lazy(name: str, data: bytes, repeat: int = 20):
+    """
+    Compares full and lazy decoding when only a header field and a small section are read, as a
+    batch script scanning a collection of courses would.
+    """
+
+    def read(lazy: bool):
+        bol = libbol.BOL.from_bytes(data, lazy=lazy)
+        return bol.music_id, len(bol.kartpoints.positions)
+
+    full = min(timeit.repeat(lambda: read(False), number=1, repeat=repeat))
+    lazy = min(timeit.repeat(lambda: read(True), number=1, repeat=repeat))
+    print(f'{name}: music ID and kart start points | full: {full * 1000:.2f} ms | '
+          f'lazy: {lazy * 1000:.3f} ms | speedup: {full / lazy:.0f}x')
+
+
+def benchmark_respawn_points(name: str, bol: libbol.BOL):
+    """
+    Adjusts every respawn point to its closest forward enemy point.
+    """
+    enemy_point_count = sum(len(group.points) for group in bol.enemypointgroups.groups)
+
+    def adjust_respawn_points():
+        bol.mark_dirty(libbol.ENEMYITEMPOINT)
+        for respawn_point in bol.respawnpoints:
+            bol.adjust_respawn_point(respawn_point, also_id=False)
+
+    elapsed = min(timeit.repeat(adjust_respawn_points, number=1, repeat=3))
+    print(f'{name}: {len(bol.respawnpoints)} respawn points, {enemy_point_count} enemy points | '
+          f'adjusted in {elapsed * 1000:.2f} ms')
+
+
+def benchmark_columns(name: str, data: bytes, repeat: int = 5):
+    """
+    Compares the columnar storage with the object model on decoding the document, translating
+    every point, and encoding the point sections.
+    """
+    sections = (libbol.ENEMYITEMPOINT, libbol.CHECKPOINT, libbol.ROUTEGROUP, libbol.ROUTEPOINT)
+    bol = libbol.BOL.from_bytes(data)
+    columns = libbol_columns.BOLColumns.from_bytes(data)
+    offset = Vector3(1.0, 2.0, 3.0)
+
+    def translate_objects():
+        for point in bol.enemypointgroups.points():
+            point.position += offset
+        for point in bol.checkpoints.points():
+            point.start += offset
+            point.end += offset
+        for route in bol.routes:
+            for point in route.points:
+                point.position += offset
+
+    def encode_objects():
+        bol.mark_dirty(*sections)
+        for section in sections:
+            bol.encode_section(section)
+
+    def encode_columns():
+        for section in sections:
+            columns.encode_section(section)
+
+    timings = (
+        ('decode', lambda: libbol.BOL.from_bytes(data),
+         lambda: libbol_columns.BOLColumns.from_bytes(data)),
+        ('translate', translate_objects, lambda: columns.translate((1.0, 2.0, 3.0))),
+        ('encode', encode_objects, encode_columns),
+    )
+    results = []
+    for operation, objects_function, columns_function in timings:
+        objects_time = min(timeit.repeat(objects_function, number=1, repeat=repeat))
+        columns_time = min(timeit.repeat(columns_function, number=1, repeat=repeat))
+        results.append(f'{operation}: {objects_time * 1000:.2f} ms -> '
+                       f'{columns_time * 1000:.2f} ms')
+    print(f'{name} (objects -> columns): ' + ' | '.join(results))
+
+
+def main(argv: list[str]):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--baseline', help='revision to compare the decoder against')
+    parser.add_argument('filepaths', nargs='*', help='.bol or .arc files')
+    args = parser.parse_args(argv)
+
+    baseline_libbol = load_baseline_libbol(args.baseline)
+
+    if args.filepaths:
+        for filepath in args.filepaths:
+            data = _read_bol_file(filepath)
+            benchmark_decoder(os.path.basename(filepath), data, baseline_libbol)
+            benchmark_memory(os.path.basename(filepath), data, baseline_libbol)
+            benchmark_lazy(os.path.basename(filepath), data)
+            benchmark_columns(os.path.basename(filepath), data)
+    else:
+        data = make_synthetic_course().to_bytes()
+        benchmark_decoder('synthetic course', data, baseline_libbol)
+        benchmark_lazy('synthetic course', data)
+
+        data = make_synthetic_course(enemy_points=30000, checkpoints=10000,
+                                     route_points=10000).to_bytes()
+        benchmark_memory('synthetic course (50k points)', data, baseline_libbol)
+        benchmark_columns('synthetic course (50k points)', data)
+
+        benchmark_respawn_points('synthetic course',
+                                 make_synthetic_course(enemy_points=20000, respawn_points=200))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,506 @@
+"""
+Columnar storage of the point-heavy sections of a BOL file: enemy points, checkpoints and route
+points.
+
+Points are held in NumPy structured arrays whose layout matches the big-endian records in the file,
+so that decoding or encoding a section is a single copy, and bulk operations over all the points of
+a course (translating, scaling, grounding, computing the extent) are vectorized calls. Lightweight
+proxies expose each row with the same attribute API as the `libbol` entities.
+
+The columns are meant for batch work over whole courses. Structural edits (inserting or removing
+points) are done in the `BOL` object model, which the columns can be built from and transferred
+back to with `BOLColumns.apply_to()`.
+"""
+import numpy
+
+from . import libbol
+from .vectors import Vector3
+
+ENEMY_POINT_FIELDS = [
+    ('position', '>f4', (3, )),
+    ('driftdirection', '>u2'),
+    ('link', '>i2'),
+    ('scale', '>f4'),
+    ('swerve', 'i1'),
+    ('itemsonly', 'u1'),
+    ('group', 'u1'),
+    ('driftacuteness', 'u1'),
+    ('driftduration', 'u1'),
+    ('driftsupplement', 'u1'),
+    ('nomushroomzone', 'u1'),
+    ('padding', 'V5'),
+]
+
+CHECKPOINT_GROUP_FIELDS = [
+    ('pointcount', '>u2'),
+    ('grouplink', '>u2'),
+    ('prevgroup', '>i2', (4, )),
+    ('nextgroup', '>i2', (4, )),
+]
+
+CHECKPOINT_FIELDS = [
+    ('start', '>f4', (3, )),
+    ('end', '>f4', (3, )),
+    ('unk1', 'u1'),
+    ('unk2', 'u1'),
+    ('unk3', 'u1'),
+    ('unk4', 'u1'),
+]
+
+ROUTE_FIELDS = [
+    ('pointcount', '>u2'),
+    ('pointstart', '>u2'),
+    ('unk1', '>u4'),
+    ('unk2', 'u1'),
+    ('padding', 'V7'),
+]
+
+ROUTE_POINT_FIELDS = [
+    ('position', '>f4', (3, )),
+    ('unk', '>u4'),
+    ('padding', 'V16'),
+]
+
+
+def record_dtype(fields: list, hidden_flag: bool) -> numpy.dtype:
+    """
+    Returns the (packed) dtype of a record, optionally followed by the byte that holds the hidden
+    flag in the extended format.
+    """
+    return numpy.dtype(fields + [('hidden', 'u1')] if hidden_flag else fields)
+
+
+def _from_records(records: numpy.ndarray, fields: list) -> numpy.ndarray:
+    # Columns are always stored in the extended layout, regardless of the format they are read
+    # from, so that the hidden flag is available.
+    array = numpy.zeros(len(records), dtype=record_dtype(fields, True))
+    for name in records.dtype.names:
+        array[name] = records[name]
+    return array
+
+
+def _to_records(array: numpy.ndarray, fields: list, hidden_flag: bool) -> numpy.ndarray:
+    records = numpy.zeros(len(array), dtype=record_dtype(fields, hidden_flag))
+    for name in records.dtype.names:
+        if name == 'padding':
+            continue
+        if name == 'hidden':
+            records[name] = array[name] != 0
+        else:
+            records[name] = array[name]
+    return records
+
+
+def compute_extent(positions) -> 'tuple[float, float, float, float, float, float] | None':
+    """
+    Returns the extent (min x, min y, min z, max x, max y, max z) of the given positions (an
+    `(N, 3)` array or a sequence of triples), or `None` if there are no positions.
+    """
+    positions = numpy.asarray(positions, dtype=numpy.float64).reshape(-1, 3)
+    if not len(positions):
+        return None
+    return (*positions.min(axis=0).tolist(), *positions.max(axis=0).tolist())
+
+
+def _get_row(point, names: 'tuple[str]') -> tuple:
+    row = []
+    for name in names:
+        if name == 'padding':
+            row.append(b'')
+            continue
+        value = getattr(point, name)
+        if isinstance(value, Vector3):
+            value = (value.x, value.y, value.z)
+        row.append(value)
+    return tuple(row)
+
+
+class ColumnVector3(Vector3):
+    """
+    A `Vector3` whose components are stored in a row of a column.
+    """
+    __slots__ = ('_values', )
+
+    def __init__(self, values: numpy.ndarray):
+        self._values = values
+
+    @property
+    def x(self):
+        return self._values[0].item()
+
+    @x.setter
+    def x(self, value):
+        self._values[0] = value
+
+    @property
+    def y(self):
+        return self._values[1].item()
+
+    @y.setter
+    def y(self, value):
+        self._values[1] = value
+
+    @property
+    def z(self):
+        return self._values[2].item()
+
+    @z.setter
+    def z(self, value):
+        self._values[2] = value
+
+
+def _field_property(name: str) -> property:
+
+    def getter(self):
+        return self._columns.array[name][self._index].item()
+
+    def setter(self, value):
+        self._columns.array[name][self._index] = value
+
+    return property(getter, setter)
+
+
+def _vector_property(name: str) -> property:
+
+    def getter(self):
+        return ColumnVector3(self._columns.array[name][self._index])
+
+    def setter(self, value):
+        self._columns.array[name][self._index] = (value.x, value.y, value.z)
+
+    return property(getter, setter)
+
+
+def _hidden_property() -> property:
+
+    def getter(self):
+        return bool(self._columns.array['hidden'][self._index])
+
+    def setter(self, value):
+        self._columns.array['hidden'][self._index] = bool(value)
+
+    return property(getter, setter)
+
+
+class _RowProxy:
+    __slots__ = ('_columns', '_index')
+
+    def __init__(self, columns: 'PointColumns', index: int):
+        self._columns = columns
+        self._index = index
+
+    def __eq__(self, other):
+        return (isinstance(other, _RowProxy) and self._columns is other._columns
+                and self._index == other._index)
+
+    def __hash__(self):
+        return hash((id(self._columns), self._index))
+
+    def set_values(self, point):
+        """
+        Copies the values of the given entity into the row.
+        """
+        array = self._columns.array
+        array[self._index] = _get_row(point, array.dtype.names)
+
+
+class EnemyPointProxy(_RowProxy):
+    __slots__ = ()
+
+    position = _vector_property('position')
+    driftdirection = _field_property('driftdirection')
+    link = _field_property('link')
+    scale = _field_property('scale')
+    swerve = _field_property('swerve')
+    itemsonly = _field_property('itemsonly')
+    group = _field_property('group')
+    driftacuteness = _field_property('driftacuteness')
+    driftduration = _field_property('driftduration')
+    driftsupplement = _field_property('driftsupplement')
+    nomushroomzone = _field_property('nomushroomzone')
+    hidden = _hidden_property()
+
+
+class CheckpointProxy(_RowProxy):
+    __slots__ = ()
+
+    start = _vector_property('start')
+    end = _vector_property('end')
+    unk1 = _field_property('unk1')
+    unk2 = _field_property('unk2')
+    unk3 = _field_property('unk3')
+    unk4 = _field_property('unk4')
+    hidden = _hidden_property()
+
+    @property
+    def mid(self):
+        return (self.start + self.end) / 2.0
+
+
+class RoutePointProxy(_RowProxy):
+    __slots__ = ()
+
+    position = _vector_property('position')
+    unk = _field_property('unk')
+    hidden = _hidden_property()
+
+
+class PointColumns:
+    """
+    A structured array of points, with a proxy for each row.
+    """
+    FIELDS = None
+    POSITION_FIELDS = ('position', )
+    PROXY_CLASS = None
+
+    def __init__(self, array: numpy.ndarray = None):
+        if array is None:
+            array = numpy.zeros(0, dtype=record_dtype(self.FIELDS, True))
+        self.array = array
+
+    @classmethod
+    def from_buffer(cls, buffer, offset: int, count: int, extended_format: bool) -> 'PointColumns':
+        records = numpy.frombuffer(buffer,
+                                   dtype=record_dtype(cls.FIELDS, extended_format),
+                                   count=count,
+                                   offset=offset)
+        return cls(_from_records(records, cls.FIELDS))
+
+    @classmethod
+    def from_points(cls, points) -> 'PointColumns':
+        dtype = record_dtype(cls.FIELDS, True)
+        return cls(numpy.array([_get_row(point, dtype.names) for point in points], dtype=dtype))
+
+    def encode(self, extended_format: bool) -> bytes:
+        return _to_records(self.array, self.FIELDS, extended_format).tobytes()
+
+    def positions(self) -> 'list[numpy.ndarray]':
+        """
+        Returns the `(N, 3)` views of the position fields of the points.
+        """
+        return [self.array[name] for name in self.POSITION_FIELDS]
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, index: int):
+        if not -len(self.array) <= index < len(self.array):
+            raise IndexError(index)
+        return self.PROXY_CLASS(self, index % len(self.array))
+
+    def __iter__(self):
+        for index in range(len(self.array)):
+            yield self.PROXY_CLASS(self, index)
+
+    def get_values(self) -> 'list[dict]':
+        """
+        Returns the values of each point, keyed by attribute name.
+        """
+        names = [name for name in self.array.dtype.names if name != 'padding']
+        columns = [self.array[name].tolist() for name in names]
+        return [dict(zip(names, row)) for row in zip(*columns)]
+
+    def apply_to(self, points):
+        """
+        Copies the values of the points into the given entities, which are expected to be as many.
+        Position vectors are updated in place.
+        """
+        if len(points) != len(self.array):
+            raise ValueError(f'Expected {len(self.array)} points; got {len(points)}.')
+
+        vector_names = set(self.POSITION_FIELDS)
+        for point, values in zip(points, self.get_values()):
+            for name, value in values.items():
+                if name in vector_names:
+                    vector = getattr(point, name)
+                    vector.x, vector.y, vector.z = value
+                elif name == 'hidden':
+                    point.hidden = bool(value)
+                else:
+                    setattr(point, name, value)
+
+
+class EnemyPointColumns(PointColumns):
+    FIELDS = ENEMY_POINT_FIELDS
+    PROXY_CLASS = EnemyPointProxy
+
+
+class CheckpointColumns(PointColumns):
+    FIELDS = CHECKPOINT_FIELDS
+    POSITION_FIELDS = ('start', 'end')
+    PROXY_CLASS = CheckpointProxy
+
+    def apply_to(self, points):
+        super().apply_to(points)
+        for point in points:
+            point.mid = (point.start + point.end) / 2.0
+
+
+class RoutePointColumns(PointColumns):
+    FIELDS = ROUTE_POINT_FIELDS
+    PROXY_CLASS = RoutePointProxy
+
+
+class BOLColumns:
+    """
+    Columnar storage of the enemy points, checkpoints and route points of a document, along with
+    the group tables that delimit them.
+    """
+
+    def __init__(self):
+        self.enemypoints = EnemyPointColumns()
+        self.checkpointgroups = numpy.zeros(0, dtype=record_dtype(CHECKPOINT_GROUP_FIELDS, False))
+        self.checkpoints = CheckpointColumns()
+        self.routes = numpy.zeros(0, dtype=record_dtype(ROUTE_FIELDS, False))
+        self.routepoints = RoutePointColumns()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, extended_format: bool = False) -> 'BOLColumns':
+        """
+        Reads the columns straight from the encoded document, without building the entities of the
+        object model.
+        """
+        view = memoryview(data)
+        _bol, old_bol, sectioncounts, sectionoffsets = libbol.BOL._from_header(view)
+        if old_bol:
+            # Enemy points in the old format have a different layout.
+            return cls.from_bol(libbol.BOL.from_buffer(data, extended_format))
+
+        columns = cls()
+
+        columns.enemypoints = EnemyPointColumns.from_buffer(view,
+                                                            sectionoffsets[libbol.ENEMYITEMPOINT],
+                                                            sectioncounts[libbol.ENEMYITEMPOINT],
+                                                            extended_format)
+
+        offset = sectionoffsets[libbol.CHECKPOINT]
+        group_dtype = record_dtype(CHECKPOINT_GROUP_FIELDS, False)
+        columns.checkpointgroups = numpy.frombuffer(view,
+                                                    dtype=group_dtype,
+                                                    count=sectioncounts[libbol.CHECKPOINT],
+                                                    offset=offset).copy()
+        offset += group_dtype.itemsize * len(columns.checkpointgroups)
+        columns.checkpoints = CheckpointColumns.from_buffer(
+            view, offset, int(columns.checkpointgroups['pointcount'].sum()), extended_format)
+
+        columns.routes = numpy.frombuffer(view,
+                                          dtype=record_dtype(ROUTE_FIELDS, False),
+                                          count=sectioncounts[libbol.ROUTEGROUP],
+                                          offset=sectionoffsets[libbol.ROUTEGROUP]).copy()
+
+        point_dtype = record_dtype(ROUTE_POINT_FIELDS, extended_format)
+        count = ((sectionoffsets[libbol.OBJECTS] - sectionoffsets[libbol.ROUTEPOINT]) //
+                 point_dtype.itemsize)
+        columns.routepoints = RoutePointColumns.from_buffer(view, sectionoffsets[libbol.ROUTEPOINT],
+                                                            count, extended_format)
+
+        return columns
+
+    @classmethod
+    def from_bol(cls, bol: libbol.BOL) -> 'BOLColumns':
+        columns = cls()
+
+        enemypoints = []
+        for group in bol.enemypointgroups.groups:
+            for point in group.points:
+                point.group = group.id
+                enemypoints.append(point)
+        columns.enemypoints = EnemyPointColumns.from_points(enemypoints)
+
+        columns.checkpointgroups = numpy.array(
+            [(len(group.points), group.grouplink, group.prevgroup, group.nextgroup)
+             for group in bol.checkpoints.groups],
+            dtype=record_dtype(CHECKPOINT_GROUP_FIELDS, False))
+        columns.checkpoints = CheckpointColumns.from_points(list(bol.checkpoints.points()))
+
+        routes = []
+        routepoints = []
+        for route in bol.routes:
+            routes.append((len(route.points), len(routepoints), route.unk1, route.unk2, b''))
+            routepoints.extend(route.points)
+        columns.routes = numpy.array(routes, dtype=record_dtype(ROUTE_FIELDS, False))
+        columns.routepoints = RoutePointColumns.from_points(routepoints)
+
+        return columns
+
+    def point_columns(self) -> 'tuple[PointColumns]':
+        return self.enemypoints, self.checkpoints, self.routepoints
+
+    def encode_section(self, section: int, extended_format: bool = False) -> bytes:
+        """
+        Returns the encoded bytes of the given section, which are identical to the ones that
+        `BOL.encode_section()` produces for the same points.
+        """
+        if section == libbol.ENEMYITEMPOINT:
+            return self.enemypoints.encode(extended_format)
+        if section == libbol.CHECKPOINT:
+            return self.checkpointgroups.tobytes() + self.checkpoints.encode(extended_format)
+        if section == libbol.ROUTEGROUP:
+            routes = _to_records(self.routes, ROUTE_FIELDS, False)
+            pointcounts = self.routes['pointcount'].astype(numpy.int64)
+            routes['pointstart'] = numpy.cumsum(pointcounts) - pointcounts
+            return routes.tobytes()
+        if section == libbol.ROUTEPOINT:
+            return self.routepoints.encode(extended_format)
+        raise ValueError(f'Section not held in columns: {section}')
+
+    def apply_to(self, bol: libbol.BOL):
+        """
+        Copies the values of the points into the entities of the given document, which is expected
+        to have the same structure (e.g. the document that the columns were built from).
+        """
+        self.enemypoints.apply_to(list(bol.enemypointgroups.points()))
+        self.checkpoints.apply_to(list(bol.checkpoints.points()))
+        self.routepoints.apply_to([point for route in bol.routes for point in route.points])
+        bol.mark_dirty(libbol.ENEMYITEMPOINT, libbol.CHECKPOINT, libbol.ROUTEPOINT)
+
+    def positions(self) -> 'list[numpy.ndarray]':
+        """
+        Returns the `(N, 3)` views of every position field of every point.
+        """
+        return [view for columns in self.point_columns() for view in columns.positions()]
+
+    def translate(self, offset):
+        offset = numpy.asarray(offset, dtype=numpy.float64)
+        for view in self.positions():
+            view += offset
+
+    def scale(self, factor, origin=(0.0, 0.0, 0.0)):
+        """
+        Scales the positions of the points about the given origin. `factor` is either a scalar or a
+        per-axis triple.
+        """
+        factor = numpy.asarray(factor, dtype=numpy.float64)
+        origin = numpy.asarray(origin, dtype=numpy.float64)
+        for view in self.positions():
+            view[:] = (view - origin) * factor + origin
+
+    def ground(self, height_function):
+        """
+        Moves every point to the ground. `height_function` receives an `(N, 3)` array of positions
+        and returns an array of `N` heights, with NaN where no ground was found (in which case the
+        position is left untouched).
+        """
+        for view in self.positions():
+            if not len(view):
+                continue
+            heights = numpy.asarray(height_function(view.astype(numpy.float64)))
+            hit = ~numpy.isnan(heights)
+            view[hit, 1] = heights[hit]
+
+    def compute_extent(self,
+                       include_hidden: bool = True
+                       ) -> 'tuple[float, float, float, float, float, float] | None':
+        """
+        Returns the extent (min x, min y, min z, max x, max y, max z) of the points, or `None` if
+        there are no points.
+        """
+        extents = []
+        for columns in self.point_columns():
+            mask = None if include_hidden else columns.array['hidden'] == 0
+            for view in columns.positions():
+                extent = compute_extent(view if mask is None else view[mask])
+                if extent is not None:
+                    extents.append(extent[0:3])
+                    extents.append(extent[3:6])
+        return compute_extent(extents)
@@ -0,0 +1,86 @@
+"""
+Unit tests for the `libbol_columns` module.
+"""
+import numpy
+import pytest
+
+from . import libbol
+from .libbol_benchmark import make_synthetic_course
+from .libbol_columns import BOLColumns
+
+COLUMN_SECTIONS = (libbol.ENEMYITEMPOINT, libbol.CHECKPOINT, libbol.ROUTEGROUP, libbol.ROUTEPOINT)
+
+
+@pytest.mark.parametrize("extended_format", (False, True))
+def test_encode_sections(extended_format):
+    bol = make_synthetic_course(enemy_points=500, checkpoints=200, route_points=200)
+    bol.enemypointgroups.groups[0].points[0].hidden = True
+    bol.routes[1].points[1].hidden = True
+    data = bol.to_bytes(extended_format)
+
+    for columns in (BOLColumns.from_bytes(data, extended_format), BOLColumns.from_bol(bol)):
+        for section in COLUMN_SECTIONS:
+            assert (columns.encode_section(section, extended_format) ==
+                    bol.encode_section(section, extended_format))
+
+
+def test_proxies():
+    bol = make_synthetic_course(enemy_points=500, checkpoints=200, route_points=200)
+    columns = BOLColumns.from_bytes(bol.to_bytes())
+
+    for point, proxy in zip(bol.enemypointgroups.points(), columns.enemypoints):
+        assert proxy.position == point.position
+        assert (proxy.link, proxy.scale, proxy.swerve) == (point.link, point.scale, point.swerve)
+    checkpoint = next(bol.checkpoints.points())
+    assert columns.checkpoints[0].start == checkpoint.start
+    assert columns.checkpoints[0].mid == checkpoint.mid
+    assert columns.routepoints[-1].position == bol.routes[-1].points[-1].position
+
+    # Writes go through to the columns.
+    proxy = columns.enemypoints[10]
+    proxy.position.y += 100.0
+    proxy.link = 7
+    proxy.hidden = True
+    assert columns.enemypoints.array['position'][10][1] == proxy.position.y
+    assert columns.enemypoints.array['link'][10] == 7
+    assert columns.enemypoints.array['hidden'][10] == 1
+
+
+def test_bulk_operations():
+    bol = make_synthetic_course(enemy_points=500, checkpoints=200, route_points=200)
+    columns = BOLColumns.from_bol(bol)
+
+    columns.translate((100.0, 10.0, -100.0))
+    columns.scale(2.0, origin=(100.0, 10.0, -100.0))
+    columns.ground(lambda positions: numpy.where(positions[:, 0] > 0, 123.0, numpy.nan))
+    columns.apply_to(bol)
+
+    for section in COLUMN_SECTIONS:
+        assert columns.encode_section(section) == bol.encode_section(section)
+
+    for point in bol.enemypointgroups.points():
+        if point.position.x > 0:
+            assert point.position.y == 123.0
+
+    positions = [(p.x, p.y, p.z) for p in (
+        [point.position for point in bol.enemypointgroups.points()] +
+        [point.start for point in bol.checkpoints.points()] +
+        [point.end for point in bol.checkpoints.points()] +
+        [point.position for route in bol.routes for point in route.points])]
+    positions = numpy.array(positions)
+    assert columns.compute_extent() == (*positions.min(axis=0), *positions.max(axis=0))
+
+
+def test_compute_extent_hidden():
+    bol = make_synthetic_course(enemy_points=10, enemy_groups=1, checkpoints=0,
+                                checkpoint_groups=0, route_points=0, routes=0, objects=0,
+                                cameras=0)
+    points = bol.enemypointgroups.groups[0].points
+    for point in points[1:]:
+        point.hidden = True
+    columns = BOLColumns.from_bol(bol)
+
+    position = points[0].position
+    assert columns.compute_extent(include_hidden=False) == (position.x, position.y, position.z,
+                                                            position.x, position.y, position.z)
+    assert BOLColumns().compute_extent() is None
@@ -1,13 +1,18 @@
 """
 Unit tests for the `libbol` module.
 """
+import io
+import math
 import os
+import random
 import tempfile
 
 import pytest
 
 from . import libbol
 from . import rarc
+from .libbol_benchmark import make_synthetic_course
+from .vectors import Vector3
 
 
 def _source_arc_filepaths() -> list[str]:
@@ -62,3 +67,205 @@ def test_stock_data_set(arc_filepath):
     baked_length = len(baked_data)
     assert original_length == baked_length
     assert original_data == baked_data
+
+
+@pytest.mark.parametrize("arc_filepath", _source_arc_filepaths())
+def test_stock_data_set_incremental_write(arc_filepath):
+    original_data = _get_bol_file(arc_filepath)
+    assert original_data
+
+    bol = libbol.BOL.from_bytes(original_data)
+    assert bol.to_bytes() == original_data
+
+    version = bol.version
+    for respawn_point in bol.respawnpoints:
+        respawn_point.position.x += 1.0
+    bol.mark_objects_dirty(bol.respawnpoints)
+    assert bol.version != version
+
+    assert bol.is_dirty(libbol.RESPAWNPOINT)
+    for section in range(libbol.ENEMYITEMPOINT, libbol.MINIGAME + 1):
+        if section != libbol.RESPAWNPOINT:
+            assert not bol.is_dirty(section)
+
+    baked_data = bol.to_bytes()
+    bol.mark_dirty()
+    assert bol.to_bytes() == baked_data
+
+
+def test_unnotified_modification(monkeypatch):
+    bol = make_synthetic_course(enemy_points=100, checkpoints=20, route_points=20, objects=10)
+    data = bol.to_bytes()
+
+    # A modification that is not notified is missed by cached writes, but not by uncached ones.
+    bol.respawnpoints[0].position.x += 1.0
+    assert bol.to_bytes() == data
+    f = io.BytesIO()
+    bol.write(f, use_cache=False)
+    assert f.getvalue() != data
+    assert bol.to_bytes() == f.getvalue()
+
+    bol.respawnpoints[0].position.x += 1.0
+    monkeypatch.setattr(libbol, 'CHECK_ENCODED_SECTIONS', True)
+    with pytest.raises(AssertionError):
+        bol.to_bytes()
+    bol.mark_objects_dirty(bol.respawnpoints[:1])
+    assert bol.to_bytes() != f.getvalue()
+
+
+@pytest.mark.parametrize("arc_filepath", _source_arc_filepaths())
+def test_stock_data_set_update_sections(arc_filepath):
+    original_data = _get_bol_file(arc_filepath)
+    assert original_data
+
+    bol = libbol.BOL.from_bytes(original_data)
+    objects = list(bol.objects.objects)
+    cameras = list(bol.cameras)
+
+    edited_bol = libbol.BOL.from_bytes(original_data)
+    for respawn_point in edited_bol.respawnpoints:
+        respawn_point.position.x += 1.0
+    for route in edited_bol.routes:
+        for point in route.points:
+            point.position.y += 1.0
+    edited_chunks = edited_bol.encode()
+    edited_data = b''.join(edited_chunks)
+
+    chunks = bol.encode()
+    sections = [
+        section for section in range(libbol.ENEMYITEMPOINT, libbol.MINIGAME + 1)
+        if chunks[section] != edited_chunks[section]
+    ]
+    assert libbol.OBJECTS not in sections
+    assert libbol.CAMERA not in sections
+
+    bol.update_sections(libbol.BOL.from_bytes(edited_data), sections)
+    assert bol.to_bytes() == edited_data
+
+    # Untouched entries are kept, and refer to the adopted routes.
+    assert all(a is b for a, b in zip(bol.objects.objects, objects))
+    assert all(a is b for a, b in zip(bol.cameras, cameras))
+    for obj in bol.objects.objects:
+        assert obj.route is None or any(obj.route is route for route in bol.routes)
+
+
+@pytest.mark.parametrize("arc_filepath", _source_arc_filepaths())
+def test_stock_data_set_lazy(arc_filepath):
+    original_data = _get_bol_file(arc_filepath)
+    assert original_data
+
+    # Sections that are not accessed are not decoded.
+    bol = libbol.BOL.from_bytes(original_data, lazy=True)
+    assert bol.music_id == libbol.BOL.from_bytes(original_data).music_id
+    assert not any(bol.is_decoded(section)
+                   for section in range(libbol.ENEMYITEMPOINT, libbol.MINIGAME + 1))
+    assert bol.to_bytes() == original_data
+
+    # Sections that refer to each other are decoded together.
+    bol.objects
+    assert bol.is_decoded(libbol.ROUTEGROUP)
+    assert bol.is_decoded(libbol.CAMERA)
+    assert not bol.is_decoded(libbol.ENEMYITEMPOINT)
+    assert bol.to_bytes() == original_data
+
+    # Accessed sections are encoded again, even if they are not marked as dirty.
+    eager_bol = libbol.BOL.from_bytes(original_data)
+    for kartpoints in (bol.kartpoints, eager_bol.kartpoints):
+        for kartpoint in kartpoints.positions:
+            kartpoint.position.x += 1.0
+    assert bol.to_bytes() == eager_bol.to_bytes()
+    assert bol.to_bytes(extended_format=True) == eager_bol.to_bytes(extended_format=True)
+
+
+def _find_closest_forward_point_by_scan(enemypointgroups: libbol.EnemyPointGroups,
+                                        position: Vector3):
+    # Reference implementation that scans every point and group.
+    def find_next_point(point, previous=False):
+        for group in enemypointgroups.groups:
+            if point not in group.points:
+                continue
+            index = group.points.index(point) + (-1 if previous else 1)
+            if 0 <= index < len(group.points):
+                return group.points[index]
+            linked_points = [
+                group.points[-1 if previous else 0] for group in enemypointgroups.groups
+                if group.points and group.points[-1 if previous else 0].link == point.link
+            ] if point.link != -1 else []
+            if linked_points:
+                return min(linked_points, key=lambda p: position.distance2(p.position))
+            return None
+
+    points = tuple(enemypointgroups.points())
+    _distance2, pointB_index, pointB = min(
+        (point.position.distance2(position), i, point) for i, point in enumerate(points))
+    pointA = find_next_point(pointB, previous=True)
+    pointC = find_next_point(pointB)
+    if pointA is None or pointC is None:
+        return pointB_index, pointB
+    angle = math.acos((pointB.position - pointA.position).cos_angle(pointB.position - position))
+    if angle < math.pi / 180:
+        return pointB_index, pointB
+    return points.index(pointC), pointC
+
+
+def test_enemy_point_index():
+    rng = random.Random(0)
+    bol = make_synthetic_course(enemy_points=2000)
+    enemypointgroups = bol.enemypointgroups
+
+    def check():
+        for _ in range(200):
+            position = Vector3(rng.uniform(-60000, 60000), rng.uniform(-500, 5000),
+                               rng.uniform(-60000, 60000))
+            assert (enemypointgroups.find_closest_forward_point(position) ==
+                    _find_closest_forward_point_by_scan(enemypointgroups, position))
+
+    check()
+
+    # Moved points are updated in the index.
+    moved_points = rng.sample(list(enemypointgroups.points()), 100)
+    for point in moved_points:
+        point.position = Vector3(rng.uniform(-60000, 60000), 0.0, rng.uniform(-60000, 60000))
+    bol.mark_objects_dirty(moved_points)
+    check()
+
+    # As are links.
+    group = enemypointgroups.groups[3]
+    group.points[-1].link = enemypointgroups.groups[5].points[0].link
+    bol.mark_objects_dirty([group.points[-1]])
+    next_point = enemypointgroups.find_next_point(group.points[-1], Vector3(0.0, 0.0, 0.0))
+    assert next_point is enemypointgroups.groups[5].points[0]
+
+    # Inserted and removed points invalidate the index.
+    group.points.insert(10, libbol.EnemyPoint.new())
+    del enemypointgroups.groups[0].points[:50]
+    enemypointgroups.groups.pop(1)
+    bol.mark_dirty(libbol.ENEMYITEMPOINT)
+    check()
+
+    with pytest.raises(ValueError):
+        libbol.EnemyPointGroups().find_closest_forward_point(Vector3(0.0, 0.0, 0.0))
+
+
+@pytest.mark.parametrize('positions', (
+    ((100.0, 0.0, 200.0), ),
+    ((0.0, 0.0, 0.0), (10.0, 0.0, 0.0), (20.0, 0.0, 0.0), (30.0, 0.0, 0.0)),
+    ((0.0, 0.0, -5000.0), (0.0, 0.0, 0.0), (0.0, 0.0, 5000.0)),
+))
+def test_enemy_point_index_degenerate_extent(positions):
+    # A single point, or points along an axis, leave no area to size the grid cells from; queries
+    # far away from the points must still finish quickly.
+    enemypointgroups = libbol.EnemyPointGroups()
+    group = libbol.EnemyPointGroup.new()
+    for x, y, z in positions:
+        point = libbol.EnemyPoint.new()
+        point.position = Vector3(x, y, z)
+        group.points.append(point)
+    enemypointgroups.groups.append(group)
+    index = enemypointgroups.get_index()
+
+    for query in ((15.0, 0.0, 1500.0), (-3.0, 0.0, 5000.0), (1e7, 0.0, -1e7), (0.0, 0.0, 0.0)):
+        position = Vector3(*query)
+        expected = min((point.position.distance2(position), i, point)
+                       for i, point in enumerate(group.points))
+        assert index.find_nearest_point(position) == expected[1:]
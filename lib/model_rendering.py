@@ -3,7 +3,9 @@ import math
 import os
 import re
 import sys
+import ctypes
 
+import numpy
 from OpenGL.GL import *
 from PIL import Image
 
@@ -204,13 +206,17 @@ class Model(object):
         self.mesh_list = []
         self.named_meshes = {}
 
-    def render(self):
+    def render(self) -> int:
+        """
+        Draws the meshes, and returns the number of draw calls.
+        """
         for mesh in self.mesh_list:
             mesh.render()
+        return len(self.mesh_list)
 
-    def render_coloredid(self, id):
+    def render_coloredid(self, id) -> int:
         glColor3ub((id >> 16) & 0xFF, (id >> 8) & 0xFF, (id >> 0) & 0xFF)
-        self.render()
+        return self.render()
 
     def add_mesh(self, mesh: Mesh):
         if mesh.name not in self.named_meshes:
@@ -520,13 +526,14 @@ class SelectableModel(Model):
         self.__render(False)
         glEndList()
 
-    def render(self, selected=False):
+    def render(self, selected=False) -> int:
         if selected == 2:
             glCallList(self.displistActive)
         elif selected:
             glCallList(self.displistSelected)
         else:
             glCallList(self.displistUnselected)
+        return 1
 
     def _render_outline(self):
         pass
@@ -884,83 +891,104 @@ otherwise = (40, 40, 40)
 
 
 class CollisionModel(object):
+    """
+    Renders the triangles of a BCO file, grouped by collision type.
+
+    The triangles are sorted by collision type and uploaded in a single vertex buffer of
+    interleaved positions, normals and colors. Each collision type covers a range of the buffer;
+    hiding a collision type only removes its range from the draw calls.
+    """
+
     def __init__(self, mkdd_collision):
-        meshes = {}
         self.program = None
-        vertices = mkdd_collision.vertices
-        self._displists = []
+        self.vertex_buffer = None
         self.hidden_collision_types = set()
         self.hidden_collision_type_groups = set()
 
-        for v1, v2, v3, coltype, rest in mkdd_collision.triangles:
-            vertex1 = Vector3(*vertices[v1])
-            vertex1.z = -vertex1.z
-            vertex2 = Vector3(*vertices[v2])
-            vertex2.z = -vertex2.z
-            vertex3 = Vector3(*vertices[v3])
-            vertex3.z = -vertex3.z
-
-            v1tov2 = vertex2 - vertex1
-            v1tov3 = vertex3 - vertex1
-
-            normal = v1tov2.cross(v1tov3)
-            if normal.norm() != 0.0:
-                normal.normalize()
-
-            if coltype not in meshes:
-                meshes[coltype] = []
-
-            shift = coltype >> 8
-
-            if shift in colortypes:
-                color = colortypes[shift]
-
-            else:
-                color = otherwise
-            color = (color[0]/255.0, color[1]/255.0, color[2]/255.0)
-            meshes[coltype].append((vertex1, vertex2, vertex3, normal, color))
-
-        self.meshes = meshes
-
-    def get_visible_triangles(self):
-        triangles = []
-
-        for colltype, mesh_triangles in self.meshes.items():
-            if (colltype in self.hidden_collision_types
-                    or colltype & 0xFF00 in self.hidden_collision_type_groups):
-                continue
-
-            for vertex1, vertex2, vertex3, _normal, _color in mesh_triangles:
-                triangles.append((vertex1, vertex2, vertex3))
-
-        return triangles
+        vertices = numpy.asarray(mkdd_collision.vertex_positions, dtype=numpy.float32)
+        indices = numpy.asarray(mkdd_collision.triangle_indices)
+        collision_types = numpy.asarray(mkdd_collision.collision_types)
+
+        order = numpy.argsort(collision_types, kind='stable')
+        indices = indices[order]
+        # Index of each (sorted) triangle in the BCO file, and the spatial grid of the file.
+        self.triangle_order = order
+        self.grid = getattr(mkdd_collision, 'grid', None)
+        collision_types = collision_types[order]
+
+        # Vertices of each triangle (N x 3 x 3), in the coordinates of the BCO file.
+        self.triangles = vertices[indices]
+
+        # First triangle and number of triangles of each collision type.
+        unique_types, firsts, counts = numpy.unique(collision_types, return_index=True,
+                                                    return_counts=True)
+        self.draw_ranges = {
+            colltype: (first, count)
+            for colltype, first, count in zip(unique_types.tolist(), firsts.tolist(),
+                                              counts.tolist())
+        }
 
-    def generate_displists(self):
+        # The normal is computed with the Z axis flipped, as it was historically.
+        flipped = self.triangles * numpy.array((1.0, 1.0, -1.0), dtype=numpy.float32)
+        normals = numpy.cross(flipped[:, 1] - flipped[:, 0], flipped[:, 2] - flipped[:, 0])
+        lengths = numpy.linalg.norm(normals, axis=1, keepdims=True)
+        numpy.divide(normals, lengths, out=normals, where=lengths != 0.0)
+
+        color_table = numpy.array([otherwise] * 256, dtype=numpy.float32)
+        for shift, color in colortypes.items():
+            color_table[shift] = color
+        colors = color_table[collision_types >> 8] / 255.0
+
+        # Interleaved vertex data: position (in GL coordinates), normal and color.
+        vertex_data = numpy.empty((len(indices), 3, 9), dtype=numpy.float32)
+        vertex_data[:, :, 0] = self.triangles[:, :, 0]
+        vertex_data[:, :, 1] = self.triangles[:, :, 2]
+        vertex_data[:, :, 2] = self.triangles[:, :, 1]
+        vertex_data[:, :, 3:6] = normals[:, numpy.newaxis, :]
+        vertex_data[:, :, 6:9] = colors[:, numpy.newaxis, :]
+        self.vertex_data = vertex_data.reshape(-1, 9)
+
+    def is_visible(self, colltype: int) -> bool:
+        return (colltype not in self.hidden_collision_types
+                and colltype & 0xFF00 not in self.hidden_collision_type_groups)
+
+    def get_visible_triangles(self) -> numpy.ndarray:
+        """
+        Returns the vertices of the triangles whose collision type is visible (N x 3 x 3), in the
+        coordinates of the BCO file.
+        """
+        visible = [
+            self.triangles[first:first + count]
+            for colltype, (first, count) in self.draw_ranges.items() if self.is_visible(colltype)
+        ]
+        if not visible:
+            return numpy.zeros((0, 3, 3), dtype=numpy.float32)
+        return numpy.concatenate(visible)
+
+    def get_visible_grid(self):
+        """
+        Returns the spatial grid of the BCO file, with indices into the triangles returned by
+        `get_visible_triangles()`, or `None` if the file has no grid.
+        """
+        if self.grid is None:
+            return None
+        triangle_map = numpy.full(len(self.triangle_order), -1, dtype=numpy.int32)
+        visible_count = 0
+        for colltype, (first, count) in self.draw_ranges.items():
+            if self.is_visible(colltype):
+                triangle_map[self.triangle_order[first:first + count]] = numpy.arange(
+                    visible_count, visible_count + count)
+                visible_count += count
+        return self.grid.remap(triangle_map)
+
+    def generate_buffers(self):
         if self.program is None:
             self.create_shaders()
 
-        for meshtype, mesh in self.meshes.items():
-            displist = glGenLists(1)
-            glNewList(displist, GL_COMPILE)
-            glBegin(GL_TRIANGLES)
-
-            for v1, v2, v3, normal, color in mesh:
-                glVertexAttrib3f(3, normal.x, normal.y, normal.z)
-                glVertexAttrib3f(4, *color)
-                glVertex3f(v1.x, -v1.z, v1.y)
-                glVertexAttrib3f(3, normal.x, normal.y, normal.z)
-                glVertexAttrib3f(4, *color)
-                glVertex3f(v2.x, -v2.z, v2.y)
-                glVertexAttrib3f(3, normal.x, normal.y, normal.z)
-                glVertexAttrib3f(4, *color)
-                glVertex3f(v3.x, -v3.z, v3.y)
-
-
-
-            glEnd()
-            glEndList()
-
-            self._displists.append((meshtype, displist))
+        self.vertex_buffer = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glBufferData(GL_ARRAY_BUFFER, self.vertex_data.nbytes, self.vertex_data, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
 
     def create_shaders(self):
         vertshader = """
@@ -1013,21 +1041,319 @@ class CollisionModel(object):
         self.program = program
 
     def render(self, selected=False, selectedPart=None, cull_faces=None):
-        if self.program is None:
-            self.generate_displists()
+        if self.vertex_buffer is None:
+            self.generate_buffers()
         factorval = glGetUniformLocation(self.program, "interpolate")
 
         glUseProgram(self.program)
 
-        for colltype, displist in self._displists:
-            if (colltype in self.hidden_collision_types
-                    or colltype & 0xFF00 in self.hidden_collision_type_groups):
+        stride = self.vertex_data.itemsize * 9
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        for location, offset in ((0, 0), (3, 3), (4, 6)):
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, 3, GL_FLOAT, GL_FALSE, stride,
+                                  ctypes.c_void_p(offset * self.vertex_data.itemsize))
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        # Adjacent ranges with the same highlight state are merged into a single draw call.
+        glUniform1f(factorval, 0.0)
+        first = count = 0
+        for colltype, (range_first, range_count) in self.draw_ranges.items():
+            if not self.is_visible(colltype):
                 continue
-
             if colltype == selectedPart:
+                if count:
+                    glDrawArrays(GL_TRIANGLES, first * 3, count * 3)
+                    count = 0
                 glUniform1f(factorval, 1.0)
-            else:
+                glDrawArrays(GL_TRIANGLES, range_first * 3, range_count * 3)
                 glUniform1f(factorval, 0.0)
-            glCallList(displist)
+                continue
+            if count and first + count == range_first:
+                count += range_count
+                continue
+            if count:
+                glDrawArrays(GL_TRIANGLES, first * 3, count * 3)
+            first, count = range_first, range_count
+        if count:
+            glDrawArrays(GL_TRIANGLES, first * 3, count * 3)
+
+        for location in (0, 3, 4):
+            glDisableVertexAttribArray(location)
+
+        glUseProgram(0)
+
+
+# Layout of the per-instance data of an `InstanceBuffer`: the position of the instance (in BOL
+# coordinates), its body color, and its selection state (0: unselected, 1: selected, 2: active).
+INSTANCE_DTYPE = numpy.dtype([
+    ('position', numpy.float32, (3, )),
+    ('color', numpy.float32, (4, )),
+    ('state', numpy.float32),
+])
+
+
+class InstanceBuffer(object):
+    """
+    Per-instance data of a category of objects, stored in a vertex buffer object. The data is only
+    uploaded to the GPU when the key given to `update()` changes.
+    """
+
+    def __init__(self):
+        self.key = None
+        self.instances = numpy.zeros(0, dtype=INSTANCE_DTYPE)
+        self.buffer = None
+
+    def update(self, key, build_instances):
+        """
+        Calls `build_instances()` to generate the instances (a NumPy array of `INSTANCE_DTYPE`)
+        and uploads them, unless `key` matches the key of the last upload.
+        """
+        if key == self.key and self.buffer is not None:
+            return
+        self.key = key
+        self.instances = numpy.ascontiguousarray(build_instances(), dtype=INSTANCE_DTYPE)
+
+        if self.buffer is None:
+            self.buffer = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        if len(self.instances):
+            glBufferData(GL_ARRAY_BUFFER, self.instances.nbytes, self.instances, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def invalidate(self):
+        self.key = None
+
+    def __len__(self):
+        return len(self.instances)
+
+
+def build_instances(positions, colors, states) -> numpy.ndarray:
+    """
+    Packs the given sequences of positions (as `(x, y, z)` tuples), colors and selection states
+    into an array of instances.
+    """
+    instances = numpy.empty(len(positions), dtype=INSTANCE_DTYPE)
+    if len(positions):
+        instances['position'] = positions
+        instances['color'] = colors
+        instances['state'] = states
+    return instances
+
+
+class InstancedModel(object):
+    """
+    Renders a mesh once per instance of an `InstanceBuffer`, with one instanced draw call per pass.
+
+    The passes mirror the ones of `SelectableModel`: the outline (scaled up, in the color of the
+    selection state) without writing on the depth buffer, the body in the color of the instance,
+    and the outline again on the depth buffer only.
+    """
+
+    def __init__(self, mesh: Mesh):
+        vertices = [mesh.vertices[vi] for triangle in mesh.triangles for vi, _texcoord in triangle]
+        self.vertices = numpy.array(vertices, dtype=numpy.float32).reshape(-1, 3)
+        self.vertex_buffer = None
+        self.program = None
+        self.pass_location = None
+
+    def init_gl(self):
+        self.vertex_buffer = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.create_shaders()
+
+    def create_shaders(self):
+        vertshader = """
+        #version 330 compatibility
+        layout(location = 0) in vec3 vert;
+        layout(location = 1) in vec3 position;
+        layout(location = 2) in vec4 color;
+        layout(location = 3) in float state;
+        uniform int outline;
+        uniform vec4 outlinecolors[3];
+        out vec4 vecColor;
+
+        void main(void)
+        {
+            int selection = int(state);
+            float scale = 1.0;
+            vecColor = color;
+            if (outline != 0) {
+                scale = selection != 0 ? 1.4 : 1.2;
+                vecColor = outlinecolors[selection];
+            }
+            vec3 offset = vec3(position.x, -position.z, position.y);
+            gl_Position = gl_ModelViewProjectionMatrix * vec4(vert * scale + offset, 1.0);
+        }
+        """
+
+        fragshader = """
+        #version 330
+        in vec4 vecColor;
+        out vec4 finalColor;
+
+        void main (void)
+        {
+            finalColor = vecColor;
+        }"""
+
+        vertexShaderObject = glCreateShader(GL_VERTEX_SHADER)
+        fragmentShaderObject = glCreateShader(GL_FRAGMENT_SHADER)
+        glShaderSource(vertexShaderObject, vertshader)
+        glShaderSource(fragmentShaderObject, fragshader)
 
+        _compile_shader_with_error_report(vertexShaderObject)
+        _compile_shader_with_error_report(fragmentShaderObject)
+
+        program = glCreateProgram()
+
+        glAttachShader(program, vertexShaderObject)
+        glAttachShader(program, fragmentShaderObject)
+
+        glLinkProgram(program)
+        self.program = program
+
+        self.pass_location = glGetUniformLocation(program, "outline")
+        outlinecolors = numpy.array(((0.0, 0.0, 0.0, 1.0), selectioncolor, activecolor),
+                                    dtype=numpy.float32)
+        glUseProgram(program)
+        glUniform4fv(glGetUniformLocation(program, "outlinecolors"), 3, outlinecolors)
+        glUseProgram(0)
+
+    def _bind_buffers(self, instance_buffer: InstanceBuffer):
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 0, None)
+
+        stride = INSTANCE_DTYPE.itemsize
+        glBindBuffer(GL_ARRAY_BUFFER, instance_buffer.buffer)
+        for location, field, size in ((1, 'position', 3), (2, 'color', 4), (3, 'state', 1)):
+            offset = INSTANCE_DTYPE.fields[field][1]
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, stride,
+                                  ctypes.c_void_p(offset))
+            glVertexAttribDivisor(location, 1)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def _unbind_buffers(self):
+        # Restore the default state, as the fixed-function rendering of the rest of the scene
+        # relies on it.
+        for location in (1, 2, 3):
+            glVertexAttribDivisor(location, 0)
+            glDisableVertexAttribArray(location)
+        glDisableVertexAttribArray(0)
+
+    def render(self, instance_buffer: InstanceBuffer) -> int:
+        """
+        Draws the instances, and returns the number of draw calls.
+        """
+        count = len(instance_buffer)
+        if not count:
+            return 0
+        if self.program is None:
+            self.init_gl()
+
+        vertex_count = len(self.vertices)
+
+        glUseProgram(self.program)
+        self._bind_buffers(instance_buffer)
+
+        # 1st pass: Draw outline, but without writing on the depth buffer.
+        glUniform1i(self.pass_location, 1)
+        glDepthMask(GL_FALSE)
+        glDrawArraysInstanced(GL_TRIANGLES, 0, vertex_count, count)
+        glDepthMask(GL_TRUE)
+
+        # 2nd pass: Draw the bodies.
+        glUniform1i(self.pass_location, 0)
+        glDrawArraysInstanced(GL_TRIANGLES, 0, vertex_count, count)
+
+        # 3rd pass: Draw outline again to update the depth buffer, but skipping the color buffer.
+        glUniform1i(self.pass_location, 1)
+        glColorMask(GL_FALSE, GL_FALSE, GL_FALSE, GL_FALSE)
+        glDrawArraysInstanced(GL_TRIANGLES, 0, vertex_count, count)
+        glColorMask(GL_TRUE, GL_TRUE, GL_TRUE, GL_TRUE)
+
+        self._unbind_buffers()
+        glUseProgram(0)
+        return 3
+
+
+class InstancedWireframeModel(InstancedModel):
+    """
+    Renders the lines of a mesh once per instance of an `InstanceBuffer`, in the color of the
+    instance, with a single instanced draw call. The scale is shared by all the instances.
+    """
+
+    def __init__(self, mesh: Mesh):
+        vertices = [mesh.vertices[vi] for line in mesh.lines for vi in line]
+        self.vertices = numpy.array(vertices, dtype=numpy.float32).reshape(-1, 3)
+        self.vertex_buffer = None
+        self.program = None
+        self.scale_location = None
+
+    def create_shaders(self):
+        vertshader = """
+        #version 330 compatibility
+        layout(location = 0) in vec3 vert;
+        layout(location = 1) in vec3 position;
+        layout(location = 2) in vec4 color;
+        uniform vec3 scale;
+        out vec4 vecColor;
+
+        void main(void)
+        {
+            vecColor = color;
+            vec3 offset = vec3(position.x, -position.z, position.y);
+            gl_Position = gl_ModelViewProjectionMatrix * vec4(vert * scale + offset, 1.0);
+        }
+        """
+
+        fragshader = """
+        #version 330
+        in vec4 vecColor;
+        out vec4 finalColor;
+
+        void main (void)
+        {
+            finalColor = vecColor;
+        }"""
+
+        vertexShaderObject = glCreateShader(GL_VERTEX_SHADER)
+        fragmentShaderObject = glCreateShader(GL_FRAGMENT_SHADER)
+        glShaderSource(vertexShaderObject, vertshader)
+        glShaderSource(fragmentShaderObject, fragshader)
+
+        _compile_shader_with_error_report(vertexShaderObject)
+        _compile_shader_with_error_report(fragmentShaderObject)
+
+        program = glCreateProgram()
+
+        glAttachShader(program, vertexShaderObject)
+        glAttachShader(program, fragmentShaderObject)
+
+        glLinkProgram(program)
+        self.program = program
+
+        self.scale_location = glGetUniformLocation(program, "scale")
+
+    def render(self, instance_buffer: InstanceBuffer, scale=(1.0, 1.0, 1.0)) -> int:
+        """
+        Draws the instances, with the mesh scaled by the given factors (in GL coordinates), and
+        returns the number of draw calls.
+        """
+        count = len(instance_buffer)
+        if not count:
+            return 0
+        if self.program is None:
+            self.init_gl()
+
+        glUseProgram(self.program)
+        glUniform3f(self.scale_location, *scale)
+        self._bind_buffers(instance_buffer)
+        glDrawArraysInstanced(GL_LINES, 0, len(self.vertices), count)
+        self._unbind_buffers()
         glUseProgram(0)
+        return 1
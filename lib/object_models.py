@@ -1,7 +1,9 @@
 import os
 import json
 from OpenGL.GL import *
-from .model_rendering import (GenericObject, Model, TexturedModel, Cube, Cylinder)
+from .model_rendering import (GenericObject, Model, TexturedModel, Cube, Cylinder, InstancedModel,
+                              InstancedWireframeModel, InstanceBuffer)
+from .polylines import PolylineBuffer, PolylineModel
 
 from .vectors import Vector3, rotation_matrix_with_up_dir
 
@@ -12,6 +14,8 @@ with open("lib/color_coding.json", "r") as f:
 class ObjectModels(object):
     def __init__(self):
         self.models = {}
+        # Number of draw calls submitted by the helpers below, read by the frame profiler.
+        self.draw_count = 0
         self.generic = GenericObject()
         self.cylinder = Cylinder()
         self.checkpointleft = Cylinder(colors["CheckpointLeft"])
@@ -27,6 +31,7 @@ class ObjectModels(object):
         self.respawn = GenericObject(colors["Respawn"])
         self.startpoints = GenericObject(colors["StartPoints"])
         self.minimap = Cylinder(colors["Minimap"])
+        self.instanced_cylinder = InstancedModel(self.cylinder.mesh_list[0])
         #self.purplecube = Cube((0.7, 0.7, 1.0, 1.0))
 
         PLAYER_COLORS = (
@@ -53,12 +58,14 @@ class ObjectModels(object):
 
         with open("resources/unitcylinder.obj", "r") as f:
             self.unitcylinder = Model.from_obj(f, rotate=True)
+        self.instanced_unitcylinder = InstancedWireframeModel(self.unitcylinder.mesh_list[0])
 
         with open("resources/unitcube_wireframe.obj", "r") as f:
             self.wireframe_cube = Model.from_obj(f, rotate=True)
 
         with open("resources/arrow_head.obj", "r") as f:
             self.arrow_head = Model.from_obj(f, rotate=True, scale=3.0)
+        self.polylines = PolylineModel(self.arrow_head.mesh_list[0])
 
     def init_gl(self):
         for dirpath, dirs, files in os.walk("resources/objectmodels"):
@@ -82,6 +89,26 @@ class ObjectModels(object):
 
         self.generic.generate_displists()
 
+        self.instanced_cylinder.init_gl()
+        self.instanced_unitcylinder.init_gl()
+        self.polylines.init_gl()
+
+    def render_instanced_positions(self, instance_buffer: InstanceBuffer):
+        self.draw_count += self.instanced_cylinder.render(instance_buffer)
+
+    def render_instanced_cylinders(self, instance_buffer: InstanceBuffer, radius, height):
+        # Same scaling as `draw_cylinder()`.
+        self.draw_count += self.instanced_unitcylinder.render(instance_buffer,
+                                                              (radius, height, radius))
+
+    def render_polylines(self, polyline_buffer: PolylineBuffer, highlighted=frozenset(),
+                         arrows=True, camera=None, arrow_scale=1.0):
+        if camera is not None:
+            # Convert to GL base.
+            camera = (camera.x, -camera.z, camera.y)
+        self.draw_count += self.polylines.render(polyline_buffer, highlighted, arrows, camera,
+                                                 arrow_scale)
+
     def draw_arrow_head(self, frompos, topos, up_dir, scale):
         # Convert to GL base.
         frompos = Vector3(frompos.x, -frompos.z, frompos.y)
@@ -99,7 +126,7 @@ class ObjectModels(object):
 
         glScale(scale, scale, scale)
 
-        self.arrow_head.render()
+        self.draw_count += self.arrow_head.render()
 
         glPopMatrix()
 
@@ -110,9 +137,9 @@ class ObjectModels(object):
         glScalef(scale, scale, scale)
 
         if solid:
-            self.sphere_solid.render()
+            self.draw_count += self.sphere_solid.render()
         else:
-            self.sphere.render()
+            self.draw_count += self.sphere.render()
         glPopMatrix()
 
     def draw_squashed_sphere(self, position, scale, solid=False):
@@ -122,9 +149,9 @@ class ObjectModels(object):
         glScalef(scale, scale, 0.0)
 
         if solid:
-            self.sphere_solid.render()
+            self.draw_count += self.sphere_solid.render()
         else:
-            self.sphere.render()
+            self.draw_count += self.sphere.render()
         glPopMatrix()
 
     def draw_sphere_last_position(self, scale):
@@ -132,7 +159,7 @@ class ObjectModels(object):
 
         glScalef(scale, scale, scale)
 
-        self.sphere.render()
+        self.draw_count += self.sphere.render()
         glPopMatrix()
 
     def draw_cylinder(self,position, radius, height):
@@ -141,7 +168,7 @@ class ObjectModels(object):
         glTranslatef(position.x, -position.z, position.y)
         glScalef(radius, height, radius)
 
-        self.unitcylinder.render()
+        self.draw_count += self.unitcylinder.render()
         glPopMatrix()
 
     def draw_wireframe_cube(self, position, rotation, scale):
@@ -151,7 +178,7 @@ class ObjectModels(object):
         glMultMatrixf(mtx)
         glTranslatef(0, 0, scale.y / 2)
         glScalef(-scale.z, scale.x, scale.y)
-        self.wireframe_cube.render()
+        self.draw_count += self.wireframe_cube.render()
         glPopMatrix()
 
     def draw_wireframe_cylinder(self, position, rotation, scale):
@@ -161,7 +188,7 @@ class ObjectModels(object):
         glMultMatrixf(mtx)
         glTranslatef(0.0, 0.0, scale.y / 2.0)
         glScalef(-scale.z, scale.x, scale.y)
-        self.unitcylinder.render()
+        self.draw_count += self.unitcylinder.render()
         glPopMatrix()
 
     def draw_cylinder_last_position(self, radius, height):
@@ -169,7 +196,7 @@ class ObjectModels(object):
 
         glScalef(radius, radius, height)
 
-        self.unitcylinder.render()
+        self.draw_count += self.unitcylinder.render()
         glPopMatrix()
 
     def render_generic_position(self, position, selected):
@@ -207,17 +234,18 @@ class ObjectModels(object):
         glVertex3f(0.0, 0.0, 0.0)
         glVertex3f(1000.0, 0.0, 0.0)
         glEnd()
+        self.draw_count += 1
 
 
         #glMultMatrixf(rotation.mtx[])
-        getattr(self, name).render(selected=selected)
+        self.draw_count += getattr(self, name).render(selected=selected)
 
         glPopMatrix()
 
     def _render_generic_position(self, cube, position, selected):
         glPushMatrix()
         glTranslatef(position.x, -position.z, position.y)
-        cube.render(selected=selected)
+        self.draw_count += cube.render(selected=selected)
 
         glPopMatrix()
 
@@ -0,0 +1,241 @@
+"""
+Integer-ID picking.
+
+Selectable objects are rendered with their ID encoded in the current color (see
+`Model.render_coloredid()`). The picking program decodes the ID, writes it into an `R32UI`
+attachment, and flags it in a hit buffer (one bit per ID, stored in a shader storage buffer).
+
+A click reads the ID of the topmost object under the cursor from the `R32UI` attachment. A marquee
+selection is rendered with depth testing disabled, restricted to the rectangle with the scissor
+test, and reads the hit buffer; every object in the rectangle is found in a single render,
+regardless of how many objects overlap.
+"""
+import numpy
+from OpenGL.GL import *
+
+# Number of bits of the IDs (as encoded in the color by the viewer, the upper 4 bits of the red
+# component are used as a marker).
+ID_BITS = 20
+NO_ID = 0xFFFFFFFF
+HIT_BUFFER_SIZE = (1 << ID_BITS) // 8
+
+# Number of pixels above which the IDs of a color readback are deduplicated with a table of flags
+# rather than by sorting them.
+LARGE_READBACK_SIZE = 1 << 16
+
+_id_flags = None
+
+
+def decode_color_ids(pixels: bytes) -> numpy.ndarray:
+    """
+    Returns the sorted unique IDs in the given RGB pixels, as read back from a color picking pass.
+    Pixels with a red component of `0xFF` belong to the background.
+    """
+    pixels = numpy.frombuffer(pixels, dtype=numpy.uint8)
+    red, green, blue = pixels[0::3], pixels[1::3], pixels[2::3]
+    ids = (red & 0x0F).astype(numpy.uint32) << 16
+    ids |= green.astype(numpy.uint32) << 8
+    ids |= blue
+    ids = ids[red != 0xFF]
+
+    if len(ids) < LARGE_READBACK_SIZE:
+        return numpy.unique(ids)
+
+    # Flagging the IDs in a table is linear, unlike `numpy.unique()`, which sorts the IDs. The
+    # table is allocated once, and cleared after use.
+    global _id_flags
+    if _id_flags is None:
+        _id_flags = numpy.zeros(1 << ID_BITS, dtype=bool)
+    _id_flags[ids] = True
+    unique_ids = numpy.flatnonzero(_id_flags)
+    _id_flags[unique_ids] = False
+    return unique_ids
+
+
+def decode_hit_bits(words: numpy.ndarray) -> numpy.ndarray:
+    """
+    Returns the sorted IDs that are flagged in the given hit buffer words.
+    """
+    bits = numpy.unpackbits(words.astype('<u4').view(numpy.uint8), bitorder='little')
+    return numpy.flatnonzero(bits)
+
+
+class PickingBuffer(object):
+
+    def __init__(self):
+        self.framebuffer = None
+        self.id_texture = None
+        self.depth_texture = None
+        self.hit_buffer = None
+        self.program = None
+        self.width = 0
+        self.height = 0
+
+        self._marquee = False
+        self._rect = None
+        self._previous_framebuffer = 0
+        self._previous_state = None
+
+    def is_available(self) -> bool:
+        return self.program is not None
+
+    def init_gl(self, width: int, height: int):
+        """
+        Creates the framebuffer and the picking program. Shader storage buffers require OpenGL 4.3;
+        if they are not supported, the picking buffer stays unavailable and the caller is expected
+        to fall back to color picking.
+        """
+        version = (glGetIntegerv(GL_MAJOR_VERSION), glGetIntegerv(GL_MINOR_VERSION))
+        if version < (4, 3):
+            return
+
+        try:
+            self.create_shaders()
+        except RuntimeError as e:
+            print(f'Integer-ID picking not available: {e}')
+            return
+
+        self.framebuffer = glGenFramebuffers(1)
+        self.id_texture = glGenTextures(1)
+        self.depth_texture = glGenTextures(1)
+        self.resize(width, height)
+
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D,
+                               self.id_texture, 0)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_TEXTURE_2D,
+                               self.depth_texture, 0)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+        self.hit_buffer = glGenBuffers(1)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.hit_buffer)
+        glBufferData(GL_SHADER_STORAGE_BUFFER, HIT_BUFFER_SIZE, None, GL_DYNAMIC_READ)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
+
+    def resize(self, width: int, height: int):
+        if self.id_texture is None:
+            return
+        self.width, self.height = width, height
+
+        glBindTexture(GL_TEXTURE_2D, self.id_texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_R32UI, width, height, 0, GL_RED_INTEGER,
+                     GL_UNSIGNED_INT, None)
+        glBindTexture(GL_TEXTURE_2D, self.depth_texture)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_DEPTH_COMPONENT, width, height, 0, GL_DEPTH_COMPONENT,
+                     GL_FLOAT, None)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+    def create_shaders(self):
+        # Imported here, as the module loads its color resources relative to the working directory.
+        from .model_rendering import _compile_shader_with_error_report
+
+        vertshader = """
+        #version 430 compatibility
+        flat out vec4 vecColor;
+
+        void main(void)
+        {
+            vecColor = gl_Color;
+            gl_Position = gl_ModelViewProjectionMatrix * gl_Vertex;
+        }
+        """
+
+        fragshader = """
+        #version 430
+        flat in vec4 vecColor;
+        layout(location = 0) out uint pickId;
+        layout(std430, binding = 0) buffer Hits {
+            uint hits[];
+        };
+
+        void main (void)
+        {
+            uvec3 color = uvec3(round(vecColor.rgb * 255.0));
+            uint id = ((color.r & 0x0Fu) << 16) | (color.g << 8) | color.b;
+            atomicOr(hits[id >> 5], 1u << (id & 31u));
+            pickId = id;
+        }"""
+
+        vertexShaderObject = glCreateShader(GL_VERTEX_SHADER)
+        fragmentShaderObject = glCreateShader(GL_FRAGMENT_SHADER)
+        glShaderSource(vertexShaderObject, vertshader)
+        glShaderSource(fragmentShaderObject, fragshader)
+
+        _compile_shader_with_error_report(vertexShaderObject)
+        _compile_shader_with_error_report(fragmentShaderObject)
+
+        program = glCreateProgram()
+
+        glAttachShader(program, vertexShaderObject)
+        glAttachShader(program, fragmentShaderObject)
+
+        glLinkProgram(program)
+        if not glGetProgramiv(program, GL_LINK_STATUS):
+            raise RuntimeError(str(glGetProgramInfoLog(program), encoding="ascii"))
+        self.program = program
+
+    def begin(self, x: int, y: int, width: int, height: int, marquee: bool):
+        """
+        Binds the picking framebuffer and program. Objects rendered until `end()` is called are
+        picked if they cover the given rectangle (in window coordinates).
+        """
+        self._marquee = marquee
+        self._rect = (x, y, width, height)
+        self._previous_framebuffer = glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING)
+        self._previous_state = {
+            capability: glIsEnabled(capability)
+            for capability in (GL_DEPTH_TEST, GL_ALPHA_TEST, GL_BLEND, GL_SCISSOR_TEST)
+        }
+
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        glEnable(GL_SCISSOR_TEST)
+        glScissor(x, y, width, height)
+        glClearBufferuiv(GL_COLOR, 0, numpy.full(4, NO_ID, dtype=numpy.uint32))
+        glClear(GL_DEPTH_BUFFER_BIT)
+
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.hit_buffer)
+        glClearBufferData(GL_SHADER_STORAGE_BUFFER, GL_R32UI, GL_RED_INTEGER, GL_UNSIGNED_INT,
+                          None)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 0, self.hit_buffer)
+
+        # In a marquee selection, occluded objects are selected as well.
+        if marquee:
+            glDisable(GL_DEPTH_TEST)
+        else:
+            glEnable(GL_DEPTH_TEST)
+        glDisable(GL_ALPHA_TEST)
+        glDisable(GL_BLEND)
+
+        glUseProgram(self.program)
+
+    def end(self) -> 'set[int]':
+        """
+        Restores the previous state, and returns the IDs of the objects that were picked.
+        """
+        glUseProgram(0)
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 0, 0)
+
+        if self._marquee:
+            glMemoryBarrier(GL_BUFFER_UPDATE_BARRIER_BIT)
+            glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.hit_buffer)
+            data = glGetBufferSubData(GL_SHADER_STORAGE_BUFFER, 0, HIT_BUFFER_SIZE)
+            glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
+            words = numpy.frombuffer(data, dtype=numpy.uint32)
+            ids = set(decode_hit_bits(words).tolist())
+        else:
+            x, y, width, height = self._rect
+            pixels = numpy.empty(width * height, dtype=numpy.uint32)
+            glReadPixels(x, y, width, height, GL_RED_INTEGER, GL_UNSIGNED_INT, pixels)
+            ids = set(numpy.unique(pixels[pixels != NO_ID]).tolist())
+
+        glBindFramebuffer(GL_FRAMEBUFFER, self._previous_framebuffer)
+        for capability, enabled in self._previous_state.items():
+            if enabled:
+                glEnable(capability)
+            else:
+                glDisable(capability)
+
+        return ids
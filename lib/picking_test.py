@@ -0,0 +1,42 @@
+"""
+Unit tests for the `picking` module.
+"""
+import numpy
+import pytest
+
+from .picking import decode_color_ids, decode_hit_bits
+
+
+def _decode_color_ids_by_loop(pixels: bytes) -> 'set[int]':
+    indexes = set()
+    for i in range(0, len(pixels) // 3):
+        if pixels[i * 3] != 0xFF:
+            upper = pixels[i * 3] & 0x0F
+            index = (upper << 16) | (pixels[i * 3 + 1] << 8) | pixels[i * 3 + 2]
+            indexes.add(index)
+    return indexes
+
+
+# Readbacks below and above the size from which the IDs are flagged in a table.
+@pytest.mark.parametrize('size', (100, 400))
+def test_decode_color_ids(size):
+    rng = numpy.random.default_rng(0)
+    ids = 0x100000 + rng.integers(0, 5000, size * size) * 4
+    pixels = numpy.stack(((ids >> 16) & 0xFF, (ids >> 8) & 0xFF, ids & 0xFF), axis=1)
+    pixels = pixels.astype(numpy.uint8)
+    # Background.
+    pixels[rng.random(len(pixels)) < 0.5] = 0xFF
+    pixels = pixels.tobytes()
+
+    expected = sorted(_decode_color_ids_by_loop(pixels))
+    assert list(decode_color_ids(pixels)) == expected
+    assert list(decode_color_ids(pixels)) == expected
+    assert len(decode_color_ids(b'\xff' * 300)) == 0
+
+
+def test_decode_hit_bits():
+    ids = [0, 1, 31, 32, 1000, (1 << 20) - 1]
+    words = numpy.zeros((1 << 20) // 32, dtype=numpy.uint32)
+    for i in ids:
+        words[i >> 5] |= 1 << (i & 31)
+    assert list(decode_hit_bits(words)) == ids
@@ -0,0 +1,340 @@
+"""
+Batched rendering of polylines (e.g. routes and enemy paths).
+
+The points of all the polylines in a batch are stored in a single vertex buffer, and drawn as line
+strips with primitive restart: hidden points, and the end of each polyline, break the strip. An
+arrow head is drawn at the middle of each segment, as an instance of the arrow model; its
+orientation and its camera-dependent scale are computed in the vertex shader.
+
+When the polylines change, only the ranges of the polylines whose points moved are uploaded again,
+as long as the number of points and the hidden points remain the same.
+"""
+import ctypes
+
+import numpy
+from OpenGL.GL import *
+
+RESTART_INDEX = 0xFFFFFFFF
+
+# Per-instance data of the arrow heads: the start of the segment, and the middle of the segment
+# (where the tip of the arrow head is placed), both in GL coordinates.
+ARROW_DTYPE = numpy.dtype([
+    ('tail', numpy.float32, (3, )),
+    ('tip', numpy.float32, (3, )),
+])
+
+
+def to_gl_coordinates(positions: numpy.ndarray) -> numpy.ndarray:
+    positions = numpy.asarray(positions, dtype=numpy.float32).reshape(-1, 3)
+    return numpy.stack((positions[:, 0], -positions[:, 2], positions[:, 1]), axis=1)
+
+
+def build_polyline_indices(hidden: numpy.ndarray, first: int) -> numpy.ndarray:
+    """
+    Returns the element indices of a polyline whose points start at vertex `first`: the indices of
+    the visible points, with a restart index in place of each hidden point and at the end.
+    """
+    indices = numpy.arange(first, first + len(hidden) + 1, dtype=numpy.uint32)
+    indices[:-1][hidden] = RESTART_INDEX
+    indices[-1] = RESTART_INDEX
+    return indices
+
+
+def build_polyline_arrows(positions: numpy.ndarray, hidden: numpy.ndarray) -> numpy.ndarray:
+    """
+    Returns the arrow heads of a polyline (positions in GL coordinates): one per segment between
+    two visible points.
+    """
+    visible_segments = ~(hidden[1:] | hidden[:-1])
+    tails = positions[:-1][visible_segments]
+    heads = positions[1:][visible_segments]
+    arrows = numpy.empty(len(tails), dtype=ARROW_DTYPE)
+    arrows['tail'] = tails
+    arrows['tip'] = (tails + heads) / 2.0
+    return arrows
+
+
+class PolylineBuffer(object):
+    """
+    Vertex, element and arrow buffers of a batch of polylines. The polylines are only rebuilt when
+    the key given to `update()` changes.
+    """
+
+    def __init__(self):
+        self.key = None
+        self.layout = None
+        self.positions = []
+        self.index_ranges = []
+        self.arrow_ranges = []
+        self.index_count = 0
+        self.arrow_count = 0
+        self.updated_polylines = 0
+
+        self.vertex_buffer = None
+        self.index_buffer = None
+        self.arrow_buffer = None
+
+    def update(self, key, build_polylines):
+        """
+        Calls `build_polylines()` to generate the polylines (a list of `(positions, hidden)`
+        pairs, with positions in BOL coordinates), unless `key` matches the key of the last update.
+        """
+        if key == self.key and self.vertex_buffer is not None:
+            return
+        self.key = key
+
+        polylines = [(to_gl_coordinates(positions), numpy.asarray(hidden, dtype=bool))
+                     for positions, hidden in build_polylines()]
+        layout = [hidden.tobytes() for _positions, hidden in polylines]
+
+        if self.vertex_buffer is None:
+            self.vertex_buffer, self.index_buffer, self.arrow_buffer = glGenBuffers(3)
+
+        if layout != self.layout:
+            self._upload(polylines)
+            self.layout = layout
+            self.updated_polylines = len(polylines)
+            return
+
+        # Same points and hidden points; only the polylines whose points moved are uploaded.
+        self.updated_polylines = 0
+        vertex_offset = 0
+        for i, (positions, hidden) in enumerate(polylines):
+            if not numpy.array_equal(positions, self.positions[i]):
+                self.positions[i] = positions
+                self.updated_polylines += 1
+
+                glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+                glBufferSubData(GL_ARRAY_BUFFER, vertex_offset * positions.itemsize * 3,
+                                positions.nbytes, positions)
+                arrows = build_polyline_arrows(positions, hidden)
+                if len(arrows):
+                    first_arrow, _count = self.arrow_ranges[i]
+                    glBindBuffer(GL_ARRAY_BUFFER, self.arrow_buffer)
+                    glBufferSubData(GL_ARRAY_BUFFER, first_arrow * ARROW_DTYPE.itemsize,
+                                    arrows.nbytes, arrows)
+                glBindBuffer(GL_ARRAY_BUFFER, 0)
+            vertex_offset += len(positions)
+
+    def _upload(self, polylines):
+        self.positions = []
+        self.index_ranges = []
+        self.arrow_ranges = []
+        all_indices = []
+        all_arrows = []
+        vertex_count = index_count = arrow_count = 0
+        for positions, hidden in polylines:
+            indices = build_polyline_indices(hidden, vertex_count)
+            arrows = build_polyline_arrows(positions, hidden)
+            self.positions.append(positions)
+            self.index_ranges.append((index_count, len(indices)))
+            self.arrow_ranges.append((arrow_count, len(arrows)))
+            all_indices.append(indices)
+            all_arrows.append(arrows)
+            vertex_count += len(positions)
+            index_count += len(indices)
+            arrow_count += len(arrows)
+        self.index_count = index_count
+        self.arrow_count = arrow_count
+
+        for target, buffer, arrays, dtype in (
+            (GL_ARRAY_BUFFER, self.vertex_buffer, self.positions, numpy.float32),
+            (GL_ELEMENT_ARRAY_BUFFER, self.index_buffer, all_indices, numpy.uint32),
+            (GL_ARRAY_BUFFER, self.arrow_buffer, all_arrows, ARROW_DTYPE),
+        ):
+            data = numpy.concatenate(arrays) if arrays else numpy.zeros(0, dtype=dtype)
+            glBindBuffer(target, buffer)
+            if len(data):
+                glBufferData(target, data.nbytes, data, GL_DYNAMIC_DRAW)
+            glBindBuffer(target, 0)
+
+    def invalidate(self):
+        self.key = None
+
+    def __len__(self):
+        return len(self.index_ranges)
+
+
+class PolylineModel(object):
+    """
+    Draws the polylines of a `PolylineBuffer`, and an instance of the given arrow mesh (made of
+    lines) on each of their segments.
+    """
+
+    def __init__(self, arrow_mesh):
+        vertices = [arrow_mesh.vertices[vi] for line in arrow_mesh.lines for vi in line]
+        self.arrow_vertices = numpy.array(vertices, dtype=numpy.float32).reshape(-1, 3)
+        self.arrow_vertex_buffer = None
+        self.program = None
+        self.uniform_locations = {}
+
+    def init_gl(self):
+        self.arrow_vertex_buffer = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.arrow_vertex_buffer)
+        glBufferData(GL_ARRAY_BUFFER, self.arrow_vertices.nbytes, self.arrow_vertices,
+                     GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.create_shaders()
+
+    def create_shaders(self):
+        # Imported here, as the module loads its color resources relative to the working directory.
+        from .model_rendering import _compile_shader_with_error_report
+
+        # The orientation matches `rotation_matrix_with_up_dir()`, as used when the arrow heads
+        # were drawn one by one: the arrow points along the segment, and faces the up direction.
+        vertshader = """
+        #version 330 compatibility
+        layout(location = 0) in vec3 vert;
+        layout(location = 1) in vec3 tail;
+        layout(location = 2) in vec3 tip;
+        uniform int perspective;
+        uniform vec3 camera;
+        uniform float arrowscale;
+        out vec4 vecColor;
+
+        void main(void)
+        {
+            vec3 direction = tip - tail;
+            vec3 up = perspective != 0 ? tip - camera : vec3(0.0, 0.0, 1.0);
+            float scale = perspective != 0 ? length(tip - camera) / 130.0 : arrowscale;
+
+            vec3 offset = vert;
+            if (dot(direction, direction) > 0.0 && dot(up, up) > 0.0) {
+                vec3 perp = cross(up, direction);
+                if (dot(perp, perp) == 0.0) {
+                    up = cross(direction, vec3(1.0, 0.0, 0.0));
+                    if (dot(up, up) == 0.0) {
+                        up = cross(direction, vec3(0.0, 0.0, 1.0));
+                    }
+                    perp = cross(up, direction);
+                }
+                vec3 target_up = cross(direction, perp);
+                offset = -vert.z * normalize(perp) + vert.y * normalize(target_up)
+                         + vert.x * normalize(direction);
+            }
+
+            vecColor = gl_Color;
+            gl_Position = gl_ModelViewProjectionMatrix * vec4(tip + offset * scale, 1.0);
+        }
+        """
+
+        fragshader = """
+        #version 330
+        in vec4 vecColor;
+        out vec4 finalColor;
+
+        void main (void)
+        {
+            finalColor = vecColor;
+        }"""
+
+        vertexShaderObject = glCreateShader(GL_VERTEX_SHADER)
+        fragmentShaderObject = glCreateShader(GL_FRAGMENT_SHADER)
+        glShaderSource(vertexShaderObject, vertshader)
+        glShaderSource(fragmentShaderObject, fragshader)
+
+        _compile_shader_with_error_report(vertexShaderObject)
+        _compile_shader_with_error_report(fragmentShaderObject)
+
+        program = glCreateProgram()
+
+        glAttachShader(program, vertexShaderObject)
+        glAttachShader(program, fragmentShaderObject)
+
+        glLinkProgram(program)
+        self.program = program
+
+        for name in ('perspective', 'camera', 'arrowscale'):
+            self.uniform_locations[name] = glGetUniformLocation(program, name)
+
+    def render(self,
+               polyline_buffer: PolylineBuffer,
+               highlighted: 'set[int]' = frozenset(),
+               arrows: bool = True,
+               camera: 'tuple[float, float, float] | None' = None,
+               arrow_scale: float = 1.0) -> int:
+        """
+        Draws the polylines in the current color, and the polylines of the given indexes with a
+        thicker line. In the perspective view, the position of the camera (in GL coordinates)
+        determines the scale of the arrow heads; otherwise, `arrow_scale` is used.
+
+        Returns the number of draw calls.
+        """
+        if not polyline_buffer.index_count:
+            return 0
+        if self.program is None:
+            self.init_gl()
+
+        highlighted = sorted(i for i in highlighted if 0 <= i < len(polyline_buffer))
+
+        glEnable(GL_PRIMITIVE_RESTART)
+        glPrimitiveRestartIndex(RESTART_INDEX)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, polyline_buffer.vertex_buffer)
+        glVertexPointer(3, GL_FLOAT, 0, None)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, polyline_buffer.index_buffer)
+
+        glDrawElements(GL_LINE_STRIP, polyline_buffer.index_count, GL_UNSIGNED_INT, None)
+        if highlighted:
+            glLineWidth(3.0)
+            for i in highlighted:
+                first, count = polyline_buffer.index_ranges[i]
+                glDrawElements(GL_LINE_STRIP, count, GL_UNSIGNED_INT,
+                               ctypes.c_void_p(first * 4))
+            glLineWidth(1.0)
+
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glDisable(GL_PRIMITIVE_RESTART)
+        draw_count = 1 + len(highlighted)
+
+        if arrows and polyline_buffer.arrow_count:
+            draw_count += self._render_arrows(polyline_buffer, highlighted, camera, arrow_scale)
+
+        return draw_count
+
+    def _render_arrows(self, polyline_buffer, highlighted, camera, arrow_scale) -> int:
+        glUseProgram(self.program)
+        glUniform1i(self.uniform_locations['perspective'], int(camera is not None))
+        glUniform3f(self.uniform_locations['camera'], *(camera or (0.0, 0.0, 0.0)))
+        glUniform1f(self.uniform_locations['arrowscale'], arrow_scale)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.arrow_vertex_buffer)
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 0, None)
+        for location in (1, 2):
+            glEnableVertexAttribArray(location)
+            glVertexAttribDivisor(location, 1)
+
+        vertex_count = len(self.arrow_vertices)
+        self._bind_arrows(polyline_buffer, 0)
+        glDrawArraysInstanced(GL_LINES, 0, vertex_count, polyline_buffer.arrow_count)
+        draw_count = 1
+        if highlighted:
+            glLineWidth(3.0)
+            for i in highlighted:
+                first, count = polyline_buffer.arrow_ranges[i]
+                if count:
+                    self._bind_arrows(polyline_buffer, first)
+                    glDrawArraysInstanced(GL_LINES, 0, vertex_count, count)
+                    draw_count += 1
+            glLineWidth(1.0)
+
+        # Restore the default state, as the fixed-function rendering of the rest of the scene
+        # relies on it.
+        for location in (1, 2):
+            glVertexAttribDivisor(location, 0)
+            glDisableVertexAttribArray(location)
+        glDisableVertexAttribArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glUseProgram(0)
+        return draw_count
+
+    def _bind_arrows(self, polyline_buffer, first):
+        stride = ARROW_DTYPE.itemsize
+        glBindBuffer(GL_ARRAY_BUFFER, polyline_buffer.arrow_buffer)
+        for location, field in ((1, 'tail'), (2, 'tip')):
+            offset = first * stride + ARROW_DTYPE.fields[field][1]
+            glVertexAttribPointer(location, 3, GL_FLOAT, GL_FALSE, stride,
+                                  ctypes.c_void_p(offset))
@@ -0,0 +1,28 @@
+"""
+Unit tests for the `polylines` module.
+"""
+import numpy
+
+from .polylines import (RESTART_INDEX, build_polyline_arrows, build_polyline_indices,
+                        to_gl_coordinates)
+
+
+def test_build_polyline_indices():
+    hidden = numpy.array((False, False, True, False, False))
+    assert build_polyline_indices(hidden, 10).tolist() == [
+        10, 11, RESTART_INDEX, 13, 14, RESTART_INDEX
+    ]
+    assert build_polyline_indices(numpy.zeros(0, dtype=bool), 3).tolist() == [RESTART_INDEX]
+
+
+def test_build_polyline_arrows():
+    positions = to_gl_coordinates(((0, 0, 0), (10, 0, 0), (10, 0, 20), (10, 4, 20)))
+    assert positions.tolist() == [[0, 0, 0], [10, 0, 0], [10, -20, 0], [10, -20, 4]]
+
+    arrows = build_polyline_arrows(positions, numpy.array((False, False, True, False)))
+    assert arrows['tail'].tolist() == [[0, 0, 0]]
+    assert arrows['tip'].tolist() == [[5, 0, 0]]
+
+    arrows = build_polyline_arrows(positions, numpy.zeros(4, dtype=bool))
+    assert len(arrows) == 3
+    assert arrows['tip'][2].tolist() == [10, -20, 2]
@@ -0,0 +1,143 @@
+"""
+Scheduling of the ticks of the viewer.
+
+The viewer is only ticked when something needs it: input events, changes in the document, and
+ongoing animations (e.g. camera movement, or the Dolphin visualizer). Requests that arrive while a
+tick is already scheduled are coalesced, and frames are spaced by the frame budget. When nothing
+changes, no timer runs at all.
+
+The scheduler does not depend on Qt; the owner provides the function that starts its single-shot
+timer.
+"""
+import time
+from timeit import default_timer
+
+
+class RenderScheduler:
+
+    def __init__(self,
+                 start_timer: 'callable[[float], None]',
+                 frame_budget: float = 1.0 / 60.0,
+                 clock: 'callable[[], float]' = default_timer,
+                 cpu_clock: 'callable[[], float]' = time.process_time):
+        """
+        `start_timer` is called with a delay (in seconds) after which `begin_tick()` and
+        `end_tick()` are expected to be called.
+        """
+        self.frame_budget = frame_budget
+
+        self._start_timer = start_timer
+        self._clock = clock
+        self._cpu_clock = cpu_clock
+
+        self._scheduled = False
+        self._ticking = False
+        self._last_tick = None
+        self._last_frame = None
+
+        self._active = False
+        self._state_time = clock()
+        self._state_cpu_time = cpu_clock()
+        self.active_time = 0.0
+        self.active_cpu_time = 0.0
+        self.idle_time = 0.0
+        self.idle_cpu_time = 0.0
+        self.tick_count = 0
+        self.frame_count = 0
+
+    def request_tick(self, delay: float = 0.0):
+        """
+        Schedules a tick, unless one is already scheduled. Requests made during a tick are left to
+        `end_tick()`.
+        """
+        if self._scheduled or self._ticking:
+            return
+        self._scheduled = True
+        self._set_active(True)
+        self._start_timer(max(0.0, delay))
+
+    def begin_tick(self) -> float:
+        """
+        Returns the time elapsed since the previous tick, or 0 if the scheduler was idle, so that
+        animations do not jump after a pause.
+        """
+        now = self._clock()
+        timedelta = now - self._last_tick if self._last_tick is not None else 0.0
+        self._scheduled = False
+        self._ticking = True
+        self._last_tick = now
+        self.tick_count += 1
+        return timedelta
+
+    def is_frame_due(self) -> bool:
+        return (self._last_frame is None
+                or self._clock() - self._last_frame >= self.frame_budget)
+
+    def frame_started(self):
+        self._last_frame = self._clock()
+        self.frame_count += 1
+
+    def end_tick(self, frame_pending: bool = False, update_interval: 'float | None' = None):
+        """
+        Schedules the next tick: at the end of the frame budget if a frame is pending, after
+        `update_interval` seconds if an animation needs updates (0 meaning every frame), or none
+        at all, in which case the scheduler goes idle.
+        """
+        self._ticking = False
+
+        delays = []
+        if frame_pending:
+            elapsed = self._clock() - self._last_frame if self._last_frame is not None else 0.0
+            delays.append(self.frame_budget - elapsed)
+        if update_interval is not None:
+            delays.append(max(update_interval, self.frame_budget))
+
+        if delays:
+            self.request_tick(min(delays))
+        else:
+            self._last_tick = None
+            self._set_active(False)
+
+    def _set_active(self, active: bool):
+        if active != self._active:
+            self._accumulate_state_time()
+            self._active = active
+
+    def _accumulate_state_time(self):
+        now = self._clock()
+        cpu_now = self._cpu_clock()
+        if self._active:
+            self.active_time += now - self._state_time
+            self.active_cpu_time += cpu_now - self._state_cpu_time
+        else:
+            self.idle_time += now - self._state_time
+            self.idle_cpu_time += cpu_now - self._state_cpu_time
+        self._state_time = now
+        self._state_cpu_time = cpu_now
+
+    def get_statistics(self) -> dict:
+        """
+        Returns the wall and CPU time (of the whole process) spent while the scheduler was active
+        and idle, along with the number of ticks and frames.
+        """
+        self._accumulate_state_time()
+        return {
+            'active_time': self.active_time,
+            'active_cpu_time': self.active_cpu_time,
+            'idle_time': self.idle_time,
+            'idle_cpu_time': self.idle_cpu_time,
+            'ticks': self.tick_count,
+            'frames': self.frame_count,
+        }
+
+    def format_statistics(self) -> str:
+        stats = self.get_statistics()
+        lines = []
+        for state in ('active', 'idle'):
+            wall_time = stats[f'{state}_time']
+            cpu_time = stats[f'{state}_cpu_time']
+            usage = cpu_time / wall_time * 100.0 if wall_time else 0.0
+            lines.append(f'{state.capitalize()}: {wall_time:.1f} s, {cpu_time:.2f} s of CPU time '
+                         f'({usage:.1f}%)')
+        lines.append(f'Ticks: {stats["ticks"]}, frames: {stats["frames"]}')
+        return '\n'.join(lines)
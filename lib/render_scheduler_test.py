@@ -0,0 +1,83 @@
+"""
+Unit tests for the `render_scheduler` module.
+"""
+import pytest
+
+from .render_scheduler import RenderScheduler
+
+
+def _make_scheduler():
+    # The wall-clock and CPU times returned by the clocks of the scheduler.
+    now = [0.0, 0.0]
+    timers = []
+    scheduler = RenderScheduler(timers.append, frame_budget=0.02, clock=lambda: now[0],
+                                cpu_clock=lambda: now[1])
+    return scheduler, now, timers
+
+
+def test_requests_are_coalesced():
+    scheduler, _now, timers = _make_scheduler()
+    scheduler.request_tick()
+    scheduler.request_tick()
+    scheduler.request_tick(0.5)
+    assert timers == [0.0]
+
+    # Requests made during a tick are left to the end of the tick.
+    scheduler.begin_tick()
+    scheduler.request_tick()
+    assert timers == [0.0]
+    scheduler.end_tick()
+    assert timers == [0.0]
+
+
+def test_frame_budget():
+    scheduler, now, timers = _make_scheduler()
+    scheduler.request_tick()
+    scheduler.begin_tick()
+    assert scheduler.is_frame_due()
+    scheduler.frame_started()
+    scheduler.end_tick()
+
+    now[0] = 0.005
+    scheduler.request_tick()
+    scheduler.begin_tick()
+    assert not scheduler.is_frame_due()
+    scheduler.end_tick(frame_pending=True)
+    assert timers[-1] == pytest.approx(0.015)
+
+    now[0] = 0.02
+    assert scheduler.begin_tick() == pytest.approx(0.015)
+    assert scheduler.is_frame_due()
+    scheduler.frame_started()
+    scheduler.end_tick()
+    assert scheduler.frame_count == 2
+
+
+def test_animation_and_idle():
+    scheduler, now, timers = _make_scheduler()
+    scheduler.request_tick()
+    for _ in range(10):
+        scheduler.begin_tick()
+        now[1] += 0.001
+        scheduler.end_tick(update_interval=0.0)
+        now[0] += timers[-1]
+    assert len(timers) == 11
+    assert timers[-1] == pytest.approx(0.02)
+
+    # Once the animation ends, no more timers are started.
+    scheduler.begin_tick()
+    scheduler.end_tick()
+    assert len(timers) == 11
+
+    now[0] += 10.0
+    # After an idle period, animations resume without a jump.
+    scheduler.request_tick()
+    assert scheduler.begin_tick() == 0.0
+    scheduler.end_tick()
+
+    statistics = scheduler.get_statistics()
+    assert statistics['active_time'] == pytest.approx(0.2)
+    assert statistics['active_cpu_time'] == pytest.approx(0.01)
+    assert statistics['idle_time'] == pytest.approx(10.0)
+    assert statistics['idle_cpu_time'] == 0.0
+    assert statistics['ticks'] == 12
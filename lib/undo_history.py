@@ -0,0 +1,269 @@
+"""
+Storage of the undo history of a document.
+
+A document is given as a sequence of chunks (e.g. the header and the sections of a BOL file). To
+keep memory usage low, each version of the document is stored as a set of binary deltas against
+the previous version, with a full copy of the chunks (a keyframe) every `KEYFRAME_INTERVAL`
+versions.
+"""
+
+# Maximum number of deltas that need to be applied to restore a version of the document.
+KEYFRAME_INTERVAL = 32
+
+# Approximate memory, in bytes, used by the bookkeeping of a version or a delta, on top of the
+# encoded data that they hold.
+VERSION_OVERHEAD = 200
+DELTA_OVERHEAD = 100
+
+
+def _common_prefix_length(a: bytes, b: bytes) -> int:
+    # Binary search with slice comparisons, which are performed with `memcmp()`.
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _common_suffix_length(a: bytes, b: bytes, limit: int) -> int:
+    low, high = 0, min(len(a), len(b)) - limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:len(a) - low] == b[len(b) - middle:len(b) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def compute_delta(old: bytes, new: bytes) -> 'tuple[int, int, bytes] | None':
+    """
+    Returns a delta that transforms `old` into `new`, or `None` if they are equal.
+
+    The delta is a `(start, end, data)` tuple: the range of `old` that is replaced, and the bytes
+    it is replaced with. As edits tend to be localized (a moved point, an inserted object), the
+    range is narrowed down to the bytes between the common prefix and the common suffix.
+    """
+    if old is new or old == new:
+        return None
+
+    prefix = _common_prefix_length(old, new)
+    suffix = _common_suffix_length(old, new, prefix)
+
+    return prefix, len(old) - suffix, new[prefix:len(new) - suffix]
+
+
+def apply_delta(old: bytes, delta: 'tuple[int, int, bytes] | None') -> bytes:
+    if delta is None:
+        return old
+
+    start, end, data = delta
+    old = memoryview(old)
+    return b''.join((old[:start], data, old[end:]))
+
+
+class DocumentVersion:
+    """
+    A version of a document, stored either as a keyframe or as deltas against a base version.
+    """
+
+    def __init__(self, chunks: 'tuple[bytes]', base: 'DocumentVersion | None' = None):
+        self.hash = hash(chunks)
+
+        if base is None or base.depth + 1 >= KEYFRAME_INTERVAL:
+            self._set_keyframe(chunks)
+        else:
+            base_chunks = base.get_chunks()
+            if len(base_chunks) == len(chunks):
+                self.base = base
+                self.depth = base.depth + 1
+                self.deltas = tuple(compute_delta(base_chunk, chunk)
+                                    for base_chunk, chunk in zip(base_chunks, chunks))
+                self.size = VERSION_OVERHEAD + sum(DELTA_OVERHEAD + len(delta[2])
+                                                   for delta in self.deltas if delta is not None)
+            else:
+                self._set_keyframe(chunks)
+
+        # The chunks of the current version are kept around, as it is the base of the next
+        # version. They are released with `release_chunks()` once it is no longer current.
+        self._chunks = chunks
+
+    def _set_keyframe(self, chunks: 'tuple[bytes]'):
+        self.base = None
+        self.depth = 0
+        self.deltas = None
+        self.keyframe_chunks = chunks
+        self.size = VERSION_OVERHEAD + sum(len(chunk) for chunk in chunks)
+
+    @classmethod
+    def create(cls, chunks, base: 'DocumentVersion | None' = None) -> 'DocumentVersion':
+        """
+        Creates a new version of the document, or returns the base version if the chunks are equal.
+        """
+        chunks = tuple(chunks)
+        if base is not None and base.hash == hash(chunks) and base.get_chunks() == chunks:
+            return base
+        return cls(chunks, base)
+
+    def is_keyframe(self) -> bool:
+        return self.base is None
+
+    def get_chunks(self) -> 'tuple[bytes]':
+        if self._chunks is not None:
+            return self._chunks
+
+        versions = []
+        version = self
+        while version.base is not None:
+            versions.append(version)
+            version = version.base
+
+        chunks = list(version.keyframe_chunks)
+        for version in reversed(versions):
+            for i, delta in enumerate(version.deltas):
+                chunks[i] = apply_delta(chunks[i], delta)
+
+        return tuple(chunks)
+
+    def hold_chunks(self):
+        self._chunks = self.get_chunks()
+
+    def release_chunks(self):
+        if not self.is_keyframe():
+            self._chunks = None
+
+    def make_keyframe(self):
+        """
+        Turns the version into a keyframe, so that it no longer depends on its base version.
+        """
+        if not self.is_keyframe():
+            chunks = self.get_chunks()
+            self.deltas = None
+            self._set_keyframe(chunks)
+
+
+class UndoHistory:
+    """
+    The undo and redo stacks of an editor.
+
+    Entries can be of any type, as long as the document version that they hold is exposed in their
+    `document` attribute. Consecutive entries may share the same document version.
+
+    If a memory budget (in bytes) is set, the oldest undo entries are evicted, a keyframe interval at
+    a time, when the document versions exceed it. The most recent undo entry (i.e. the current state) is never evicted.
+    """
+
+    def __init__(self, memory_budget: 'int | None' = None):
+        self.undo_entries = []
+        self.redo_entries = []
+        self.memory_budget = memory_budget
+
+        # Number of entries that refer to each document version, keyed by the version's ID.
+        self._references = {}
+        self.memory_usage = 0
+
+    def _add_reference(self, entry):
+        version = entry.document
+        key = id(version)
+        count = self._references.get(key, (version, 0))[1]
+        self._references[key] = (version, count + 1)
+        if not count:
+            self.memory_usage += version.size
+
+    def _remove_reference(self, entry):
+        version = entry.document
+        key = id(version)
+        count = self._references[key][1] - 1
+        if count:
+            self._references[key] = (version, count)
+        else:
+            del self._references[key]
+            self.memory_usage -= version.size
+
+    def get_current(self):
+        return self.undo_entries[-1] if self.undo_entries else None
+
+    def get_current_document(self) -> 'DocumentVersion | None':
+        return self.undo_entries[-1].document if self.undo_entries else None
+
+    def can_undo(self) -> bool:
+        return len(self.undo_entries) > 1
+
+    def can_redo(self) -> bool:
+        return bool(self.redo_entries)
+
+    def push(self, entry):
+        """
+        Adds a new entry on top of the undo stack. The redo stack is cleared.
+        """
+        current_document = self.get_current_document()
+        if current_document is not None and current_document is not entry.document:
+            current_document.release_chunks()
+
+        for redo_entry in self.redo_entries:
+            self._remove_reference(redo_entry)
+        self.redo_entries.clear()
+
+        self.undo_entries.append(entry)
+        self._add_reference(entry)
+
+        self.enforce_memory_budget()
+
+    def undo(self):
+        """
+        Moves the top entry of the undo stack to the redo stack, and returns the new current entry.
+        """
+        entry = self.undo_entries.pop()
+        self.redo_entries.insert(0, entry)
+        self._set_current_document(entry.document, self.undo_entries[-1].document)
+        return self.undo_entries[-1]
+
+    def redo(self):
+        """
+        Moves the top entry of the redo stack to the undo stack, and returns the new current entry.
+        """
+        previous_document = self.undo_entries[-1].document
+        self.undo_entries.append(self.redo_entries.pop(0))
+        self._set_current_document(previous_document, self.undo_entries[-1].document)
+        return self.undo_entries[-1]
+
+    @staticmethod
+    def _set_current_document(previous_document: DocumentVersion, document: DocumentVersion):
+        if previous_document is not document:
+            previous_document.release_chunks()
+            document.hold_chunks()
+
+    def clear(self):
+        self.undo_entries.clear()
+        self.redo_entries.clear()
+        self._references.clear()
+        self.memory_usage = 0
+
+    def enforce_memory_budget(self):
+        if self.memory_budget is None:
+            return
+
+        while self.memory_usage > self.memory_budget and len(self.undo_entries) > 1:
+            # Versions are based on the version below them in the stack, so the oldest keyframe
+            # interval (up to the next keyframe) can be evicted as a whole without having to turn
+            # any of the remaining versions into a keyframe.
+            first_version = self.undo_entries[0].document
+            for end, entry in enumerate(self.undo_entries):
+                version = entry.document
+                if version is not first_version and version.is_keyframe():
+                    break
+            else:
+                # The interval extends to the current entry, which is made a keyframe to release
+                # the versions below it.
+                end = len(self.undo_entries) - 1
+                version = self.undo_entries[end].document
+                self.memory_usage -= version.size
+                version.make_keyframe()
+                self.memory_usage += version.size
+
+            for entry in self.undo_entries[:end]:
+                self._remove_reference(entry)
+            del self.undo_entries[:end]
@@ -0,0 +1,119 @@
+"""
+Unit tests for the `undo_history` module.
+"""
+import gc
+import tracemalloc
+
+from . import libbol
+from .libbol_benchmark import make_synthetic_course
+from .undo_history import (KEYFRAME_INTERVAL, DocumentVersion, UndoHistory, apply_delta,
+                           compute_delta)
+
+
+class _Entry:
+
+    def __init__(self, document: DocumentVersion):
+        self.document = document
+
+
+def _edit(bol: libbol.BOL, step: int):
+    # Small edits that are spread across different sections of the document.
+    if step % 3 == 0:
+        obj = bol.respawnpoints[step % len(bol.respawnpoints)]
+    elif step % 3 == 1:
+        obj = bol.cameras[step % len(bol.cameras)]
+    else:
+        obj = bol.kartpoints.positions[step % len(bol.kartpoints.positions)]
+    obj.position.x += 1.0
+    bol.mark_objects_dirty([obj])
+
+
+def _push(history: UndoHistory, bol: libbol.BOL):
+    document = DocumentVersion.create(bol.encode(extended_format=True),
+                                      history.get_current_document())
+    history.push(_Entry(document))
+
+
+def test_compute_delta():
+    old = bytes(range(100))
+    for new in (old, old[:50] + b'xyz' + old[50:], old[:10] + old[20:], b'', old + old):
+        assert apply_delta(old, compute_delta(old, new)) == new
+
+
+def test_undo_redo():
+    bol = make_synthetic_course(enemy_points=500, checkpoints=200, route_points=200)
+    history = UndoHistory()
+    documents = []
+    for step in range(3 * KEYFRAME_INTERVAL):
+        _edit(bol, step)
+        _push(history, bol)
+        documents.append(bol.to_bytes(extended_format=True))
+
+    for document in reversed(documents[:-1]):
+        entry = history.undo()
+        assert b''.join(entry.document.get_chunks()) == document
+    for document in documents[1:]:
+        entry = history.redo()
+        assert b''.join(entry.document.get_chunks()) == document
+
+
+def test_memory_usage_after_small_edits():
+    bol = make_synthetic_course()
+    document_size = len(bol.to_bytes(extended_format=True))
+    edit_count = 10000
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        history = UndoHistory()
+        _push(history, bol)
+        baseline, _peak = tracemalloc.get_traced_memory()
+
+        for step in range(edit_count):
+            _edit(bol, step)
+            _push(history, bol)
+
+        gc.collect()
+        current, _peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    memory_usage = current - baseline
+    print(f'Document size: {document_size / 1024:.1f} KB | '
+          f'Memory after {edit_count} edits: {memory_usage / 1024 / 1024:.1f} MB (full copies '
+          f'would take {document_size * edit_count / 1024 / 1024:.1f} MB)')
+
+    assert len(history.undo_entries) == edit_count + 1
+    # Keyframes alone account for 1/KEYFRAME_INTERVAL of the full copies.
+    assert memory_usage < document_size * edit_count / KEYFRAME_INTERVAL * 2
+
+    expected_document = bol.to_bytes(extended_format=True)
+    assert b''.join(history.get_current_document().get_chunks()) == expected_document
+
+
+def test_memory_budget():
+    bol = make_synthetic_course()
+    memory_budget = 4 * 1024 * 1024
+    history = UndoHistory(memory_budget)
+
+    document_hashes = {}
+    document_depths = {}
+    for step in range(2000):
+        _edit(bol, step)
+        _push(history, bol)
+        document_hashes[id(history.get_current())] = hash(bol.to_bytes(extended_format=True))
+        document_depths[id(history.get_current())] = history.get_current_document().depth
+
+        assert history.memory_usage <= memory_budget
+
+    assert len(history.undo_entries) < 2000
+    assert history.undo_entries[0].document.is_keyframe()
+
+    # Whole keyframe intervals are evicted; no remaining version had to be turned into a keyframe.
+    for entry in history.undo_entries:
+        assert entry.document.depth == document_depths[id(entry)]
+
+    # The entries that remain can still be restored.
+    while history.can_undo():
+        entry = history.undo()
+        assert hash(b''.join(entry.document.get_chunks())) == document_hashes[id(entry)]
@@ -3,6 +3,8 @@ from math import sqrt
 import numpy
 
 class Vector3:
+    __slots__ = ('x', 'y', 'z')
+
     def __init__(self, x, y, z):
         self.x = x
         self.y = y
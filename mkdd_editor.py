@@ -12,12 +12,11 @@ import pstats
 import shutil
 import textwrap
 import traceback
-import weakref
 import os
 from timeit import default_timer
 from copy import deepcopy, copy
 from io import TextIOWrapper, BytesIO, StringIO
-from math import sin, cos, atan2
+from math import sin, cos, atan2, isnan
 import json
 from PIL import Image
 
@@ -47,6 +46,8 @@ from mkdd_widgets import BolMapViewer, MODE_TOPDOWN, SnappingMode
 from lib.libbol import BOL, MGEntry, Route, get_full_name, Rotation
 import lib.libbol as libbol
 from lib.rarc import Archive
+from lib.undo_history import DocumentVersion, UndoHistory
+from lib.edit_journal import EditJournal, get_journal_filepath, read_journal
 from lib.BCOllider import RacetrackCollision
 from lib.model_rendering import TexturedModel, CollisionModel, Minimap
 from widgets.editor_widgets import ErrorAnalyzer, ErrorAnalyzerButton, show_minimap_generator
@@ -127,30 +128,35 @@ def get_treeitem(root: QtWidgets.QTreeWidgetItem, obj):
     return None
 
 
-class UndoEntry:
-
-    _cache = weakref.WeakValueDictionary()
-
-    class _UndoCacheEntry:
-
-        def __init__(self, bol_document, enemy_path_data):
-            self.bol_document = bol_document
-            self.enemy_path_data = enemy_path_data
+def restore_empty_enemy_paths(bol: BOL, enemy_path_data: 'tuple[tuple[bool, int]]'):
+    # The BOL document cannot store information on empty enemy paths; this information is sourced
+    # from a separate list.
+    bol_enemy_paths = [path for path in bol.enemypointgroups.groups if path.points]
+    bol.enemypointgroups.groups.clear()
+    for empty, enemy_path_id in enemy_path_data:
+        if empty:
+            empty_enemy_path = libbol.EnemyPointGroup()
+            empty_enemy_path.id = enemy_path_id
+            bol.enemypointgroups.groups.append(empty_enemy_path)
+        else:
+            enemy_path = bol_enemy_paths.pop(0)
+            assert enemy_path.id == enemy_path_id
+            bol.enemypointgroups.groups.append(enemy_path)
 
-    def __init__(self, bol_document: bytes, enemy_path_data: 'tuple[tuple[bool, int]]',
-                 minimap_data: tuple, selected_items_data: tuple):
-        self.bol_hash = hash((bol_document, enemy_path_data))
 
-        # To avoid keeping track of duplicates of the BOL document (likely the case when the part
-        # that changes in the undo entry is the selection data), a cache is used.
-        if self.bol_hash not in UndoEntry._cache:
-            self._cache_entry = UndoEntry._UndoCacheEntry(bol_document, enemy_path_data)
-            UndoEntry._cache[self.bol_hash] = self._cache_entry
-        else:
-            self._cache_entry = UndoEntry._cache[self.bol_hash]
+class UndoEntry:
 
-        self.bol_document = self._cache_entry.bol_document
-        self.enemy_path_data = self._cache_entry.enemy_path_data
+    def __init__(self, document: DocumentVersion, bol_version: int,
+                 enemy_path_data: 'tuple[tuple[bool, int]]', minimap_data: tuple,
+                 selected_items_data: tuple):
+        self.bol_hash = hash((document.hash, enemy_path_data))
+
+        # When only the selection data changes, the document version is shared with the previous
+        # undo entry.
+        self.document = document
+        # Version stamp of the `BOL` instance that the document was serialized from.
+        self.bol_version = bol_version
+        self.enemy_path_data = enemy_path_data
         self.minimap_data = minimap_data
         self.selected_items_data = selected_items_data
 
@@ -166,8 +172,6 @@ class GenEditor(QtWidgets.QMainWindow):
         self.level_file = BOL()
         self.dolphin = Game()
 
-        self.undo_history: list[UndoEntry] = []
-        self.redo_history: list[UndoEntry] = []
         self.undo_history_disabled_count: int  = 0
 
         try:
@@ -178,8 +182,16 @@ class GenEditor(QtWidgets.QMainWindow):
 
         self.pathsconfig = self.configuration["default paths"]
         self.editorconfig = self.configuration["editor"]
+
+        undo_history_memory_budget = float(
+            self.editorconfig.get('undo_history_memory_budget', '256'))  # In MB.
+        self.undo_history = UndoHistory(int(undo_history_memory_budget * 1024 * 1024))
         self.current_gen_path = None
 
+        self.edit_journal = None
+        # Document state read from a journal for which the recovery has already been accepted.
+        self._accepted_edit_journal_recovery = None
+
         self.dolphin.show_target_enemy_path_points = self.editorconfig.get(
             'show_target_enemy_path_points', 'true') == 'true'
         self.dolphin.show_target_item_points = self.editorconfig.get('show_target_item_points',
@@ -232,7 +244,7 @@ class GenEditor(QtWidgets.QMainWindow):
         self.fullscreen.setChecked(
             bool(QtCore.Qt.WindowFullScreen & self.windowState()))
 
-        self.undo_history.append(self.generate_undo_entry())
+        self.undo_history.push(self.generate_undo_entry())
 
         self.leveldatatreeview.set_objects(self.level_file)
         self.leveldatatreeview.bound_to_group(self.level_file)
@@ -288,10 +300,15 @@ class GenEditor(QtWidgets.QMainWindow):
                 event.ignore()
                 return
 
+        # Changes have been saved or explicitly discarded; the journal is no longer needed.
+        self.close_edit_journal(delete=True)
+
         super().closeEvent(event)
 
     @catch_exception
     def reset(self):
+        self.close_edit_journal()
+
         self.next_checkpoint_start_position = None
         self.loaded_archive = None
         self.loaded_archive_file = None
@@ -328,7 +345,16 @@ class GenEditor(QtWidgets.QMainWindow):
                 self.setWindowTitle(f"{APP_NAME}")
 
     def generate_undo_entry(self) -> UndoEntry:
-        bol_document = self.level_file.to_bytes(extended_format=True)
+        current_undo_entry = self.undo_history.get_current()
+        if (current_undo_entry is not None
+                and current_undo_entry.bol_version == self.level_file.version):
+            # The document has not been modified since the current undo entry was generated; no
+            # need to serialize it again.
+            document = current_undo_entry.document
+        else:
+            document = DocumentVersion.create(
+                self.level_file.encode(extended_format=True),
+                current_undo_entry.document if current_undo_entry is not None else None)
 
         # List containing a tuple with the emptiness and ID of each of the enemy paths.
         enemy_paths = self.level_file.enemypointgroups.groups
@@ -355,49 +381,59 @@ class GenEditor(QtWidgets.QMainWindow):
             selected_items_data.append((SelectionHistorySpecials.MINIMAP_CORNER_1, ))
         if minimap.corner2 in self.level_view.selected_positions:
             selected_items_data.append((SelectionHistorySpecials.MINIMAP_CORNER_2, ))
-        for i, checkpoint_groups in enumerate(self.level_file.checkpoints.groups):
-            for j, checkpoint in enumerate(checkpoint_groups.points):
-                if checkpoint.start in self.level_view.selected_positions:
-                    selected_items_data.append((SelectionHistorySpecials.CHECKPOINT_START, i, j))
-                if checkpoint.end in self.level_view.selected_positions:
-                    selected_items_data.append((SelectionHistorySpecials.CHECKPOINT_END, i, j))
+        # Only the selected checkpoints are visited, as this runs on every input event.
+        selected_checkpoints = [
+            obj for obj in self.level_view.selected if isinstance(obj, libbol.Checkpoint)
+        ]
+        if selected_checkpoints:
+            checkpoint_indexes = {}
+            for i, checkpoint_group in enumerate(self.level_file.checkpoints.groups):
+                for j, checkpoint in enumerate(checkpoint_group.points):
+                    checkpoint_indexes[id(checkpoint)] = (i, j)
+            selected_position_ids = set(id(pos) for pos in self.level_view.selected_positions)
+            checkpoints_data = []
+            for checkpoint in selected_checkpoints:
+                indexes = checkpoint_indexes.get(id(checkpoint))
+                if indexes is None:
+                    continue
+                if id(checkpoint.start) in selected_position_ids:
+                    checkpoints_data.append((*indexes, SelectionHistorySpecials.CHECKPOINT_START))
+                if id(checkpoint.end) in selected_position_ids:
+                    checkpoints_data.append((*indexes, SelectionHistorySpecials.CHECKPOINT_END))
+            # Sorted in document order, with the start before the end of each checkpoint.
+            checkpoints_data.sort(key=lambda data: (data[0], data[1], -data[2]))
+            for i, j, special in checkpoints_data:
+                selected_items_data.append((special, i, j))
         selected_items_data = tuple(selected_items_data)
 
-        return UndoEntry(bol_document, enemy_path_data, minimap_data, selected_items_data)
+        return UndoEntry(document, self.level_file.version, enemy_path_data, minimap_data,
+                         selected_items_data)
 
-    def load_top_undo_entry(self):
-        if not self.undo_history:
+    def load_top_undo_entry(self, previous_undo_entry: 'UndoEntry | None' = None):
+        undo_entry = self.undo_history.get_current()
+        if undo_entry is None:
             return
 
-        current_undo_entry = self.generate_undo_entry()
-        undo_entry = self.undo_history[-1]
+        if (previous_undo_entry is not None
+                and previous_undo_entry.bol_version == self.level_file.version):
+            # The document still matches the entry that was current before the undo or redo.
+            current_undo_entry = previous_undo_entry
+        else:
+            current_undo_entry = self.generate_undo_entry()
 
         bol_changed = current_undo_entry.bol_hash != undo_entry.bol_hash
 
-        self.level_file = BOL.from_bytes(undo_entry.bol_document, extended_format=True)
-
-        # The BOL document cannot store information on empty enemy paths; this information is
-        # sourced from a separate list.
-        bol_enemy_paths = list(self.level_file.enemypointgroups.groups)
-        self.level_file.enemypointgroups.groups.clear()
-        enemy_path_data = undo_entry.enemy_path_data
-        for empty, enemy_path_id in enemy_path_data:
-            if empty:
-                empty_enemy_path = libbol.EnemyPointGroup()
-                empty_enemy_path.id = enemy_path_id
-                self.level_file.enemypointgroups.groups.append(empty_enemy_path)
-            else:
-                enemy_path = bol_enemy_paths.pop(0)
-                assert enemy_path.id == enemy_path_id
-                self.level_file.enemypointgroups.groups.append(enemy_path)
-
         # Clear existing selection.
         with QtCore.QSignalBlocker(self.leveldatatreeview):
             for item in self.leveldatatreeview.selectedItems():
                 item.setSelected(False)
 
-        self.level_view.level_file = self.level_file
-        self.leveldatatreeview.set_objects(self.level_file)
+        if bol_changed:
+            self.restore_undo_entry_document(current_undo_entry, undo_entry)
+
+        # The restored document matches the undo entry, which saves its serialization until the
+        # document is modified.
+        undo_entry.bol_version = self.level_file.version
 
         minimap = self.level_view.minimap
         minimap.corner1.x = undo_entry.minimap_data[0]
@@ -455,18 +491,43 @@ class GenEditor(QtWidgets.QMainWindow):
         if bol_changed:
             self.set_has_unsaved_changes(True)
             self.error_analyzer_button.analyze_bol(self.level_file)
+            self.record_edit_journal()
+
+    def restore_undo_entry_document(self, current_undo_entry: UndoEntry, undo_entry: UndoEntry):
+        """
+        Brings the document from the state in `current_undo_entry` to the state in `undo_entry`.
+
+        Only the sections that differ between the two entries are replaced, in the document and in
+        the tree view; objects in the remaining sections keep their identity.
+        """
+        chunks = undo_entry.document.get_chunks()
+        current_chunks = current_undo_entry.document.get_chunks()
+        sections = set(section for section in range(libbol.ENEMYITEMPOINT, libbol.MINIGAME + 1)
+                       if chunks[section] != current_chunks[section])
+        if undo_entry.enemy_path_data != current_undo_entry.enemy_path_data:
+            sections.add(libbol.ENEMYITEMPOINT)
+
+        bol = BOL.from_bytes(b''.join(chunks), extended_format=True)
+        sections = self.level_file.update_sections(bol, sections)
+
+        if libbol.ENEMYITEMPOINT in sections:
+            restore_empty_enemy_paths(self.level_file, undo_entry.enemy_path_data)
+
+        self.leveldatatreeview.update_sections(self.level_file, sections)
 
     def on_undo_action_triggered(self):
-        if len(self.undo_history) > 1:
-            self.redo_history.insert(0, self.undo_history.pop())
+        if self.undo_history.can_undo():
+            previous_undo_entry = self.undo_history.get_current()
+            self.undo_history.undo()
             self.update_undo_redo_actions()
-            self.load_top_undo_entry()
+            self.load_top_undo_entry(previous_undo_entry)
 
     def on_redo_action_triggered(self):
-        if self.redo_history:
-            self.undo_history.append(self.redo_history.pop(0))
+        if self.undo_history.can_redo():
+            previous_undo_entry = self.undo_history.get_current()
+            self.undo_history.redo()
             self.update_undo_redo_actions()
-            self.load_top_undo_entry()
+            self.load_top_undo_entry(previous_undo_entry)
 
     def on_document_potentially_changed(self, update_unsaved_changes=True):
         # Early out if undo history is temporarily disabled.
@@ -475,24 +536,26 @@ class GenEditor(QtWidgets.QMainWindow):
 
         undo_entry = self.generate_undo_entry()
 
-        if self.undo_history[-1] != undo_entry:
-            bol_changed = self.undo_history[-1].bol_hash != undo_entry.bol_hash
+        current_undo_entry = self.undo_history.get_current()
+        if current_undo_entry != undo_entry:
+            bol_changed = current_undo_entry.bol_hash != undo_entry.bol_hash
 
-            self.undo_history.append(undo_entry)
-            self.redo_history.clear()
+            self.undo_history.push(undo_entry)
             self.update_undo_redo_actions()
 
             if bol_changed:
                 if update_unsaved_changes:
                     self.set_has_unsaved_changes(True)
 
+                self.record_edit_journal()
+
                 self.error_analyzer_button.analyze_bol(self.level_file)
 
                 self.action_update_data_editor_label()
 
     def update_undo_redo_actions(self):
-        self.undo_action.setEnabled(len(self.undo_history) > 1)
-        self.redo_action.setEnabled(bool(self.redo_history))
+        self.undo_action.setEnabled(self.undo_history.can_undo())
+        self.redo_action.setEnabled(self.undo_history.can_redo())
 
     @contextlib.contextmanager
     def undo_history_disabled(self):
@@ -1120,6 +1183,8 @@ class GenEditor(QtWidgets.QMainWindow):
         show_target_item_points_action.triggered[bool].connect(show_target_item_points)
 
         if self.editorconfig.get('debug_ui'):
+            libbol.CHECK_ENCODED_SECTIONS = True
+
             self.debug_menu = self.menubar.addMenu('Debug')
 
             self.profile_action = self.debug_menu.addAction('Start Profiling')
@@ -1127,6 +1192,21 @@ class GenEditor(QtWidgets.QMainWindow):
             self.profile_action.triggered.connect(self.action_profile_start_stop)
             self.profile = None
 
+            render_statistics_action = self.debug_menu.addAction('Print Render Scheduler Statistics')
+            render_statistics_action.triggered.connect(
+                lambda: print(self.level_view.render_scheduler.format_statistics()))
+
+            self.debug_menu.addSeparator()
+
+            frame_profiler_overlay_action = self.debug_menu.addAction('Show Frame Profiler Overlay')
+            frame_profiler_overlay_action.setCheckable(True)
+            frame_profiler_overlay_action.triggered[bool].connect(
+                self.action_frame_profiler_overlay)
+
+            self.frame_profiler_log_action = self.debug_menu.addAction('Log Frame Profile...')
+            self.frame_profiler_log_action.setCheckable(True)
+            self.frame_profiler_log_action.triggered[bool].connect(self.action_frame_profiler_log)
+
         help_menu = self.menubar.addMenu('Help')
         about_action = help_menu.addAction('About')
         about_action.triggered.connect(self._open_about_dialog)
@@ -1145,6 +1225,7 @@ class GenEditor(QtWidgets.QMainWindow):
         else:
             # If successful, let it reconnect quietly from now on.
             self.dolphin.autoconnect = True
+            self.level_view.render_scheduler.request_tick()
 
     def action_profile_start_stop(self):
         if self.profile is None:
@@ -1174,6 +1255,29 @@ class GenEditor(QtWidgets.QMainWindow):
         self.profile = None
         self.profile_action.setText('Start Profiling')
 
+    def action_frame_profiler_overlay(self, checked: bool):
+        self.level_view.frame_profiler.show_overlay = checked
+        self.level_view.do_redraw()
+
+    def action_frame_profiler_log(self, checked: bool):
+        frame_profiler = self.level_view.frame_profiler
+
+        if not checked:
+            frame_profiler.stop_log()
+            return
+
+        filepath, _choosentype = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Log Frame Profile", self.pathsconfig["bol"],
+            "CSV (*.csv);;JSON (*.json);;All files (*)")
+        if not filepath:
+            self.frame_profiler_log_action.setChecked(False)
+            return
+
+        # The log holds the frames in the rolling window of the profiler, and is rewritten
+        # periodically until logging is stopped.
+        frame_profiler.start_log(filepath)
+        self.level_view.do_redraw()
+
     def _open_about_dialog(self):
         license_url = 'https://github.com/RenolY2/mkdd-track-editor/blob/master/LICENSE'
         updates_url = 'https://github.com/RenolY2/mkdd-track-editor/releases'
@@ -1446,7 +1550,7 @@ class GenEditor(QtWidgets.QMainWindow):
             self.collision_area_dialog = None
 
         collision_model = self.level_view.alternative_mesh
-        colltypes = tuple(sorted(collision_model.meshes))
+        colltypes = tuple(sorted(collision_model.draw_ranges))
 
         colltypegroups = {}
         for colltype in colltypes:
@@ -1759,6 +1863,7 @@ class GenEditor(QtWidgets.QMainWindow):
             if hasattr(obj, 'hidden'):
                 obj.hidden = False
                 obj.widget.update_name()
+        self.level_file.mark_dirty()
         self.update_3d()
 
     def on_hide_selected_action_triggered(self):
@@ -1769,6 +1874,7 @@ class GenEditor(QtWidgets.QMainWindow):
                 obj.widget.update_name()
                 hidden += 1
         if hidden:
+            self.level_file.mark_objects_dirty(self.level_view.selected)
             self.level_view.selected = []
             self.level_view.selected_positions = []
             self.level_view.selected_rotations = []
@@ -1781,6 +1887,7 @@ class GenEditor(QtWidgets.QMainWindow):
             if hasattr(obj, 'hidden') and obj not in selected:
                 obj.hidden = True
                 obj.widget.update_name()
+        self.level_file.mark_dirty()
         self.update_3d()
 
     def on_apply_current_view_action_triggered(self):
@@ -1796,6 +1903,7 @@ class GenEditor(QtWidgets.QMainWindow):
             -self.level_view.camera_horiz,
             self.level_view.camera_vertical,
         )
+        self.level_file.mark_objects_dirty([target_object])
 
         self.level_view.gizmo.move_to_average(self.level_view.selected_positions,
                                               self.level_view.selected_rotations)
@@ -1954,6 +2062,7 @@ class GenEditor(QtWidgets.QMainWindow):
         new_group.prevlinks = [group.grouplink, -1, -1, -1]
         new_group.nextlinks = deepcopy(group.nextgroup)
         group.nextgroup = [new_group.grouplink, -1, -1, -1]
+        self.level_file.mark_dirty(libbol.CHECKPOINT)
 
         self.leveldatatreeview.set_objects(self.level_file)
         self.update_3d()
@@ -1978,6 +2087,7 @@ class GenEditor(QtWidgets.QMainWindow):
         group.remove_after(point)
 
         group.points[-1].link = new_group.points[0].link = new_link
+        self.level_file.mark_dirty(libbol.ENEMYITEMPOINT)
 
         self.leveldatatreeview.set_objects(self.level_file)
         self.update_3d()
@@ -1989,6 +2099,7 @@ class GenEditor(QtWidgets.QMainWindow):
             new_id = len(self.level_file.enemypointgroups.groups)
             new_group = group.copy_group(new_id)
             self.level_file.enemypointgroups.groups.append(new_group)
+            self.level_file.mark_dirty(libbol.ENEMYITEMPOINT)
 
             self.leveldatatreeview.set_objects(self.level_file)
             self.update_3d()
@@ -2006,6 +2117,7 @@ class GenEditor(QtWidgets.QMainWindow):
             group.points.reverse()
         elif isinstance(group, libbol.Route):
             group.points.reverse()
+        self.level_file.mark_objects_dirty([group])
 
         self.leveldatatreeview.set_objects(self.level_file)
         self.update_3d()
@@ -2206,7 +2318,7 @@ class GenEditor(QtWidgets.QMainWindow):
                         bol_file = self.loaded_archive[root_name + "/" + coursename]
                         bol_data = BOL.from_file(bol_file)
                         self.setup_bol_file(bol_data, filepath, update_config)
-                        self.leveldatatreeview.set_objects(bol_data)
+                        self.leveldatatreeview.set_objects(self.level_file)
                         self.current_gen_path = filepath
                         self.loaded_archive_file = coursename
                 except Exception as error:
@@ -2250,7 +2362,7 @@ class GenEditor(QtWidgets.QMainWindow):
                     with open(filepath, "rb") as f:
                         bol_file = BOL.from_file(f)
                         self.setup_bol_file(bol_file, filepath, update_config)
-                        self.leveldatatreeview.set_objects(bol_file)
+                        self.leveldatatreeview.set_objects(self.level_file)
                         self.current_gen_path = filepath
                 except Exception as error:
                     print("Error appeared while loading:", error)
@@ -2382,7 +2494,7 @@ class GenEditor(QtWidgets.QMainWindow):
         with open(filepath, "rb") as f:
             bol_file = BOL.from_file(f)
             self.setup_bol_file(bol_file, filepath)
-            self.leveldatatreeview.set_objects(bol_file)
+            self.leveldatatreeview.set_objects(self.level_file)
             self.current_gen_path = filepath
 
         if not filepath.endswith('_course.bol'):
@@ -2433,7 +2545,7 @@ class GenEditor(QtWidgets.QMainWindow):
                 bol_file = self.loaded_archive[root_name + "/" + coursename]
                 bol_data = BOL.from_file(bol_file)
                 self.setup_bol_file(bol_data, filepath)
-                self.leveldatatreeview.set_objects(bol_data)
+                self.leveldatatreeview.set_objects(self.level_file)
                 self.current_gen_path = filepath
                 self.loaded_archive_file = coursename
             except:
@@ -2481,6 +2593,13 @@ class GenEditor(QtWidgets.QMainWindow):
         QtCore.QTimer.singleShot(0, self.update_3d)
 
     def setup_bol_file(self, bol_file, filepath, update_config=True):
+        self.close_edit_journal()
+
+        original_bol_file = bol_file
+        recovered_bol_file = self.recover_edit_journal(filepath)
+        if recovered_bol_file is not None:
+            bol_file = recovered_bol_file
+
         self.level_file = bol_file
         self.level_view.level_file = self.level_file
         self.level_view.do_redraw()
@@ -2496,6 +2615,112 @@ class GenEditor(QtWidgets.QMainWindow):
             save_cfg(self.configuration)
         self.current_gen_path = filepath
 
+        if recovered_bol_file is not None:
+            self.open_edit_journal(filepath, original_bol_file)
+            self.set_has_unsaved_changes(True)
+        else:
+            self.open_edit_journal(filepath)
+
+    def open_edit_journal(self, filepath, base_bol_file=None):
+        self.close_edit_journal()
+        self.edit_journal = EditJournal(get_journal_filepath(filepath))
+        if base_bol_file is not None:
+            # Recovered changes are journaled against the document on disk, so that they can be
+            # recovered again.
+            enemy_path_data = tuple(
+                (not path.points, path.id) for path in base_bol_file.enemypointgroups.groups)
+            self.edit_journal.record(
+                DocumentVersion.create(base_bol_file.encode(extended_format=True)),
+                enemy_path_data)
+        self.record_edit_journal()
+
+    def close_edit_journal(self, delete=None):
+        """
+        Stops journaling the edits. Unless stated otherwise, the journal is only kept if there are
+        unsaved changes, so that they can be recovered later.
+        """
+        if self.edit_journal is not None:
+            if delete is None:
+                delete = not self._user_made_change
+            self.edit_journal.close(delete=delete)
+            self.edit_journal = None
+
+    def reset_edit_journal(self):
+        if self.edit_journal is not None:
+            self.edit_journal.reset()
+            self.record_edit_journal()
+
+    def record_edit_journal(self):
+        if self.edit_journal is not None:
+            undo_entry = self.undo_history.get_current()
+            self.edit_journal.record(undo_entry.document, undo_entry.enemy_path_data)
+
+    def ask_edit_journal_recovery(self, filepath, allow_postpone=False) -> bool:
+        """
+        Offers to recover the unsaved changes found in the journal of the given file, if any.
+        Returns whether the recovery was accepted; if discarded, the journal is deleted.
+        """
+        journal_filepath = get_journal_filepath(filepath)
+        if not os.path.isfile(journal_filepath):
+            return False
+        state = read_journal(journal_filepath)
+        if state is None:
+            return False
+
+        msgbox = QtWidgets.QMessageBox(self)
+        size = self.fontMetrics().height() * 3
+        msgbox.setIconPixmap(QtGui.QIcon('resources/warning.svg').pixmap(size, size))
+        msgbox.setWindowTitle("Unsaved Changes")
+        msgbox.setText(f'Unsaved changes to "{filepath}" from a previous session were found.\n\n'
+                       'Would you like to recover them?')
+        if allow_postpone:
+            msgbox.addButton('Not Now', QtWidgets.QMessageBox.RejectRole)
+        discard_button = msgbox.addButton('Discard', QtWidgets.QMessageBox.DestructiveRole)
+        recover_button = msgbox.addButton('Recover', QtWidgets.QMessageBox.AcceptRole)
+        msgbox.exec()
+        if msgbox.clickedButton() == recover_button:
+            self._accepted_edit_journal_recovery = (filepath, state)
+            return True
+        if msgbox.clickedButton() == discard_button:
+            try:
+                os.remove(journal_filepath)
+            except OSError:
+                pass
+        return False
+
+    def recover_edit_journal(self, filepath) -> 'BOL | None':
+        """
+        Returns the document recovered from the journal of the given file, if the user accepts it.
+        """
+        if (self._accepted_edit_journal_recovery is None
+                or self._accepted_edit_journal_recovery[0] != filepath):
+            self._accepted_edit_journal_recovery = None
+            if not self.ask_edit_journal_recovery(filepath):
+                return None
+
+        _filepath, (chunks, enemy_path_data) = self._accepted_edit_journal_recovery
+        self._accepted_edit_journal_recovery = None
+
+        try:
+            bol = BOL.from_bytes(b''.join(chunks), extended_format=True)
+            restore_empty_enemy_paths(bol, enemy_path_data)
+        except Exception as error:
+            traceback.print_exc()
+            open_error_dialog(f'Unsaved changes could not be recovered: {error}', self)
+            return None
+
+        return bol
+
+    def check_edit_journals(self):
+        """
+        Offers to open the recent files for which unsaved changes were left in a journal (e.g. if
+        the editor crashed).
+        """
+        for filepath in self.get_recent_files_list():
+            if self.ask_edit_journal_recovery(filepath, allow_postpone=True):
+                self.button_load_level(filepath)
+                return
+
     @catch_exception_with_dialog
     def button_save_level(self, *args, **kwargs):
         if self.current_gen_path is not None:
@@ -2508,7 +2733,7 @@ class GenEditor(QtWidgets.QMainWindow):
                 file = self.loaded_archive[root_name + "/" + self.loaded_archive_file]
                 file.seek(0)
 
-                self.level_file.write(file)
+                self.level_file.write(file, use_cache=False)
 
                 with open(self.current_gen_path, "wb") as f:
                     self.loaded_archive.write_arc(f)
@@ -2518,10 +2743,12 @@ class GenEditor(QtWidgets.QMainWindow):
 
             else:
                 with open(self.current_gen_path, "wb") as f:
-                    self.level_file.write(f)
+                    self.level_file.write(f, use_cache=False)
                     self.set_has_unsaved_changes(False)
 
                     self.statusbar.showMessage("Saved to {0}".format(self.current_gen_path))
+
+            self.reset_edit_journal()
         else:
             self.button_save_level_as()
 
@@ -2557,7 +2784,7 @@ class GenEditor(QtWidgets.QMainWindow):
                 file = self.loaded_archive[root_name + "/" + self.loaded_archive_file]
                 file.seek(0)
 
-                self.level_file.write(file)
+                self.level_file.write(file, use_cache=False)
 
                 with open(filepath, "wb") as f:
                     self.loaded_archive.write_arc(f)
@@ -2566,7 +2793,7 @@ class GenEditor(QtWidgets.QMainWindow):
                 self.statusbar.showMessage("Saved to {0}".format(filepath))
             else:
                 with open(filepath, "wb") as f:
-                    self.level_file.write(f)
+                    self.level_file.write(f, use_cache=False)
 
                     self.set_has_unsaved_changes(False)
 
@@ -2576,6 +2803,9 @@ class GenEditor(QtWidgets.QMainWindow):
             if modify_current_path:
                 self.current_gen_path = filepath
                 self.set_base_window_title(filepath)
+                self.open_edit_journal(filepath)
+            else:
+                self.reset_edit_journal()
 
             self.statusbar.showMessage("Saved to {0}".format(filepath))
 
@@ -2972,6 +3202,7 @@ class GenEditor(QtWidgets.QMainWindow):
 
             self.level_file.cameras.insert(index, placeobject)
 
+        self.level_file.mark_dirty()
         self.level_view.do_redraw()
         self.leveldatatreeview.set_objects(self.level_file)
         self.set_has_unsaved_changes(True)
@@ -2992,6 +3223,7 @@ class GenEditor(QtWidgets.QMainWindow):
                 break
 
         target_list.insert(index, obj)
+        self.level_file.mark_dirty()
 
         self.leveldatatreeview.set_objects(self.level_file)
         self.select_tree_item_bound_to([obj])
@@ -3081,6 +3313,7 @@ class GenEditor(QtWidgets.QMainWindow):
             pos.x += deltax
             pos.y += deltay
             pos.z += deltaz
+        self.level_file.mark_objects_dirty(self.level_view.selected)
 
         self.level_view.gizmo.move_to_average(self.level_view.selected_positions,
                                               self.level_view.selected_rotations)
@@ -3103,6 +3336,7 @@ class GenEditor(QtWidgets.QMainWindow):
 
             self.level_view.gizmo.move_to_average(self.level_view.selected_positions,
                                                   self.level_view.selected_rotations)
+        self.level_file.mark_objects_dirty(self.level_view.selected)
         self.level_view.do_redraw()
         self.pik_control.update_info()
         self.set_has_unsaved_changes(True)
@@ -3148,6 +3382,9 @@ class GenEditor(QtWidgets.QMainWindow):
             elif event.key() == QtCore.Qt.Key_E:
                 self.level_view.MOVE_DOWN = 1
 
+            # Movement keys start an animation.
+            self.level_view.render_scheduler.request_tick()
+
     def keyReleaseEvent(self, event: QtGui.QKeyEvent):
         if event.isAutoRepeat():
             return
@@ -3226,6 +3463,7 @@ class GenEditor(QtWidgets.QMainWindow):
                         position.x = middle.x + length * sin(angle)
                         position.y = middle.y + length * cos(angle)
 
+        self.level_file.mark_objects_dirty(self.level_view.selected)
         self.level_view.do_redraw()
         self.set_has_unsaved_changes(True)
         self.pik_control.update_info()
@@ -3237,13 +3475,25 @@ class GenEditor(QtWidgets.QMainWindow):
         if not self.can_ground_objects():
             return
 
-        for pos in objects or self.level_view.selected_positions:
-            if self.level_view.collision is None:
-                return None
-            height = self.level_view.collision.collide_ray_closest(pos.x, pos.z, pos.y)
+        if self.level_view.collision is None:
+            return
 
-            if height is not None:
+        positions = objects or self.level_view.selected_positions
+        heights = self.level_view.collision.collide_rays_closest([(pos.x, pos.y, pos.z)
+                                                                  for pos in positions])
+        grounded_positions = set()
+        for pos, height in zip(positions, heights.tolist()):
+            if not isnan(height):
                 pos.y = height
+                grounded_positions.add(id(pos))
+
+        # Only the objects that hold a grounded position are marked as modified.
+        candidates = self.level_view.selected if not objects else self.level_file.get_all_objects()
+        self.level_file.mark_objects_dirty([
+            obj for obj in candidates
+            if any(id(getattr(obj, attribute, None)) in grounded_positions
+                   for attribute in ('position', 'position2', 'position3', 'start', 'end'))
+        ])
 
         self.pik_control.update_info()
         self.level_view.gizmo.move_to_average(self.level_view.selected_positions,
@@ -3328,6 +3578,7 @@ class GenEditor(QtWidgets.QMainWindow):
                 self.level_file.lightparams.remove(obj)
             elif isinstance(obj, libbol.MGEntry):
                 self.level_file.mgentries.remove(obj)
+        self.level_file.mark_dirty()
         self.level_view.selected = []
         self.level_view.selected_positions = []
         self.level_view.selected_rotations = []
@@ -3354,6 +3605,7 @@ class GenEditor(QtWidgets.QMainWindow):
             position.x = start_position.x + delta.x * (i + 1)
             position.y = start_position.y + delta.y * (i + 1)
             position.z = start_position.z + delta.z * (i + 1)
+        self.level_file.mark_objects_dirty(self.level_view.selected)
 
         self.pik_control.update_info()
         self.level_view.gizmo.move_to_average(self.level_view.selected_positions,
@@ -3395,6 +3647,7 @@ class GenEditor(QtWidgets.QMainWindow):
                 obj.widget = None
             if hasattr(obj, '__dict__'):
                 pending.extend(list(obj.__dict__.values()))
+            pending.extend(libbol.get_slot_values(obj))
             if isinstance(obj, list):
                 pending.extend(obj)
 
@@ -3640,7 +3893,7 @@ class GenEditor(QtWidgets.QMainWindow):
                 obj.id = self.level_file.enemypointgroups.new_group_id()
                 for point in obj.points:
                     point.link = -1
-                    point.group_id = obj.id
+                    point.group = obj.id
                 if target_enemy_path_index == -1:
                     self.level_file.enemypointgroups.groups.append(obj)
                 else:
@@ -3751,6 +4004,7 @@ class GenEditor(QtWidgets.QMainWindow):
 
             added.append(obj)
 
+        self.level_file.mark_dirty()
         if not added:
             return
 
@@ -4121,6 +4375,8 @@ if __name__ == "__main__":
                 editor_gui.load_file(args.load, additional=args.additional)
 
             QtCore.QTimer.singleShot(0, load)
+        else:
+            QtCore.QTimer.singleShot(0, editor_gui.check_edit_journals)
 
         err_code = app.exec()
 
@@ -15,11 +15,17 @@ from helper_functions import calc_zoom_in_factor, calc_zoom_out_factor
 from lib.collision import Collision
 from widgets.editor_widgets import catch_exception, catch_exception_with_dialog, check_checkpoints
 from lib.vectors import Vector3, Line, Plane
-from lib.model_rendering import CollisionModel, Grid, Minimap
+from lib.model_rendering import CollisionModel, Grid, Minimap, InstanceBuffer, build_instances
+from lib.polylines import PolylineBuffer
 from gizmo import Gizmo
 from lib.object_models import ObjectModels
+from lib.frame_profiler import FrameProfiler
+from lib.frustum import SIMPLIFIED, VISIBLE, FrustumCuller, get_lod_factor
+from lib.picking import PickingBuffer, decode_color_ids
+from lib.render_scheduler import RenderScheduler
 from editor_controls import UserControl
 from lib.libbol import BOL
+import lib.libbol_columns as libbol_columns
 from widgets import viewer_toolbar
 import numpy
 
@@ -31,6 +37,25 @@ MOUSE_MODE_INSERTION = 1
 MODE_TOPDOWN = 0
 MODE_3D = 1
 
+# Vertical field of view of the 3D view.
+FOV_Y = 75
+
+# Radius of the bounding sphere of the generic object model, including its direction lines.
+GENERIC_OBJECT_RADIUS = 1100.0
+# Radius of the bounding sphere of the largest enemy point flag cylinder.
+ENEMY_FLAG_RADIUS = 1600.0
+
+# Flags of the enemy points that are drawn as cylinders around them, with their color and size.
+ENEMY_POINT_FLAGS = (
+    ('itemsonly', (1.0, 0.5, 0.1), 1600),
+    ('driftdirection', (0.9, 0.0, 0.1), 1400),
+    ('driftacuteness', (0.1, 0.1, 1.0), 1200),
+    ('driftduration', (0.9, 0.9, 0.1), 1000),
+    ('swerve', (0.1, 0.9, 0.2), 800),
+    ('driftsupplement', (0.9, 0.0, 0.9), 600),
+    ('nomushroomzone', (0.1, 0.8, 1.0), 1800),
+)
+
 colors = [(0.0,191/255.0,255/255.0), (30/255.0,144/255.0,255/255.0), (0.0,0.0,255/255.0), (0.0,0.0,139/255.0)]
 lap_checkpoint_color = (115 / 255, 210 / 255, 22 / 255)
 
@@ -83,6 +108,9 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
         self.pick_texture = None
         self.pick_depth_texture = None
 
+        # Framebuffer with an integer ID attachment, used for picking objects in a single pass.
+        self.picking_buffer = PickingBuffer()
+
         self.setFocusPolicy(QtCore.Qt.ClickFocus)
 
         self.canvas_width, self.canvas_height = self.width(), self.height()
@@ -120,16 +148,22 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
         self.ctrl_is_pressed = False
         self.last_mouse_move = None
 
+        # The viewer is only ticked when input, document changes or animations need it.
         self.timer = QtCore.QTimer()
-        self.timer.setInterval(2)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
         self.timer.timeout.connect(self.render_loop)
-        self.timer.start()
+        self.render_scheduler = RenderScheduler(
+            lambda delay: self.timer.start(round(delay * 1000)))
         self._lastrendertime = 0
-        self._lasttime = 0
 
         self._frame_invalid = False
         self._mouse_pos_changed = False
 
+        # Stage timers and draw counters of paintGL(), shown on screen or logged to a file on
+        # demand (see the Debug menu).
+        self.frame_profiler = FrameProfiler(synchronize=glFinish)
+
         self.MOVE_UP = 0
         self.MOVE_DOWN = 0
         self.MOVE_LEFT = 0
@@ -181,6 +215,20 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
             self.gizmo = Gizmo.from_obj(f, rotate=True)
 
         self.models = ObjectModels()
+
+        # Route points, enemy points and checkpoints are drawn with one instanced draw call per
+        # category. The instances are only rebuilt when the document or the selection changes.
+        self.routepoint_instances = InstanceBuffer()
+        self.enemypoint_instances = InstanceBuffer()
+        self.checkpoint_instances = InstanceBuffer()
+        self.route_lines = PolylineBuffer()
+        self.enemypath_lines = PolylineBuffer()
+        self.enemyflag_instances = {
+            name: InstanceBuffer() for name, _color, _size in ENEMY_POINT_FLAGS
+        }
+        # Document version, and columns of the enemy points that have a flag.
+        self._enemyflag_points = None
+
         self.grid = None
         self.ground_display_list = None
 
@@ -233,6 +281,8 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                                    self.pick_depth_texture, 0)
             glBindFramebuffer(GL_FRAMEBUFFER, 0)
 
+        self.picking_buffer.init_gl(self.canvas_width, self.canvas_height)
+
     def resizeGL(self, width, height):
         # Called upon window resizing: reinitialize the viewport.
         # update the window size
@@ -252,6 +302,7 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
             glTexImage2D(GL_TEXTURE_2D, 0, GL_DEPTH_COMPONENT, width, height, 0, GL_DEPTH_COMPONENT,
                          GL_FLOAT, None)
             glBindTexture(GL_TEXTURE_2D, 0)
+        self.picking_buffer.resize(width, height)
 
     def focusInEvent(self, event: QtGui.QFocusEvent):
         super().focusInEvent(event)
@@ -267,6 +318,7 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
         self.editorconfig = config
         self._wasdscrolling_speed = config.getfloat("wasdscrolling_speed")
         self._wasdscrolling_speedupfactor = config.getfloat("wasdscrolling_speedupfactor")
+        self.render_scheduler.frame_budget = 1.0 / max(1, config.getint("max_fps", fallback=60))
         backgroundcolor = config["3d_background"].split(" ")
         self.backgroundcolor = (int(backgroundcolor[0])/255.0,
                                 int(backgroundcolor[1])/255.0,
@@ -334,27 +386,43 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
 
     @catch_exception
     def render_loop(self):
-        now = default_timer()
-
-        diff = now-self._lastrendertime
-        timedelta = now-self._lasttime
-
-        if self.mode == MODE_TOPDOWN:
-            self.handle_arrowkey_scroll(timedelta)
-        else:
-            self.handle_arrowkey_scroll_3d(timedelta)
-
-        self.logic(timedelta, diff)
+        timedelta = self.render_scheduler.begin_tick()
+        try:
+            now = default_timer()
 
-        if diff > 1 / 60.0:
-            check_gizmo_hover_id = self._mouse_pos_changed and self.should_check_gizmo_hover_id()
-            self._mouse_pos_changed = False
+            diff = now-self._lastrendertime
 
-            if self._frame_invalid or check_gizmo_hover_id:
-                self.update()
-                self._lastrendertime = now
-                self._frame_invalid = False
-        self._lasttime = now
+            if self.mode == MODE_TOPDOWN:
+                self.handle_arrowkey_scroll(timedelta)
+            else:
+                self.handle_arrowkey_scroll_3d(timedelta)
+
+            self.logic(timedelta, diff)
+
+            if self.render_scheduler.is_frame_due():
+                check_gizmo_hover_id = (self._mouse_pos_changed
+                                        and self.should_check_gizmo_hover_id())
+                self._mouse_pos_changed = False
+
+                if self._frame_invalid or check_gizmo_hover_id:
+                    self.update()
+                    self.render_scheduler.frame_started()
+                    self._lastrendertime = now
+                    self._frame_invalid = False
+        finally:
+            self.render_scheduler.end_tick(
+                frame_pending=self._frame_invalid or self._mouse_pos_changed,
+                update_interval=self.get_update_interval())
+
+    def get_update_interval(self):
+        """
+        Returns the interval (in seconds) at which the viewer needs to be ticked for its animations
+        (0 meaning every frame), or `None` if nothing is animated.
+        """
+        if any((self.MOVE_FORWARD, self.MOVE_BACKWARD, self.MOVE_LEFT, self.MOVE_RIGHT,
+                self.MOVE_UP, self.MOVE_DOWN)):
+            return 0.0
+        return self.dolphin.get_update_interval()
 
     def should_check_gizmo_hover_id(self):
         if self.gizmo.hidden or self.gizmo.was_hit_at_all:
@@ -394,10 +462,10 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
 
     def _get_snapping_points(self):
         if self.snapping_mode == SnappingMode.EDGE_CENTERS:
-            return self.collision.edge_centers
+            return self.collision.edge_center_snapping_points
         if self.snapping_mode == SnappingMode.FACE_CENTERS:
-            return self.collision.face_centers
-        return self.collision.vertices
+            return self.collision.face_center_snapping_points
+        return self.collision.vertex_snapping_points
 
     def handle_arrowkey_scroll(self, timedelta):
         if self.selectionbox_projected_coords is not None:
@@ -476,6 +544,7 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
         if force:
             self._lastrendertime = 0
             self.update()
+        self.render_scheduler.request_tick()
 
     def reset(self):
         self.highlight_colltype = None
@@ -505,22 +574,13 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
     def set_collision(self, verts, faces, alternative_mesh):
         self.alternative_mesh = alternative_mesh
 
-        triangles = []
-
         if isinstance(alternative_mesh, CollisionModel):
-            for v1, v2, v3 in alternative_mesh.get_visible_triangles():
-                v1 = Vector3(v1.x, v1.y, -v1.z)
-                v2 = Vector3(v2.x, v2.y, -v2.z)
-                v3 = Vector3(v3.x, v3.y, -v3.z)
-                triangles.append((v1, v2, v3))
+            self.collision = Collision(alternative_mesh.get_visible_triangles(),
+                                       alternative_mesh.get_visible_grid())
         else:
-            for v1i, v2i, v3i in faces:
-                v1 = Vector3(*verts[v1i[0] - 1])
-                v2 = Vector3(*verts[v2i[0] - 1])
-                v3 = Vector3(*verts[v3i[0] - 1])
-                triangles.append((v1, v2, v3))
-
-        self.collision = Collision(triangles)
+            # Face indices are 1-based.
+            face_indices = [(v1i[0] - 1, v2i[0] - 1, v3i[0] - 1) for v1i, v2i, v3i in faces]
+            self.collision = Collision.from_arrays(verts, face_indices)
 
     def set_mouse_mode(self, mode):
         assert mode in (MOUSE_MODE_NONE, MOUSE_MODE_INSERTION)
@@ -573,7 +633,298 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
 
         return res
 
+    def collect_selection_entries(self, vismenu, selected) -> 'list[ObjectSelectionEntry]':
+        """
+        Returns the entries of the selectable objects that are not in `selected`. The ID of the
+        N-th position (0 to 2) of the I-th entry is `I * 4 + N`.
+        """
+        objlist = []
+
+        if (self.minimap is not None and vismenu.minimap.is_selectable()
+                and self.minimap.is_available() and self.minimap not in selected):
+            objlist.append(
+                ObjectSelectionEntry(obj=self.minimap,
+                                     pos1=self.minimap.corner1,
+                                     pos2=self.minimap.corner2,
+                                     pos3=None,
+                                     rotation=None)
+            )
+
+        self.dolphin.add_selection_entries(objlist, ObjectSelectionEntry, selected)
+
+        if vismenu.enemyroute.is_selectable():
+            for obj in self.level_file.enemypointgroups.points():
+                if not obj.hidden and obj not in selected:
+                    objlist.append(
+                        ObjectSelectionEntry(obj=obj,
+                                             pos1=obj.position,
+                                             pos2=None,
+                                             pos3=None,
+                                             rotation=None)
+                    )
+
+        selectable_objectroutes = vismenu.objectroutes.is_selectable()
+        selectable_cameraroutes = vismenu.cameraroutes.is_selectable()
+        selectable_unassignedroutes = vismenu.unassignedroutes.is_selectable()
+
+        if selectable_objectroutes or selectable_cameraroutes or selectable_unassignedroutes:
+            camera_routes = set(camera.route for camera in self.level_file.cameras)
+            object_routes = set(obj.route for obj in self.level_file.objects.objects)
+            assigned_routes = camera_routes.union(object_routes)
+            for route in self.level_file.routes:
+                if (not ((route in object_routes and selectable_objectroutes) or
+                         (route in camera_routes and selectable_cameraroutes) or
+                         (route not in assigned_routes and selectable_unassignedroutes))):
+                    continue
+                for obj in route.points:
+                    if obj.hidden:
+                        continue
+                    if obj in selected:
+                        continue
+                    objlist.append(
+                        ObjectSelectionEntry(obj=obj,
+                                             pos1=obj.position,
+                                             pos2=None,
+                                             pos3=None,
+                                             rotation=None))
+
+        if vismenu.checkpoints.is_selectable():
+            for obj in self.level_file.objects_with_2positions():
+                if not obj.hidden and obj not in selected:
+                    objlist.append(
+                        ObjectSelectionEntry(obj=obj,
+                                             pos1=obj.start,
+                                             pos2=obj.end,
+                                             pos3=None,
+                                             rotation=None))
+
+        if vismenu.cameras.is_selectable():
+            for obj in self.level_file.cameras:
+                if obj.hidden or obj.name == "para" or obj in selected:
+                    continue
+                if obj.camtype in (5, 6):
+                    objlist.append(
+                        ObjectSelectionEntry(obj=obj,
+                                             pos1=obj.position,
+                                             pos2=obj.position2,
+                                             pos3=obj.position3,
+                                             rotation=obj.rotation))
+                elif obj.camtype == 4:
+                    objlist.append(
+                        ObjectSelectionEntry(obj=obj,
+                                             pos1=obj.position,
+                                             pos2=None,
+                                             pos3=obj.position3,
+                                             rotation=obj.rotation))
+                else:
+                    objlist.append(
+                        ObjectSelectionEntry(obj=obj,
+                                             pos1=obj.position,
+                                             pos2=None,
+                                             pos3=None,
+                                             rotation=obj.rotation))
+
+        for is_selectable, collection in (
+                (vismenu.objects.is_selectable(), self.level_file.objects.objects),
+                (vismenu.kartstartpoints.is_selectable(), self.level_file.kartpoints.positions),
+                (vismenu.areas.is_selectable(), self.level_file.areas.areas),
+                (vismenu.respawnpoints.is_selectable(), self.level_file.respawnpoints)
+                ):
+            if not is_selectable:
+                continue
+
+            for obj in collection:
+                if not obj.hidden and obj not in selected:
+                    objlist.append(
+                        ObjectSelectionEntry(obj=obj,
+                                             pos1=obj.position,
+                                             pos2=None,
+                                             pos3=None,
+                                             rotation=obj.rotation))
+
+        return objlist
+
+    def render_selection_entries(self, objlist: 'list[ObjectSelectionEntry]'):
+        """
+        Renders the positions of the given entries with their IDs encoded in the color.
+        """
+        id = 0x100000
+
+        for i, entry in enumerate(objlist):
+            entry_id = id + i * 4
+            if entry.rotation is not None:
+                self.models.render_generic_position_rotation_colored_id(entry.pos1, entry.rotation,
+                                                                        entry_id)
+            else:
+                self.models.render_generic_position_colored_id(entry.pos1, entry_id)
+            if entry.pos2 is not None:
+                self.models.render_generic_position_colored_id(entry.pos2, entry_id + 1)
+            if entry.pos3 is not None:
+                self.models.render_generic_position_colored_id(entry.pos3, entry_id + 2)
+
+    def pick_projected_selection_entries(self, objlist: 'list[ObjectSelectionEntry]', x: int,
+                                         y: int, width: int, height: int) -> 'set[int]':
+        """
+        Returns the IDs of the positions of the given entries that, once projected with the
+        current model-view-projection matrix, fall in the given rectangle (in window coordinates).
+        Unlike rendered picking, the extent of the models is not taken into account.
+        """
+        coordinates = []
+        ids = []
+        for i, entry in enumerate(objlist):
+            for n, position in enumerate((entry.pos1, entry.pos2, entry.pos3)):
+                if position is not None:
+                    coordinates.append((position.x, -position.z, position.y, 1.0))
+                    ids.append(i * 4 + n)
+        if not coordinates:
+            return set()
+
+        clip_coordinates = numpy.array(coordinates) @ self.mvp_mat.T
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            ndc = clip_coordinates[:, :3] / clip_coordinates[:, 3:]
+        window_x = (ndc[:, 0] + 1.0) * 0.5 * self.canvas_width
+        window_y = (ndc[:, 1] + 1.0) * 0.5 * self.canvas_height
+        inside = ((x <= window_x) & (window_x < x + width)
+                  & (y <= window_y) & (window_y < y + height)
+                  & (numpy.abs(ndc[:, 2]) <= 1.0))
+
+        return set(numpy.array(ids)[inside].tolist())
+
+    def _build_routepoint_instances(self, routes, select_optimize):
+        positions = []
+        colors = []
+        states = []
+        for route, route_color in routes:
+            for point in route.points:
+                if point.hidden:
+                    continue
+                position = point.position
+                positions.append((position.x, position.y, position.z))
+                colors.append(route_color)
+                states.append(point in select_optimize)
+        return build_instances(positions, colors, states)
+
+    def _build_enemypoint_instances(self, select_optimize, active_element):
+        positions = []
+        states = []
+        for point in self.level_file.enemypointgroups.points():
+            if point.hidden:
+                continue
+            position = point.position
+            positions.append((position.x, position.y, position.z))
+            states.append(2 if point is active_element else point in select_optimize)
+        return build_instances(positions, self.models.enemypoint.color, states)
+
+    def _build_checkpoint_instances(self, selected_position_ids):
+        positions = []
+        colors = []
+        states = []
+        left_color = self.models.checkpointleft.color
+        right_color = self.models.checkpointright.color
+        for checkpoint in self.level_file.checkpoints.points():
+            if checkpoint.hidden:
+                continue
+            for position, color in ((checkpoint.start, left_color), (checkpoint.end, right_color)):
+                positions.append((position.x, position.y, position.z))
+                colors.append(color)
+                states.append(id(position) in selected_position_ids)
+        return build_instances(positions, colors, states)
+
+    @staticmethod
+    def _build_polylines(routes):
+        polylines = []
+        for route in routes:
+            positions = [(point.position.x, point.position.y, point.position.z)
+                         for point in route.points]
+            hidden = [point.hidden for point in route.points]
+            polylines.append((positions, hidden))
+        return polylines
+
+    def _update_enemyflag_instances(self, culler: 'FrustumCuller | None'):
+        """
+        Updates the instances of the enemy point flags. Flags outside of the view frustum are left
+        out; the instances are uploaded again only when the set of visible flags changes.
+        """
+        version = self.level_file.version
+        if self._enemyflag_points is None or self._enemyflag_points[0] != version:
+            points = self.level_file.enemypointgroups.points()
+            array = libbol_columns.EnemyPointColumns.from_points(points).array
+            flagged = numpy.zeros(len(array), dtype=bool)
+            for name, _color, _size in ENEMY_POINT_FLAGS:
+                flagged |= array[name] != 0
+            self._enemyflag_points = (version, array[flagged & (array['hidden'] == 0)])
+        array = self._enemyflag_points[1]
+
+        if culler is not None:
+            # Flags are never simplified, and culling them saves instances rather than draws.
+            flag_lods = culler.classify(array['position'], ENEMY_FLAG_RADIUS, draws=0,
+                                        detailed=numpy.ones(len(array), dtype=bool))
+            visible = flag_lods == VISIBLE
+            array = array[visible]
+            key = (version, visible.tobytes())
+        else:
+            key = (version, None)
+
+        def build_flag_instances(name, color):
+            return build_instances(array['position'][array[name] != 0], (*color, 1.0), 0)
+
+        for name, color, _size in ENEMY_POINT_FLAGS:
+            self.enemyflag_instances[name].update(key, lambda: build_flag_instances(name, color))
+
+    def create_frustum_culler(self, campos: 'Vector3 | None') -> 'FrustumCuller | None':
+        """
+        Returns the culler for the current frame, or `None` if frustum culling is disabled. Level
+        of detail is only applied in the 3D view (i.e. when the camera position is given).
+        """
+        if not self.editorconfig.getboolean("frustum_culling", fallback=True):
+            return None
+        if campos is None:
+            return FrustumCuller(self.mvp_mat)
+        min_pixels = self.editorconfig.getfloat("lod_min_pixels", fallback=3.0)
+        lod_factor = get_lod_factor(FOV_Y, self.canvas_height, min_pixels)
+        return FrustumCuller(self.mvp_mat, (campos.x, campos.y, campos.z), lod_factor)
+
+    def classify_for_rendering(self, culler: 'FrustumCuller | None', objects, radii, draws=1,
+                               select_optimize=None) -> 'list[int]':
+        """
+        Returns the visibility (see `lib.frustum`) of each object, by the bounding sphere around its
+        position. Selected objects are never simplified.
+        """
+        objects = list(objects)
+        if culler is None:
+            return [VISIBLE] * len(objects)
+        positions = [(obj.position.x, obj.position.y, obj.position.z) for obj in objects]
+        if select_optimize:
+            detailed = numpy.array([obj in select_optimize for obj in objects], dtype=bool)
+        else:
+            detailed = None
+        return culler.classify(positions, radii, draws, detailed).tolist()
+
+    def render_object_markers(self, culler, modelname, objects, select_optimize, active_element,
+                              lod_points) -> int:
+        """
+        Renders the generic model of the given objects, and queues the simplified ones in
+        `lod_points`. Returns the number of objects rendered in full.
+        """
+        objects = [obj for obj in objects if not obj.hidden]
+        lods = self.classify_for_rendering(culler, objects, GENERIC_OBJECT_RADIUS, draws=2,
+                                           select_optimize=select_optimize)
+        color = getattr(self.models, modelname).bodycolor
+        drawn = 0
+        for obj, lod in zip(objects, lods):
+            if lod == VISIBLE:
+                selected_value = 2 if obj is active_element else obj in select_optimize
+                self.models.render_generic_position_rotation_colored(
+                    modelname, obj.position, obj.rotation, selected_value)
+                drawn += 1
+            elif lod == SIMPLIFIED:
+                lod_points.append((obj.position, color))
+        return drawn
+
     def paintGL(self):
+        profiler = self.frame_profiler
+        profiler.begin_frame()
+
         if self.mode == MODE_TOPDOWN:
             offset_x = self.offset_x
             offset_z = self.offset_z
@@ -613,7 +964,7 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                 camera_distance = (campos - collision_center).length()
                 far_plane = max(far_plane, camera_distance * 2.0)
 
-            gluPerspective(75, width / height, 256.0, far_plane)
+            gluPerspective(FOV_Y, width / height, 256.0, far_plane)
 
             glMatrixMode(GL_MODELVIEW)
             glLoadIdentity()
@@ -634,6 +985,9 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
         self.projectionmatrix = numpy.transpose(numpy.reshape(glGetFloatv(GL_PROJECTION_MATRIX), (4,4)))
         self.mvp_mat = numpy.dot(self.projectionmatrix, self.modelviewmatrix)
 
+        culler = self.create_frustum_culler(campos if self.mode == MODE_3D else None)
+        lod_points = []
+
         vismenu: FilterViewMenu = self.visibility_menu
 
         gizmo_enabled = self.editor.transform_gizmo.isChecked()
@@ -658,6 +1012,7 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
 
         gizmo_hover_id = 0xFF
         if gizmo_enabled and not self.selectionqueue and check_gizmo_hover_id:
+            profiler.begin_stage('gizmo_hover')
             self.gizmo.render_collision_check(gizmo_scale, is3d=self.mode == MODE_3D)
             mouse_pos = self.mapFromGlobal(QtGui.QCursor.pos())
             pixels = glReadPixels(mouse_pos.x(), self.canvas_height - mouse_pos.y(), 1, 1, GL_RGB, GL_UNSIGNED_BYTE)
@@ -667,6 +1022,9 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
             glClearColor(1.0, 1.0, 1.0, 1.0)
             glDisable(GL_TEXTURE_2D)
 
+        if self.selectionqueue:
+            profiler.begin_stage('picking')
+
         while len(self.selectionqueue) > 0:
             click_x, click_y, clickwidth, clickheight, shift_pressed, ctrl_pressed, do_gizmo = self.selectionqueue.pop()
             click_y = height - click_y
@@ -715,157 +1073,35 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
             selected_positions = []
             selected_rotations = []
 
-            continue_picking = not do_gizmo
-            while continue_picking:
-                glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-
-                id = 0x100000
-
-                objlist = []
-                offset = 0
-
-                if (self.minimap is not None and vismenu.minimap.is_selectable()
-                        and self.minimap.is_available() and self.minimap not in selected):
-                    objlist.append(
-                        ObjectSelectionEntry(obj=self.minimap,
-                                             pos1=self.minimap.corner1,
-                                             pos2=self.minimap.corner2,
-                                             pos3=None,
-                                             rotation=None)
-                    )
-                    self.models.render_generic_position_colored_id(self.minimap.corner1, id + (offset) * 4)
-                    self.models.render_generic_position_colored_id(self.minimap.corner2, id + (offset) * 4 + 1)
-                    offset = 1
-
-                self.dolphin.render_collision(self, objlist, ObjectSelectionEntry, selected)
-                offset = len(objlist)
-
-                if vismenu.enemyroute.is_selectable():
-                    for i, obj in enumerate(obj
-                                            for obj in self.level_file.enemypointgroups.points()
-                                            if not obj.hidden and obj not in selected):
-                        objlist.append(
-                            ObjectSelectionEntry(obj=obj,
-                                                 pos1=obj.position,
-                                                 pos2=None,
-                                                 pos3=None,
-                                                 rotation=None)
-                        )
-                        self.models.render_generic_position_colored_id(obj.position, id + (offset+i) * 4)
-
-                    offset = len(objlist)
-
-                selectable_objectroutes = vismenu.objectroutes.is_selectable()
-                selectable_cameraroutes = vismenu.cameraroutes.is_selectable()
-                selectable_unassignedroutes = vismenu.unassignedroutes.is_selectable()
-
-                if selectable_objectroutes or selectable_cameraroutes or selectable_unassignedroutes:
-                    camera_routes = set(camera.route for camera in self.level_file.cameras)
-                    object_routes = set(obj.route for obj in self.level_file.objects.objects)
-                    assigned_routes = camera_routes.union(object_routes)
-                    i = 0
-                    for route in self.level_file.routes:
-                        for obj in route.points:
-                            if obj.hidden:
-                                continue
-                            if obj in selected:
-                                continue
-                            if (not ((route in object_routes and selectable_objectroutes) or
-                                     (route in camera_routes and selectable_cameraroutes) or
-                                     (route not in assigned_routes and selectable_unassignedroutes))):
-                                continue
-                            objlist.append(
-                                ObjectSelectionEntry(obj=obj,
-                                                 pos1=obj.position,
-                                                 pos2=None,
-                                                 pos3=None,
-                                                 rotation=None))
-                            self.models.render_generic_position_colored_id(obj.position, id + (offset+i) * 4)
-                            i += 1
-
-                    offset = len(objlist)
-
-                if vismenu.checkpoints.is_selectable():
-                    for i, obj in enumerate(obj
-                                            for obj in self.level_file.objects_with_2positions()
-                                            if not obj.hidden and obj not in selected):
-                        objlist.append(
-                            ObjectSelectionEntry(obj=obj,
-                                             pos1=obj.start,
-                                             pos2=obj.end,
-                                             pos3=None,
-                                             rotation=None))
-                        self.models.render_generic_position_colored_id(obj.start, id+(offset+i)*4)
-                        self.models.render_generic_position_colored_id(obj.end, id+(offset+i)*4 + 1)
-
-                    offset = len(objlist)
-
-                if vismenu.cameras.is_selectable():
-                    for i, obj in enumerate(
-                            obj for obj in self.level_file.cameras
-                            if not obj.hidden and obj.name != "para" and obj not in selected):
-                        if obj.camtype in (5, 6):
-                            objlist.append(
-                                ObjectSelectionEntry(obj=obj,
-                                                     pos1=obj.position,
-                                                     pos2=obj.position2,
-                                                     pos3=obj.position3,
-                                                     rotation=obj.rotation))
-                            self.models.render_generic_position_rotation_colored_id(obj.position, obj.rotation,
-                                                                                    id + (offset + i) * 4)
-                            self.models.render_generic_position_colored_id(obj.position2, id + (offset + i) * 4 + 1)
-                            self.models.render_generic_position_colored_id(obj.position3, id + (offset + i) * 4 + 2)
-                        elif obj.camtype == 4:
-                            objlist.append(
-                                ObjectSelectionEntry(obj=obj,
-                                                     pos1=obj.position,
-                                                     pos2=None,
-                                                     pos3=obj.position3,
-                                                     rotation=obj.rotation))
-                            self.models.render_generic_position_rotation_colored_id(obj.position, obj.rotation,
-                                                                                    id + (offset + i) * 4)
-                            self.models.render_generic_position_colored_id(obj.position3, id + (offset + i) * 4 + 1)
-                        else:
-                            objlist.append(
-                                ObjectSelectionEntry(obj=obj,
-                                                     pos1=obj.position,
-                                                     pos2=None,
-                                                     pos3=None,
-                                                     rotation=obj.rotation))
-                            self.models.render_generic_position_rotation_colored_id(obj.position, obj.rotation,
-                                                                                    id + (offset + i) * 4)
-
-                    offset = len(objlist)
-
-                for is_selectable, collection in (
-                        (vismenu.objects.is_selectable(), self.level_file.objects.objects),
-                        (vismenu.kartstartpoints.is_selectable(), self.level_file.kartpoints.positions),
-                        (vismenu.areas.is_selectable(), self.level_file.areas.areas),
-                        (vismenu.respawnpoints.is_selectable(), self.level_file.respawnpoints)
-                        ):
-                    if not is_selectable:
-                        continue
-
-                    for i, obj in enumerate(obj for obj in collection if not obj.hidden and obj not in selected):
-                        objlist.append(
-                            ObjectSelectionEntry(obj=obj,
-                                                 pos1=obj.position,
-                                                 pos2=None,
-                                                 pos3=None,
-                                                 rotation=obj.rotation))
-                        self.models.render_generic_position_rotation_colored_id(obj.position, obj.rotation,
-                                                                                id + (offset + i) * 4)
-
-                    offset = len(objlist)
+            # When the integer-ID picking buffer is available, all the objects in a marquee
+            # selection are found in a single pass. Otherwise, objects are picked by their color,
+            # and a marquee selection needs a pass per layer of overlapping objects.
+            id_picking = self.picking_buffer.is_available()
 
-                pixels = glReadPixels(click_x, click_y, clickwidth, clickheight, GL_RGB, GL_UNSIGNED_BYTE)
+            # In top-down view, a marquee selection can be resolved by projecting the positions of
+            # the objects, without rendering them.
+            projected_picking = (marquee_selection and self.mode == MODE_TOPDOWN
+                                 and self.editorconfig.getboolean("projected_marquee_selection",
+                                                                  fallback=True))
 
-                indexes = set()
-                for i in range(0, clickwidth * clickheight):
-                    if pixels[i * 3] != 0xFF:
-                        upper = pixels[i * 3] & 0x0F
-                        index = (upper << 16) | (pixels[i * 3 + 1] << 8) | pixels[i * 3 + 2]
-                        indexes.add(index)
+            continue_picking = not do_gizmo
+            while continue_picking:
+                objlist = self.collect_selection_entries(vismenu, selected)
+
+                if projected_picking:
+                    indexes = self.pick_projected_selection_entries(objlist, click_x, click_y,
+                                                                    clickwidth, clickheight)
+                elif id_picking:
+                    self.picking_buffer.begin(click_x, click_y, clickwidth, clickheight,
+                                              marquee_selection)
+                    self.render_selection_entries(objlist)
+                    indexes = self.picking_buffer.end()
+                else:
+                    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+                    self.render_selection_entries(objlist)
+                    pixels = glReadPixels(click_x, click_y, clickwidth, clickheight, GL_RGB,
+                                          GL_UNSIGNED_BYTE)
+                    indexes = set(decode_color_ids(pixels).tolist())
 
                 for index in indexes:
                     entry: ObjectSelectionEntry = objlist[index // 4]
@@ -893,8 +1129,9 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                     selected[obj] = elements_exist
 
                 # In a marquee selection, if there was a selection, do another iteration for
-                # selecting potentially-overlapping objects.
-                continue_picking = marquee_selection and indexes
+                # selecting potentially-overlapping objects (unless they were all found already).
+                continue_picking = (marquee_selection and indexes
+                                    and not (id_picking or projected_picking))
 
             selected = list(selected)
 
@@ -970,6 +1207,8 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
         if use_pick_framebuffer:
             glBindFramebuffer(GL_FRAMEBUFFER, self.defaultFramebufferObject())
 
+        profiler.begin_stage('collision')
+
         glClearColor(*(self.backgroundcolor if self.mode == MODE_TOPDOWN else self.skycolor))
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         glEnable(GL_DEPTH_TEST)
@@ -1003,6 +1242,7 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
         glDisable(GL_TEXTURE_2D)
 
         if self.snapping_enabled and self.collision is not None:
+            profiler.begin_stage('snapping')
             snapping_hash = hash((self.snapping_mode, self.collision.hash))
             if self.snapping_last_hash != snapping_hash:
                 self.snapping_last_hash = snapping_hash
@@ -1025,13 +1265,14 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                 # Draw wireframe.
                 glColor4f(0.1, 0.1, 0.1, 0.3)
                 glBegin(GL_LINES)
-                for triangle in self.collision.triangles:
-                    glVertex3f(triangle.origin.x, triangle.origin.y, triangle.origin.z)
-                    glVertex3f(triangle.p2.x, triangle.p2.y, triangle.p2.z)
-                    glVertex3f(triangle.origin.x, triangle.origin.y, triangle.origin.z)
-                    glVertex3f(triangle.p3.x, triangle.p3.y, triangle.p3.z)
-                    glVertex3f(triangle.p2.x, triangle.p2.y, triangle.p2.z)
-                    glVertex3f(triangle.p3.x, triangle.p3.y, triangle.p3.z)
+                for x0, y0, z0, x1, y1, z1, x2, y2, z2 in self.collision.flat_triangles.reshape(
+                        -1, 9).tolist():
+                    glVertex3f(x0, y0, z0)
+                    glVertex3f(x1, y1, z1)
+                    glVertex3f(x0, y0, z0)
+                    glVertex3f(x2, y2, z2)
+                    glVertex3f(x1, y1, z1)
+                    glVertex3f(x2, y2, z2)
                 glEnd()
 
                 glBlendFunc(GL_ONE, GL_ZERO)
@@ -1042,24 +1283,20 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                 glPointSize(5)
                 glColor3f(0.0, 0.0, 0.0)
                 glBegin(GL_POINTS)
-                points = self._get_snapping_points()
+                points = self._get_snapping_points().positions
                 if self.mode == MODE_TOPDOWN:
                     clipheight = self.editorconfig.getint("topdown_cull_height")
-                    no_clip = False
-                else:
-                    clipheight = None
-                    no_clip = True
+                    points = points[points[:, 2] < clipheight]
+                points = points.tolist()
 
-                for point in points:
-                    if no_clip or point.z < clipheight:
-                        glVertex3f(point.x, point.y, point.z)
+                for x, y, z in points:
+                    glVertex3f(x, y, z)
                 glEnd()
                 glPointSize(3)
                 glColor3f(1.0, 1.0, 1.0)
                 glBegin(GL_POINTS)
-                for point in points:
-                    if no_clip or point.z < clipheight:
-                        glVertex3f(point.x, point.y, point.z)
+                for x, y, z in points:
+                    glVertex3f(x, y, z)
                 glEnd()
                 glPointSize(1)
 
@@ -1068,7 +1305,9 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                 glEndList()
 
             glCallList(self.snapping_display_list)
+            profiler.count('snapping', draws=1)
 
+        profiler.begin_stage('grid')
 
         if self.mode != MODE_TOPDOWN:
             glMatrixMode(GL_PROJECTION)
@@ -1097,6 +1336,7 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
         glEnable(GL_ALPHA_TEST)
         glAlphaFunc(GL_GEQUAL, 0.5)
 
+        profiler.begin_stage('dolphin')
         self.dolphin.render_visual(self, self.selected, zf if self.mode == MODE_TOPDOWN else campos)
 
         if self.level_file is not None:
@@ -1105,12 +1345,15 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
 
             select_optimize = set(selected)
             active_element = self.selected[-1] if self.selected else None
+            selection_key = (self.level_file.version, tuple(map(id, self.selected)),
+                             tuple(map(id, self.selected_positions)))
 
             visible_objectroutes = vismenu.objectroutes.is_visible()
             visible_cameraroutes = vismenu.cameraroutes.is_visible()
             visible_unassignedroutes = vismenu.unassignedroutes.is_visible()
 
             if visible_objectroutes or visible_cameraroutes or visible_unassignedroutes:
+                profiler.begin_stage('routes')
                 routes_to_highlight = set()
                 camera_routes = set()
                 object_routes = set()
@@ -1128,13 +1371,13 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                 assigned_routes = camera_routes.union(object_routes)
                 shared_routes = camera_routes.intersection(object_routes)
 
+                visible_routes = []
                 for route in self.level_file.routes:
                     if (not ((route in object_routes and visible_objectroutes) or
                              (route in camera_routes and visible_cameraroutes) or
                              (route not in assigned_routes and visible_unassignedroutes))):
                         continue
 
-                    selected = route in routes_to_highlight
                     route_color = "unassignedroute"
                     if route in shared_routes:
                         route_color = "sharedroute"
@@ -1142,41 +1385,41 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                         route_color = "objectroute"
                     elif route in camera_routes:
                         route_color = "cameraroute"
-                    for point in route.points:
-                        if point.hidden:
-                            continue
-                        point_selected = point in select_optimize
-                        self.models.render_generic_position_colored(point.position, point_selected, route_color)
-                        selected = selected or point_selected
-
-                    if selected:
-                        glLineWidth(3.0)
-                    glBegin(GL_LINE_STRIP)
-                    glColor3f(0.0, 0.0, 0.0)
-                    for point in route.points:
-                        if point.hidden:
-                            glEnd()
-                            glBegin(GL_LINE_STRIP)
-                            continue
-                        pos = point.position
-                        glVertex3f(pos.x, -pos.z, pos.y)
-                    glEnd()
-                    for i, point in enumerate(route.points[1:]):
-                        prev_point = route.points[i]
-                        if point.hidden or prev_point.hidden:
-                            continue
-                        mid_position = (point.position + prev_point.position) / 2.0
-                        if self.mode == MODE_TOPDOWN:
-                            scale = 3 * zf
-                            up_dir = Vector3(0.0, 1.0, 0.0)
-                        else:
-                            up_dir = (mid_position - campos).normalized()
-                            scale = (mid_position - campos).norm() / 130.0
-                        self.models.draw_arrow_head(prev_point.position, mid_position, up_dir, scale)
-                    if selected:
-                        glLineWidth(1.0)
+                    visible_routes.append((route, getattr(self.models, route_color).color))
+
+                self.routepoint_instances.update(
+                    (selection_key, visible_objectroutes, visible_cameraroutes,
+                     visible_unassignedroutes),
+                    lambda: self._build_routepoint_instances(visible_routes, select_optimize))
+                draw_count = self.models.draw_count
+                self.models.render_instanced_positions(self.routepoint_instances)
+                profiler.count('routepoints', draws=self.models.draw_count - draw_count,
+                               objects=len(self.routepoint_instances))
+
+                self.route_lines.update(
+                    (self.level_file.version, visible_objectroutes, visible_cameraroutes,
+                     visible_unassignedroutes),
+                    lambda: self._build_polylines(route for route, _color in visible_routes))
+                highlighted_routes = set()
+                for i, (route, _route_color) in enumerate(visible_routes):
+                    if route in routes_to_highlight or any(
+                            not point.hidden and point in select_optimize
+                            for point in route.points):
+                        highlighted_routes.add(i)
+
+                glColor3f(0.0, 0.0, 0.0)
+                draw_count = self.models.draw_count
+                if self.mode == MODE_TOPDOWN:
+                    self.models.render_polylines(self.route_lines, highlighted_routes,
+                                                 arrow_scale=3 * zf)
+                else:
+                    self.models.render_polylines(self.route_lines, highlighted_routes,
+                                                 camera=campos)
+                profiler.count('routes', draws=self.models.draw_count - draw_count,
+                               objects=len(visible_routes))
 
             if vismenu.enemyroute.is_visible():
+                profiler.begin_stage('enemy_paths')
                 enemypoints_to_highlight = set()
                 for respawn_point in self.level_file.respawnpoints:
                     if respawn_point not in select_optimize:
@@ -1185,8 +1428,20 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                     if next_enemy_point != -1:
                         enemypoints_to_highlight.add(next_enemy_point)
 
+                self.enemypoint_instances.update(
+                    selection_key,
+                    lambda: self._build_enemypoint_instances(select_optimize, active_element))
+                draw_count = self.models.draw_count
+                self.models.render_instanced_positions(self.enemypoint_instances)
+                profiler.count('enemypoints', draws=self.models.draw_count - draw_count,
+                               objects=len(self.enemypoint_instances))
+
+                draw_count = self.models.draw_count
+                # Draw calls made directly, rather than through the object models.
+                enemy_draws = 0
                 point_index = 0
-                for group in self.level_file.enemypointgroups.groups:
+                highlighted_groups = set()
+                for group_index, group in enumerate(self.level_file.enemypointgroups.groups):
                     if len(group.points) == 0:
                         continue
 
@@ -1207,49 +1462,10 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                             glColor3f(1.0, 1.0, 0.0)
                             self.models.draw_sphere(point.position, 600)
 
-                        selected_value = 2 if point is active_element else point in select_optimize
-                        self.models.render_generic_position_colored(point.position, selected_value,
-                                                                    "enemypoint")
-
-                        if point.itemsonly:
-                            glColor3f(1.0, 0.5, 0.1)
-                            self.models.draw_cylinder(point.position, 1600, 1600)
-                        if point.driftdirection:
-                            glColor3f(0.9, 0.0, 0.1)
-                            self.models.draw_cylinder(point.position, 1400, 1400)
-                        if point.driftacuteness:
-                            glColor3f(0.1, 0.1, 1.0)
-                            self.models.draw_cylinder(point.position, 1200, 1200)
-                        if point.driftduration:
-                            glColor3f(0.9, 0.9, 0.1)
-                            self.models.draw_cylinder(point.position, 1000, 1000)
-                        if point.swerve:
-                            glColor3f(0.1, 0.9, 0.2)
-                            self.models.draw_cylinder(point.position, 800, 800)
-                        if point.driftsupplement:
-                            glColor3f(0.9, 0.0, 0.9)
-                            self.models.draw_cylinder(point.position, 600, 600)
-                        if point.nomushroomzone:
-                            glColor3f(0.1, 0.8, 1.0)
-                            self.models.draw_cylinder(point.position, 1800, 1800)
-
                         point_index += 1
 
-                    # Draw the connections between each enemy point.
-                    if group_selected:
-                        glLineWidth(3.0)
-                    glBegin(GL_LINE_STRIP)
-                    glColor3f(0.0, 0.0, 0.0)
-                    for point in group.points:
-                        if point.hidden:
-                            glEnd()
-                            glBegin(GL_LINE_STRIP)
-                            continue
-                        pos = point.position
-                        glVertex3f(pos.x, -pos.z, pos.y)
-                    glEnd()
                     if group_selected:
-                        glLineWidth(1.0)
+                        highlighted_groups.add(group_index)
 
                     # Draw the connections between each enemy point group.
                     pointA = group.points[-1]
@@ -1276,10 +1492,30 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                             glVertex3f(pointA.position.x, -pointA.position.z, pointA.position.y)
                             glVertex3f(pointB.position.x, -pointB.position.z, pointB.position.y)
                             glEnd()
+                            enemy_draws += 1
                             if group_selected or groupB_selected:
                                 glLineWidth(1.0)
 
+                # Draw the connections between each enemy point.
+                self.enemypath_lines.update(
+                    self.level_file.version,
+                    lambda: self._build_polylines(self.level_file.enemypointgroups.groups))
+                glColor3f(0.0, 0.0, 0.0)
+                self.models.render_polylines(self.enemypath_lines, highlighted_groups,
+                                             arrows=False)
+
+                # Draw the flags of the enemy points, one batch per flag.
+                self._update_enemyflag_instances(culler)
+                for name, color, size in ENEMY_POINT_FLAGS:
+                    instances = self.enemyflag_instances[name]
+                    self.models.render_instanced_cylinders(instances, size, size)
+
+                enemy_draws += self.models.draw_count - draw_count
+                profiler.count('enemy_paths', draws=enemy_draws,
+                               objects=len(self.level_file.enemypointgroups.groups))
+
             if vismenu.checkpoints.is_visible():
+                profiler.begin_stage('checkpoints')
                 checkpoints_to_highlight = set()
                 section_points = set()
                 count = 0
@@ -1302,22 +1538,27 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                             concave_checkpoints.add(c1)
                             concave_checkpoints.add(c2)
 
+                selected_position_ids = set(map(id, positions))
+                self.checkpoint_instances.update(
+                    selection_key,
+                    lambda: self._build_checkpoint_instances(selected_position_ids))
+                draw_count = self.models.draw_count
+                self.models.render_instanced_positions(self.checkpoint_instances)
+                profiler.count('checkpointpoints', draws=self.models.draw_count - draw_count,
+                               objects=len(self.checkpoint_instances))
+
+                draw_count = self.models.draw_count
+                # Draw calls made directly, rather than through the object models.
+                checkpoint_draws = 0
                 for i, group in enumerate(self.level_file.checkpoints.groups):
                     prev = None
-                    # Draw the endpoints
                     for checkpoint in group.points:
                         if checkpoint.hidden:
                             continue
 
-                        start_point_selected = checkpoint.start in positions
-                        end_point_selected = checkpoint.end in positions
+                        start_point_selected = id(checkpoint.start) in selected_position_ids
+                        end_point_selected = id(checkpoint.end) in selected_position_ids
                         is_sectionpoint = checkpoint.unk4 != 0
-                        self.models.render_generic_position_colored(checkpoint.start,
-                                                                    start_point_selected,
-                                                                    "checkpointleft")
-                        self.models.render_generic_position_colored(checkpoint.end,
-                                                                    end_point_selected,
-                                                                    "checkpointright")
 
                         if start_point_selected or end_point_selected:
                             checkpoints_to_highlight.add(count)
@@ -1361,6 +1602,7 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                         prev = checkpoint
 
                     glEnd()
+                    checkpoint_draws += 1
 
                 for respawn_point in self.level_file.respawnpoints:
                     if respawn_point not in select_optimize:
@@ -1392,6 +1634,7 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                                 glVertex3f(pos1.x, -pos1.z, pos1.y)
                                 glVertex3f(pos2.x, -pos2.z, pos2.y)
                                 glEnd()
+                                checkpoint_draws += 1
                             point_index += 1
                     glLineWidth(1.0)
 
@@ -1433,6 +1676,9 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                             glVertex3f(mid2.x, -mid2.z, mid2.y)
                             prev = checkpoint
                 glEnd()
+                checkpoint_draws += 1 + self.models.draw_count - draw_count
+                profiler.count('checkpoints', draws=checkpoint_draws,
+                               objects=len(self.checkpoint_instances) // 2)
 
                 if self.editor.next_checkpoint_start_position is not None:
                     self.models.render_generic_position_colored(
@@ -1440,23 +1686,35 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                         "checkpointleft")
 
             if vismenu.objects.is_visible():
-                for object in self.level_file.objects.objects:
-                    if object.hidden:
-                        continue
-                    selected_value = 2 if object is active_element else object in select_optimize
-                    self.models.render_generic_position_rotation_colored(
-                        "objects", object.position, object.rotation, selected_value)
+                profiler.begin_stage('objects')
+                draw_count = self.models.draw_count
+                drawn = self.render_object_markers(culler, "objects",
+                                                   self.level_file.objects.objects, select_optimize,
+                                                   active_element, lod_points)
+                profiler.count('objects', draws=self.models.draw_count - draw_count,
+                               objects=drawn)
             if vismenu.kartstartpoints.is_visible():
-                for object in self.level_file.kartpoints.positions:
-                    if object.hidden:
-                        continue
-                    selected_value = 2 if object is active_element else object in select_optimize
-                    self.models.render_generic_position_rotation_colored(
-                        "startpoints", object.position, object.rotation, selected_value)
+                profiler.begin_stage('kartstartpoints')
+                draw_count = self.models.draw_count
+                drawn = self.render_object_markers(culler, "startpoints",
+                                                   self.level_file.kartpoints.positions,
+                                                   select_optimize, active_element, lod_points)
+                profiler.count('kartstartpoints', draws=self.models.draw_count - draw_count,
+                               objects=drawn)
             if vismenu.areas.is_visible():
-                for object in self.level_file.areas.areas:
-                    if object.hidden:
+                profiler.begin_stage('areas')
+                draw_count = self.models.draw_count
+                drawn = 0
+                areas = [area for area in self.level_file.areas.areas if not area.hidden]
+                radii = [(area.scale * 100).norm() for area in areas]
+                area_lods = self.classify_for_rendering(culler, areas, radii, draws=3,
+                                                        select_optimize=select_optimize)
+                for object, lod in zip(areas, area_lods):
+                    if lod == SIMPLIFIED:
+                        lod_points.append((object.position, self.models.areas.bodycolor))
+                    if lod != VISIBLE:
                         continue
+                    drawn += 1
                     selected_value = 2 if object is active_element else object in select_optimize
                     self.models.render_generic_position_rotation_colored(
                         "areas", object.position, object.rotation, selected_value)
@@ -1475,18 +1733,47 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                         scale = object.scale.copy()
                         scale.z = scale.x
                     draw_func(object.position, object.rotation, scale * 100)
+                profiler.count('areas', draws=self.models.draw_count - draw_count, objects=drawn)
 
             if vismenu.cameras.is_visible():
-                for object in self.level_file.cameras:
-                    if object.hidden:
-                        continue
-                    if object.name == "para":
-                        continue
-                    selected_value = 2 if object is active_element else object in select_optimize
-                    self.models.render_generic_position_rotation_colored(
-                        "camera", object.position, object.rotation, selected_value)
+                profiler.begin_stage('cameras')
+                draw_count = self.models.draw_count
+                drawn = 0
+                # Draw calls made directly, rather than through the object models.
+                camera_draws = 0
+                cameras = [
+                    camera for camera in self.level_file.cameras
+                    if not camera.hidden and camera.name != "para"
+                ]
+                camera_lods = self.classify_for_rendering(culler, cameras, GENERIC_OBJECT_RADIUS,
+                                                          draws=2, select_optimize=select_optimize)
+                # The target positions are culled separately, by the sphere that encloses both.
+                target_cameras = [camera for camera in cameras if camera.camtype in (4, 5, 6)]
+                if culler is not None and target_cameras:
+                    centers = [(camera.position2 + camera.position3) / 2
+                               for camera in target_cameras]
+                    radii = [(camera.position2 - camera.position3).norm() / 2 + 300
+                             for camera in target_cameras]
+                    target_lods = culler.classify(
+                        [(center.x, center.y, center.z) for center in centers], radii, draws=4,
+                        detailed=numpy.ones(len(target_cameras), dtype=bool))
+                    target_visible = {
+                        id(camera) for camera, lod in zip(target_cameras, target_lods)
+                        if lod == VISIBLE
+                    }
+                else:
+                    target_visible = set(map(id, target_cameras))
 
-                    if object.camtype in (4, 5, 6):
+                for object, lod in zip(cameras, camera_lods):
+                    selected_value = 2 if object is active_element else object in select_optimize
+                    if lod == VISIBLE:
+                        drawn += 1
+                        self.models.render_generic_position_rotation_colored(
+                            "camera", object.position, object.rotation, selected_value)
+                    elif lod == SIMPLIFIED:
+                        lod_points.append((object.position, self.models.camera.bodycolor))
+
+                    if id(object) in target_visible:
                         glColor3f(0.0, 1.0, 0.0)
                         self.models.draw_sphere(object.position3, 600, selected_value)
                         if object.camtype != 4:
@@ -1498,6 +1785,7 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                             glVertex3f(object.position3.x, -object.position3.z, object.position3.y)
                             glVertex3f(object.position2.x, -object.position2.z, object.position2.y)
                             glEnd()
+                            camera_draws += 1
 
                             midpoint = (object.position2 + object.position3) / 2
                             if self.mode == MODE_TOPDOWN:
@@ -1507,15 +1795,19 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                                 up_dir = (midpoint - campos).normalized()
                                 scale = (midpoint - campos).norm() / 130
                             self.models.draw_arrow_head(object.position3, midpoint, up_dir, scale)
+                camera_draws += self.models.draw_count - draw_count
+                profiler.count('cameras', draws=camera_draws, objects=drawn)
 
             if vismenu.respawnpoints.is_visible():
-                for object in self.level_file.respawnpoints:
-                    if object.hidden:
-                        continue
-                    selected_value = 2 if object is active_element else object in select_optimize
-                    self.models.render_generic_position_rotation_colored(
-                        "respawn", object.position, object.rotation, selected_value)
+                profiler.begin_stage('respawnpoints')
+                draw_count = self.models.draw_count
+                drawn = self.render_object_markers(culler, "respawn",
+                                                   self.level_file.respawnpoints, select_optimize,
+                                                   active_element, lod_points)
+                profiler.count('respawnpoints', draws=self.models.draw_count - draw_count,
+                               objects=drawn)
             if self.minimap is not None and self.minimap.is_available() and vismenu.minimap.is_visible():
+                profiler.begin_stage('minimap')
                 self.models.render_generic_position_colored(self.minimap.corner1,
                                                             self.minimap.corner1 in positions,
                                                             'minimap')
@@ -1523,7 +1815,22 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
                                                             self.minimap.corner2 in positions,
                                                             'minimap')
 
+        if culler is not None:
+            profiler.begin_stage('lod_points')
+            if lod_points:
+                glPointSize(6.0)
+                glBegin(GL_POINTS)
+                for position, color in lod_points:
+                    glColor4f(*color)
+                    glVertex3f(position.x, -position.z, position.y)
+                glEnd()
+                glPointSize(1.0)
+                profiler.count('lod_points', draws=1, objects=len(lod_points))
+            profiler.count('saved_by_culling', draws=culler.draws_saved,
+                           objects=culler.culled + culler.simplified)
+
         if gizmo_enabled:
+            profiler.begin_stage('gizmo')
             self.gizmo.render_scaled(gizmo_scale,
                                      is3d=self.mode == MODE_3D,
                                      hover_id=gizmo_hover_id)
@@ -1561,7 +1868,29 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
             glLineWidth(1.0)
 
         glEnable(GL_DEPTH_TEST)
+
+        profiler.begin_stage('finish')
         glFinish()
+        profiler.end_frame()
+
+        if profiler.show_overlay:
+            self.render_profiler_overlay()
+
+    def render_profiler_overlay(self):
+        painter = QtGui.QPainter(self)
+        font = QtGui.QFont('monospace')
+        font.setStyleHint(QtGui.QFont.Monospace)
+        font.setPointSize(8)
+        painter.setFont(font)
+        text = self.frame_profiler.format_overlay()
+        rect = painter.boundingRect(QtCore.QRect(0, 0, self.width(), self.height()),
+                                    QtCore.Qt.AlignLeft | QtCore.Qt.AlignTop, text)
+        rect.adjust(-4, -4, 4, 4)
+        rect.moveTopLeft(QtCore.QPoint(8, 48))
+        painter.fillRect(rect, QtGui.QColor(0, 0, 0, 160))
+        painter.setPen(QtGui.QColor(255, 255, 255))
+        painter.drawText(rect.adjusted(4, 4, -4, -4), QtCore.Qt.AlignLeft | QtCore.Qt.AlignTop, text)
+        painter.end()
 
     @catch_exception
     def mousePressEvent(self, event):
@@ -1572,6 +1901,7 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
         self.usercontrol.handle_move(event)
 
         self._mouse_pos_changed = True
+        self.render_scheduler.request_tick()
 
     @catch_exception
     def mouseReleaseEvent(self, event):
@@ -1686,7 +2016,7 @@ class BolMapViewer(QtOpenGLWidgets.QOpenGLWidget):
             mapx, mapz = self.mouse_coord_to_world_coord(mousex, mousey)
             clip_y = self.editorconfig.getint("topdown_cull_height")-10
             ray = Line(Vector3(mapx, mapz, clip_y), Vector3(0.0, 0.0, -1.0))
-        return self.collision.get_closest_point(ray, self._get_snapping_points(), clip_y, radius)
+        return self._get_snapping_points().get_closest_point(ray, clip_y, radius)
 
 
 def create_object_type_pixmap(canvas_size: int, directed: bool,
@@ -322,6 +322,9 @@ class DataEditor(QtWidgets.QWidget):
     def catch_text_update(self):
         self.emit_3d_update.emit()
 
+    def mark_modified(self):
+        self.bol.mark_objects_dirty(self.bound_to)
+
     def setup_widgets(self):
         pass
 
@@ -377,6 +380,7 @@ class DataEditor(QtWidgets.QWidget):
         def checked(state):
             for obj in self.bound_to:
                 setattr(obj, attribute, off_value if state == 0 else on_value)
+            self.mark_modified()
 
         checkbox.stateChanged.connect(checked)
         self.vbox.addLayout(layout)
@@ -390,6 +394,7 @@ class DataEditor(QtWidgets.QWidget):
         def on_value_changed(value: int):
             for obj in self.bound_to:
                 setattr(obj, attribute, value)
+            self.mark_modified()
 
         maskbox.value_changed.connect(on_value_changed)
         self.vbox.addLayout(layout)
@@ -404,6 +409,7 @@ class DataEditor(QtWidgets.QWidget):
             def on_spinbox_valueChanged(value):
                 for obj in self.bound_to:
                     setattr(obj, attribute, value)
+                self.mark_modified()
 
             spinbox.valueChanged.connect(on_spinbox_valueChanged)
 
@@ -422,6 +428,7 @@ class DataEditor(QtWidgets.QWidget):
             self.catch_text_update()
             for obj in self.bound_to:
                 setattr(obj, attribute, value)
+            self.mark_modified()
 
         spinbox.valueChanged.connect(on_spinbox_valueChanged)
 
@@ -441,6 +448,7 @@ class DataEditor(QtWidgets.QWidget):
             text = text.rjust(maxlength)
             for obj in self.bound_to:
                 setattr(obj, attribute, text)
+            self.mark_modified()
 
         line_edit.editingFinished.connect(input_edited)
         self.vbox.addLayout(layout)
@@ -463,6 +471,7 @@ class DataEditor(QtWidgets.QWidget):
             val = keyval_dict[item]
             for obj in self.bound_to:
                 setattr(obj, attribute, val)
+            self.mark_modified()
 
             tt_dict = getattr(ttl, attribute, {})
             if tt_dict:
@@ -483,6 +492,7 @@ class DataEditor(QtWidgets.QWidget):
             val = keyval_dict[item]
             for obj in self.bound_to:
                 setattr(obj, attribute, val)
+            self.mark_modified()
 
             tt_dict = getattr(ttl, attribute, {})
             if tt_dict:
@@ -519,7 +529,8 @@ class DataEditor(QtWidgets.QWidget):
             input_edited = create_setter(self.bound_to,
                                          attribute,
                                          subattr,
-                                         self.catch_text_update)
+                                         self.catch_text_update,
+                                         self.mark_modified)
             input_edited_callbacks.append(input_edited)
             spinbox.valueChanged.connect(input_edited)
             spinboxes.append(spinbox)
@@ -570,7 +581,8 @@ class DataEditor(QtWidgets.QWidget):
             input_edited = create_setter(self.bound_to,
                                          attribute,
                                          subattr,
-                                         self.catch_text_update)
+                                         self.catch_text_update,
+                                         self.mark_modified)
             spinbox.valueChanged.connect(input_edited)
             spinboxes.append(spinbox)
 
@@ -591,7 +603,8 @@ class DataEditor(QtWidgets.QWidget):
             input_edited = create_setter(self.bound_to,
                                          attribute,
                                          subattr,
-                                         self.catch_text_update)
+                                         self.catch_text_update,
+                                         self.mark_modified)
             spinbox.valueChanged.connect(input_edited)
             spinboxes.append(spinbox)
 
@@ -608,7 +621,7 @@ class DataEditor(QtWidgets.QWidget):
             spinbox = SpinBox(self)
             spinbox.setMaximumWidth(calc_width(self.fontMetrics(), min_val, max_val, is_spinbox=True))
             spinbox.setRange(min_val, max_val)
-            input_edited = create_setter_list(self.bound_to, attribute, i)
+            input_edited = create_setter_list(self.bound_to, attribute, i, self.mark_modified)
             spinbox.valueChanged.connect(input_edited)
             spinboxes.append(spinbox)
 
@@ -625,6 +638,7 @@ class DataEditor(QtWidgets.QWidget):
         def set_value(value, index=index):
             for obj in self.bound_to:
                 getattr(obj, attribute)[index] = value
+            self.mark_modified()
 
         if widget_type == "checkbox":
             widget = QtWidgets.QCheckBox()
@@ -776,6 +790,7 @@ class DataEditor(QtWidgets.QWidget):
             angles = [radians(float(x.text())) for x in angle_edits]
             for obj in self.bound_to:
                 obj.rotation.rotate_euler(*angles)
+            self.mark_modified()
 
             self.emit_3d_update.emit()
 
@@ -792,22 +807,24 @@ class DataEditor(QtWidgets.QWidget):
         return angle_edits
 
 
-def create_setter_list(bound_to, attribute, index):
+def create_setter_list(bound_to, attribute, index, on_modified):
 
     def on_spinbox_valueChanged(value):
         for bound_to_object in bound_to:
             mainattr = getattr(bound_to_object, attribute)
             mainattr[index] = value
+        on_modified()
 
     return on_spinbox_valueChanged
 
 
-def create_setter(bound_to, attribute, subattr, update3dview):
+def create_setter(bound_to, attribute, subattr, update3dview, on_modified):
 
     def on_spinbox_valueChanged(value):
         for bound_to_object in bound_to:
             mainattr = getattr(bound_to_object, attribute)
             setattr(mainattr, subattr, value)
+        on_modified()
         update3dview()
 
     return on_spinbox_valueChanged
@@ -891,6 +908,7 @@ class EnemyPointGroupEdit(DataEditor):
             obj.id = value
             for enemypathpoint in obj.points:
                 enemypathpoint.group = value
+            self.mark_modified()
 
             palette.setColor(QtGui.QPalette.ColorRole.Highlight, self.palette().highlight().color())
             self.groupid.setPalette(palette)
@@ -1322,6 +1340,7 @@ class ObjectEdit(DataEditor):
             return
         for mapobject in self.bound_to:
             mapobject.userdata = defaults.copy()
+        self.mark_modified()
         self.update_userdata_widgets(get_average_obj(self.bound_to))
 
     def update_userdata_widgets(self, obj):
@@ -1630,11 +1649,13 @@ class RespawnPointEdit(DataEditor):
         def on_partial_clicked():
             for obj in self.bound_to:
                 self.bol.adjust_respawn_point(obj, also_id=False, also_rotation=False)
+            self.mark_modified()
             self.update_data()
 
         def on_full_clicked():
             for obj in self.bound_to:
                 self.bol.adjust_respawn_point(obj, also_id=False, also_rotation=True)
+            self.mark_modified()
             self.update_data()
 
         adjust_menu = QtWidgets.QMenu(self)
@@ -1672,6 +1693,7 @@ class RespawnPointEdit(DataEditor):
                     return
 
             obj.respawn_id = value
+            self.mark_modified()
 
             palette.setColor(QtGui.QPalette.ColorRole.Highlight, self.palette().highlight().color())
             self.respawn_id.setPalette(palette)
@@ -1,6 +1,8 @@
 from PySide6 import QtCore, QtGui, QtWidgets
 
-from lib.libbol import BOL, get_full_name, AREA_TYPES, KART_START_POINTS_PLAYER_IDS
+from lib.libbol import (BOL, get_full_name, AREA_TYPES, KART_START_POINTS_PLAYER_IDS,
+                        ENEMYITEMPOINT, CHECKPOINT, ROUTEGROUP, ROUTEPOINT, OBJECTS, KARTPOINT,
+                        AREA, CAMERA, RESPAWNPOINT, LIGHTPARAM, MINIGAME)
 
 
 class BaseTreeWidgetItem(QtWidgets.QTreeWidgetItem):
@@ -246,6 +248,22 @@ class MGEntry(NamedItem):
         self.setText(0, "MG")
 
 
+# Top-level items that list the entries of each section, and the methods that populate them.
+SECTION_ITEMS = {
+    ENEMYITEMPOINT: ('enemyroutes', '_populate_enemy_paths'),
+    CHECKPOINT: ('checkpointgroups', '_populate_checkpoints'),
+    ROUTEGROUP: ('routes', '_populate_routes'),
+    ROUTEPOINT: ('routes', '_populate_routes'),
+    OBJECTS: ('objects', '_populate_objects'),
+    KARTPOINT: ('kartpoints', '_populate_kartpoints'),
+    AREA: ('areas', '_populate_areas'),
+    CAMERA: ('cameras', '_populate_cameras'),
+    RESPAWNPOINT: ('respawnpoints', '_populate_respawnpoints'),
+    LIGHTPARAM: ('lightparams', '_populate_lightparams'),
+    MINIGAME: ('mgentries', '_populate_mgentries'),
+}
+
+
 class LevelDataTreeView(QtWidgets.QTreeWidget):
     select_all = QtCore.Signal(ObjectGroup)
     reverse = QtCore.Signal(ObjectGroup)
@@ -459,78 +477,120 @@ class LevelDataTreeView(QtWidgets.QTreeWidget):
 
         self._reset()
 
+        self._populate_enemy_paths(boldata)
+        self._populate_checkpoints(boldata)
+        self._populate_routes(boldata)
+        self._populate_objects(boldata)
+        self._populate_kartpoints(boldata)
+        self._populate_areas(boldata)
+        self._populate_respawnpoints(boldata)
+        self._populate_cameras(boldata)
+        self._populate_lightparams(boldata)
+        self._populate_mgentries(boldata)
+
+        # Restore expansion states.
+        self._set_expansion_states(self.enemyroutes, enemyroutes_expansion_states)
+        self._set_expansion_states(self.checkpointgroups, checkpointgroups_expansion_states)
+        self._set_expansion_states(self.routes, routes_expansion_states)
+
+        # And restore previous selection, but only if item counts match, or else indexes could be
+        # unreliable. Top-level items always exist, so they can be restored even when the count has
+        # changed.
+        items_to_select = []
+        if selected_item_indexes_list:
+            only_top_level_items = initial_item_count != self.count_items()
+
+            for selected_item_indexes in selected_item_indexes_list:
+                if only_top_level_items and len(selected_item_indexes) != 1:
+                    continue
+
+                item = self.topLevelItem(selected_item_indexes.pop(0))
+                while selected_item_indexes:
+                    index = selected_item_indexes.pop(0)
+                    if index < item.childCount():
+                        item = item.child(index)
+                    else:
+                        break
+                items_to_select.append(item)
+
+            # Effectively select items without relying on signals which could trigger a considerate
+            # number of events for each item.
+            with QtCore.QSignalBlocker(self):
+                for item in items_to_select:
+                    item.setSelected(True)
+        self.editor.tree_select_object(items_to_select)
+
+        self.bound_to_group(boldata)
+
+    def _populate_enemy_paths(self, boldata: BOL):
         for group in boldata.enemypointgroups.groups:
             group_item = EnemyPointGroup(self.enemyroutes, group)
 
             for point in group.points:
                 point_item = EnemyRoutePoint(group_item, "Enemy Route Point", point)
 
+    def _populate_checkpoints(self, boldata: BOL):
         for group in boldata.checkpoints.groups:
             group_item = CheckpointGroup(self.checkpointgroups, group)
 
             for point in group.points:
                 point_item = Checkpoint(group_item, "Checkpoint", point)
 
+    def _populate_routes(self, boldata: BOL):
         for route in boldata.routes:
             route_item = ObjectPointGroup(self.routes, route)
 
             for point in route.points:
                 point_item = ObjectRoutePoint(route_item, "Route Point", point)
 
+    def _populate_objects(self, boldata: BOL):
         for object in boldata.objects.objects:
             object_item = ObjectEntry(self.objects, "Object", object)
 
         self.sort_objects()
 
+    def _populate_kartpoints(self, boldata: BOL):
         for kartpoint in boldata.kartpoints.positions:
             item = KartpointEntry(self.kartpoints, "Kartpoint", kartpoint)
 
+    def _populate_areas(self, boldata: BOL):
         for i, area in enumerate(boldata.areas.areas):
             item = AreaEntry(self.areas, "Area", area, i)
 
+    def _populate_respawnpoints(self, boldata: BOL):
         for respawn in boldata.respawnpoints:
             item = RespawnEntry(self.respawnpoints, "Respawn", respawn)
 
+    def _populate_cameras(self, boldata: BOL):
         for i, camera in enumerate(boldata.cameras):
             item = CameraEntry(self.cameras, "Camera", camera, i)
 
+    def _populate_lightparams(self, boldata: BOL):
         for i, lightparam in enumerate(boldata.lightparams):
             item = LightParamEntry(self.lightparams, "LightParam", lightparam, i)
 
+    def _populate_mgentries(self, boldata: BOL):
         for mg in boldata.mgentries:
             item = MGEntry(self.mgentries, "MG", mg)
 
-        # Restore expansion states.
-        self._set_expansion_states(self.enemyroutes, enemyroutes_expansion_states)
-        self._set_expansion_states(self.checkpointgroups, checkpointgroups_expansion_states)
-        self._set_expansion_states(self.routes, routes_expansion_states)
-
-        # And restore previous selection, but only if item counts match, or else indexes could be
-        # unreliable. Top-level items always exist, so they can be restored even when the count has
-        # changed.
-        items_to_select = []
-        if selected_item_indexes_list:
-            only_top_level_items = initial_item_count != self.count_items()
-
-            for selected_item_indexes in selected_item_indexes_list:
-                if only_top_level_items and len(selected_item_indexes) != 1:
-                    continue
-
-                item = self.topLevelItem(selected_item_indexes.pop(0))
-                while selected_item_indexes:
-                    index = selected_item_indexes.pop(0)
-                    if index < item.childCount():
-                        item = item.child(index)
-                    else:
-                        break
-                items_to_select.append(item)
+    def update_sections(self, boldata: BOL, sections):
+        """
+        Recreates the items of the given sections only; the items of the remaining sections (and
+        the objects bound to them) are kept. The selection in the recreated items is not restored.
+        """
+        section_items = dict.fromkeys(SECTION_ITEMS[section] for section in sorted(sections))
 
-            # Effectively select items without relying on signals which could trigger a considerate
-            # number of events for each item.
-            with QtCore.QSignalBlocker(self):
-                for item in items_to_select:
-                    item.setSelected(True)
-        self.editor.tree_select_object(items_to_select)
+        with QtCore.QSignalBlocker(self):  # Avoid triggering item selection changed events.
+            for group_name, populator_name in section_items:
+                group = getattr(self, group_name)
+                expansion_states = self._get_expansion_states(group)
+                group.remove_children()
+                getattr(self, populator_name)(boldata)
+                self._set_expansion_states(group, expansion_states)
+
+        # Camera names refer to the areas that they are bound to.
+        if AREA in sections and CAMERA not in sections:
+            self.update_camera_names()
 
         self.bound_to_group(boldata)
 